@@ -1,20 +1,46 @@
 # markdown_editor.py
 
 import sys
+
+# 命令行子命令不需要图形界面：在导入界面模块（以及 QtWebEngine）之前分派，
+# 没有显示器和 X11 库的构建服务器上也能运行。
+# python app.py export <文件夹> | export-pdf <文件夹> | serve [--port 端口]
+CLI_COMMANDS = {'export': 'site_export', 'export-pdf': 'pdf_export', 'serve': 'render_daemon'}
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+    import importlib
+    sys.exit(importlib.import_module(CLI_COMMANDS[sys.argv[1]]).main(sys.argv[2:]))
+
 import os
-import shutil
 import re
+import time
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTextEdit, QAction, QFileDialog,
     QMessageBox, QSplitter, QListWidget, QToolBar, QColorDialog,
-    QFontDialog, QDialog, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QInputDialog
+    QFontDialog, QDialog, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QInputDialog,
+    QDockWidget, QListView, QListWidgetItem, QTabWidget, QCompleter
 )
-from PyQt5.QtCore import Qt, QTimer, QUrl
+from PyQt5.QtCore import Qt, QTimer, QUrl, QPoint, QElapsedTimer, QStringListModel, QFileSystemWatcher, pyqtSignal
 from PyQt5.QtGui import QFont, QTextCursor, QColor, QPalette, QTextCharFormat, QSyntaxHighlighter, QIcon
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-import markdown
 from settings_manager import SettingsManager  # 导入设置管理器
 import theme  # 导入主题模块
+from outline import OutlineModel  # 导入大纲索引
+from renderer import build_css, theme_variables  # 导入 Markdown 渲染
+from includes import FragmentCache, render_document  # 导入包含指令与片段缓存
+from scroll_sync import ScrollSync  # 导入滚动同步
+from preview_backend import PREVIEW_BACKENDS, create_preview  # 导入预览后端
+from doc_stats import DocumentStats  # 导入文档统计
+from md_linter import DocumentLinter, DiagnosticModel  # 导入文档检查器
+from pdf_export import PdfBatchExporter  # 导入批量 PDF 导出
+from asset_pipeline import AssetImporter, IMAGE_SUFFIXES  # 导入图片导入流水线
+from thumbnails import ThumbnailCache, LAZY_IMAGE_SCRIPT  # 导入预览缩略图缓存
+from perf_hud import PerfMonitor, process_rss  # 导入性能面板
+import session_snapshot  # 导入会话快照
+from file_watcher import FileWatcher, apply_text_diff, utf16_len  # 导入外部修改监视
+from diff_view import DiffPanel  # 导入差异面板
+from link_index import LinkIndex, apply_link_edits  # 导入工作区链接索引
+from completion import LinkCompleter  # 导入链接补全
+from metadata_index import MetadataIndex  # 导入元数据索引
+from metadata_view import MetadataPanel  # 导入元数据面板
 
 class MarkdownHighlighter(QSyntaxHighlighter):
     # 定义块状态
@@ -22,11 +48,47 @@ class MarkdownHighlighter(QSyntaxHighlighter):
     CODE_BLOCK_CPP = 2
     CODE_BLOCK_PYTHON = 3
     # 可以根据需要添加更多语言的状态
+    CODE_STATES = (CODE_BLOCK, CODE_BLOCK_CPP, CODE_BLOCK_PYTHON)
+
+    RESTYLE_BUDGET_MS = 8  # 切换主题后分批重新高亮时，每个时间片的时长上限
+
+    # 常规 Markdown 规则：(主题颜色名, 正则, 粗体, 斜体, 下划线)，正则只在类加载时编译一次
+    MARKDOWN_RULES = [
+        # 标题（# 标题）
+        ('header', [re.compile(r'^(#{1,6})\s.*')], True, False, False),
+        # 粗体（**文本** 或 __文本__）
+        ('bold', [re.compile(r'\*\*(.*?)\*\*'), re.compile(r'__(.*?)__')], True, False, False),
+        # 斜体（*文本* 或 _文本_）
+        ('italic', [re.compile(r'\*(.*?)\*'), re.compile(r'_(.*?)_')], False, True, False),
+        # 链接（[文本](链接)）
+        ('link', [re.compile(r'\[([^\]]+)\]\(([^)]+)\)')], False, False, True),
+        # 引用（> 引用文本）
+        ('blockquote', [re.compile(r'^>\s.*')], False, False, False),
+        # 无序列表（最多两级嵌套）
+        ('unordered_list', [re.compile(r'^-\s.*'), re.compile(r'^\s+-\s.*')], False, False, False),
+        # 有序列表（最多两级嵌套）
+        ('ordered_list', [re.compile(r'^\d+\.\s.*'), re.compile(r'^\s+\d+\.\s.*')], False, False, False),
+    ]
+
+    # 代码块（```lang 和 ```）
+    code_block_start_pattern = re.compile(r'^```(\w+)?')
+    code_block_end_pattern = re.compile(r'^```$')
+
+    # 主题颜色 -> 高亮规则 [(正则, 格式), ...]，切换回用过的主题时直接复用
+    _theme_rules = {}
 
     def __init__(self, parent=None, theme_colors=None):
         super(MarkdownHighlighter, self).__init__(parent)
-        self.highlighting_rules = []
-        self.set_theme(theme_colors or theme.get_theme("Light")["highlighter"])
+        # 大纲索引与检查器（由编辑器设置），高亮时顺带通知它们
+        self.outline = None
+        self.linter = None
+        self.perf = None  # 性能监视器（性能面板打开时由编辑器设置），累计高亮耗时
+        self.heading_pattern = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+        self.highlighting_rules = self.rules_for_theme(theme_colors or theme.get_theme("Light")["highlighter"])
+
+        # 代码块标识符的格式
+        self.fence_format = QTextCharFormat()
+        self.fence_format.setForeground(QColor("#888888"))
 
         # 定义语言特定的高亮规则
         self.language_rules = {
@@ -35,66 +97,124 @@ class MarkdownHighlighter(QSyntaxHighlighter):
             # 可以添加更多语言
         }
 
-    def set_theme(self, theme_colors):
-        """根据当前主题设置高亮颜色。"""
-        self.highlighting_rules = []
-
-        # 标题（# 标题）
-        header_format = QTextCharFormat()
-        header_format.setForeground(QColor(theme_colors["header"]))
-        header_format.setFontWeight(QFont.Bold)
-        header_patterns = [r'^(#{1,6})\s.*']
-        for pattern in header_patterns:
-            self.highlighting_rules.append((re.compile(pattern), header_format))
-
-        # 粗体（**文本** 或 __文本__）
-        bold_format = QTextCharFormat()
-        bold_format.setFontWeight(QFont.Bold)
-        bold_format.setForeground(QColor(theme_colors["bold"]))
-        bold_patterns = [r'\*\*(.*?)\*\*', r'__(.*?)__']
-        for pattern in bold_patterns:
-            self.highlighting_rules.append((re.compile(pattern), bold_format))
-
-        # 斜体（*文本* 或 _文本_）
-        italic_format = QTextCharFormat()
-        italic_format.setFontItalic(True)
-        italic_format.setForeground(QColor(theme_colors["italic"]))
-        italic_patterns = [r'\*(.*?)\*', r'_(.*?)_']
-        for pattern in italic_patterns:
-            self.highlighting_rules.append((re.compile(pattern), italic_format))
-
-        # 链接（[文本](链接)）
-        link_format = QTextCharFormat()
-        link_format.setForeground(QColor(theme_colors["link"]))
-        link_format.setFontUnderline(True)
-        link_patterns = [r'\[([^\]]+)\]\(([^)]+)\)']
-        for pattern in link_patterns:
-            self.highlighting_rules.append((re.compile(pattern), link_format))
-
-        # 引用（> 引用文本）
-        blockquote_format = QTextCharFormat()
-        blockquote_format.setForeground(QColor(theme_colors["blockquote"]))
-        blockquote_patterns = [r'^>\s.*']
-        for pattern in blockquote_patterns:
-            self.highlighting_rules.append((re.compile(pattern), blockquote_format))
-
-        # 无序列表（最多两级嵌套）
-        unordered_list_format = QTextCharFormat()
-        unordered_list_format.setForeground(QColor(theme_colors["unordered_list"]))
-        unordered_list_patterns = [r'^-\s.*', r'^\s+-\s.*']  # 支持一级和二级
-        for pattern in unordered_list_patterns:
-            self.highlighting_rules.append((re.compile(pattern), unordered_list_format))
-
-        # 有序列表（最多两级嵌套）
-        ordered_list_format = QTextCharFormat()
-        ordered_list_format.setForeground(QColor(theme_colors["ordered_list"]))
-        ordered_list_patterns = [r'^\d+\.\s.*', r'^\s+\d+\.\s.*']  # 支持一级和二级
-        for pattern in ordered_list_patterns:
-            self.highlighting_rules.append((re.compile(pattern), ordered_list_format))
+        # 切换主题或载入文档后的分批重新高亮：_restyling 期间内容没有变化，不通知大纲与检查器
+        self._restyling = False
+        self._restyle_notify = False
+        # 正在分批重新高亮（包括结束编辑块时发出的信号）；内容没有变化，编辑器据此忽略 textChanged
+        self.restyling = False
+        # 载入文档时先只传递代码块状态，格式稍后分批设置
+        self._deferred = False
+        self._restyle_next = 0
+        self._restyle_skip = (0, -1)
+        self._restyle_block_count = 0
+        self._restyle_timer = QTimer(self)
+        self._restyle_timer.timeout.connect(self._restyle_slice)
+        self.document().contentsChange.connect(self._on_contents_change)
+
+    @classmethod
+    def rules_for_theme(cls, theme_colors):
+        """返回主题对应的高亮规则，同一组颜色只构建一次格式。"""
+        key = tuple(sorted(theme_colors.items()))
+        rules = cls._theme_rules.get(key)
+        if rules is None:
+            rules = []
+            for name, patterns, bold, italic, underline in cls.MARKDOWN_RULES:
+                fmt = QTextCharFormat()
+                fmt.setForeground(QColor(theme_colors[name]))
+                if bold:
+                    fmt.setFontWeight(QFont.Bold)
+                if italic:
+                    fmt.setFontItalic(True)
+                if underline:
+                    fmt.setFontUnderline(True)
+                rules.extend((pattern, fmt) for pattern in patterns)
+            cls._theme_rules[key] = rules
+        return rules
 
-        # 代码块（```lang 和 ```）
-        self.code_block_start_pattern = re.compile(r'^```(\w+)?')
-        self.code_block_end_pattern = re.compile(r'^```$')
+    def set_theme(self, theme_colors, visible_blocks=None):
+        """
+        根据当前主题设置高亮颜色。visible_blocks 为 (首块号, 末块号)：
+        先同步重新高亮这些可见块，其余的块在空闲时分批处理，不阻塞界面。
+        """
+        self.highlighting_rules = self.rules_for_theme(theme_colors)
+        self._schedule_restyle(visible_blocks, notify=False)
+
+    def begin_deferred(self):
+        """开始载入文档：之后的高亮只计算代码块状态，不设置格式。"""
+        self._deferred = True
+        self._restyle_timer.stop()
+
+    def end_deferred(self, visible_blocks=None):
+        """载入完成：可见块立即高亮，其余的块分批高亮，并照常通知大纲与检查器。"""
+        self._deferred = False
+        self._schedule_restyle(visible_blocks, notify=True)
+
+    def next_state(self, previous_state, text):
+        """根据上一块的状态和本块文本计算本块的代码块状态（与 highlightBlock 一致）。"""
+        if previous_state not in self.CODE_STATES:
+            match = self.code_block_start_pattern.match(text)
+            if not match:
+                return 0
+            return {'cpp': self.CODE_BLOCK_CPP, 'python': self.CODE_BLOCK_PYTHON}.get(
+                match.group(1), self.CODE_BLOCK)
+        return 0 if self.code_block_end_pattern.match(text) else previous_state
+
+    def _schedule_restyle(self, visible_blocks, notify):
+        doc = self.document()
+        first, last = visible_blocks or (0, -1)
+        self._restyle_notify = notify
+        self._restyle_skip = (0, -1)
+        self._restyle_range(doc.findBlockByNumber(first), lambda block: block.blockNumber() <= last)
+        self._restyle_next = 0
+        self._restyle_skip = (first, last)
+        self._restyle_block_count = doc.blockCount()
+        self._restyle_timer.start(0)
+
+    def _restyle_range(self, block, proceed):
+        """从 block 开始逐块重新高亮，直到 proceed(block) 为假；返回第一个未处理的块。"""
+        first, last = self._restyle_skip
+        # 放在同一个编辑块中，整段只发出一次 contentsChange
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        self.restyling = True
+        self._restyling = not self._restyle_notify
+        try:
+            while block.isValid() and proceed(block):
+                if first <= block.blockNumber() <= last:
+                    # 可见块已经处理过
+                    block = self.document().findBlockByNumber(last + 1)
+                    continue
+                self.rehighlightBlock(block)
+                block = block.next()
+        finally:
+            # endEditBlock() 才发出 contentsChange/textChanged，标志要保持到它返回之后
+            cursor.endEditBlock()
+            self._restyling = False
+            self.restyling = False
+        return block
+
+    def _restyle_slice(self):
+        deadline = QElapsedTimer()
+        deadline.start()
+        block = self._restyle_range(self.document().findBlockByNumber(self._restyle_next),
+                                    lambda _: deadline.elapsed() < self.RESTYLE_BUDGET_MS)
+        if block.isValid():
+            self._restyle_next = block.blockNumber()
+        else:
+            self._restyle_timer.stop()
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        """编辑发生在分批进度之前时调整进度（被编辑的块已由 Qt 重新高亮）。"""
+        doc = self.document()
+        delta = doc.blockCount() - self._restyle_block_count
+        self._restyle_block_count = doc.blockCount()
+        if not self._restyle_timer.isActive():
+            return
+        first = doc.findBlock(position).blockNumber()
+        if first < self._restyle_next:
+            self._restyle_next = max(first, self._restyle_next + delta)
+        if first <= self._restyle_skip[1]:
+            self._restyle_skip = (0, -1)
 
     def get_cpp_rules(self):
         """定义C++语法高亮规则"""
@@ -153,8 +273,42 @@ class MarkdownHighlighter(QSyntaxHighlighter):
 
         return rules
 
+    def rehighlight(self):
+        super().rehighlight()
+        if self.outline is not None:
+            self.outline.flush()
+        if self.linter is not None:
+            self.linter.flush()
+
+    def _notify_block(self, text):
+        """向大纲索引上报当前块的标题信息（代码块内的 # 不算标题），并通知检查器重新检查该块。"""
+        block_number = self.currentBlock().blockNumber()
+        if self.outline is not None:
+            heading = None
+            if self.previousBlockState() not in self.CODE_STATES:
+                match = self.heading_pattern.match(text)
+                if match:
+                    heading = (len(match.group(1)), match.group(2))
+            self.outline.record(block_number, heading)
+        if self.linter is not None:
+            self.linter.mark_dirty(block_number)
+
     def highlightBlock(self, text):
-        if self.previousBlockState() not in [self.CODE_BLOCK, self.CODE_BLOCK_CPP, self.CODE_BLOCK_PYTHON]:
+        if self.perf is None:
+            self._highlight_block(text)
+            return
+        start = time.perf_counter()
+        self._highlight_block(text)
+        self.perf.accumulate('highlight', time.perf_counter() - start)
+
+    def _highlight_block(self, text):
+        if self._deferred:
+            self.setCurrentBlockState(self.next_state(self.previousBlockState(), text))
+            return
+        if not self._restyling:
+            self._notify_block(text)
+
+        if self.previousBlockState() not in self.CODE_STATES:
             match = self.code_block_start_pattern.match(text)
             if match:
                 language = match.group(1)
@@ -165,21 +319,19 @@ class MarkdownHighlighter(QSyntaxHighlighter):
                 else:
                     self.setCurrentBlockState(self.CODE_BLOCK)  # 通用代码块
                 # 设置整行格式（代码块标识符的格式）
-                code_block_format = QTextCharFormat()
-                code_block_format.setForeground(QColor("#888888"))  # 设置代码块标识符颜色
-                self.setFormat(0, len(text), code_block_format)
+                self.setFormat(0, len(text), self.fence_format)
                 return  # 代码块标识符单独处理，直接返回
 
         # 检查代码块的结束标识符 ```
-        if self.previousBlockState() in [self.CODE_BLOCK, self.CODE_BLOCK_CPP, self.CODE_BLOCK_PYTHON]:
+        if self.previousBlockState() in self.CODE_STATES:
             if self.code_block_end_pattern.match(text):
                 self.setCurrentBlockState(0)  # 退出代码块状态
-                code_block_format = QTextCharFormat()
-                code_block_format.setForeground(QColor("#888888"))  # 设置代码块标识符颜色
-                self.setFormat(0, len(text), code_block_format)
+                self.setFormat(0, len(text), self.fence_format)
                 return  # 代码块结束标识符单独处理，直接返回
             else:
-                # 处于代码块中时，应用特定语言的高亮规则
+                # 处于代码块中时，把代码块状态传递给下一行
+                self.setCurrentBlockState(self.previousBlockState())
+                # 应用特定语言的高亮规则
                 language = None
                 if self.previousBlockState() == self.CODE_BLOCK_CPP:
                     language = 'cpp'
@@ -195,12 +347,80 @@ class MarkdownHighlighter(QSyntaxHighlighter):
                 return  # 如果是代码块内部，处理完后直接返回
 
         # 如果不在代码块中，应用常规 Markdown 高亮规则
+        self.setCurrentBlockState(0)
         for pattern, fmt in self.highlighting_rules:
             for match in pattern.finditer(text):
                 start, end = match.span()
                 self.setFormat(start, end - start, fmt)
 
 
+class MarkdownTextEdit(QTextEdit):
+    """编辑区：拖放或粘贴图片文件时交给图片导入流水线批量处理；在链接目标中输入时弹出补全。"""
+    images_dropped = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 补全来源：参数为光标前的同一行文字，返回 (已输入的目标, 候选列表) 或 None
+        self.completion_source = None
+        self._typed = ""
+        self.completer = QCompleter(QStringListModel(self), self)
+        self.completer.setWidget(self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated[str].connect(self.insert_completion)
+
+    def keyPressEvent(self, event):
+        popup = self.completer.popup()
+        if popup.isVisible() and event.key() in (Qt.Key_Enter, Qt.Key_Return, Qt.Key_Escape,
+                                                 Qt.Key_Tab, Qt.Key_Backtab):
+            # 交给补全弹窗处理
+            event.ignore()
+            return
+        super().keyPressEvent(event)
+        if event.text() and (event.text().isprintable() or event.key() == Qt.Key_Backspace):
+            self.update_completion()
+        elif popup.isVisible() and event.key() in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Home, Qt.Key_End):
+            popup.hide()
+
+    def update_completion(self):
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        before = cursor.selectedText()
+        result = self.completion_source(before) if self.completion_source and '](' in before else None
+        if not result or not result[1]:
+            self.completer.popup().hide()
+            return
+        self._typed, candidates = result
+        self.completer.model().setStringList(candidates)
+        self.completer.popup().setCurrentIndex(self.completer.model().index(0, 0))
+        rect = self.cursorRect()
+        rect.setWidth(self.completer.popup().sizeHintForColumn(0)
+                      + self.completer.popup().verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
+
+    def insert_completion(self, text):
+        """用选中的候选替换已输入的链接目标。"""
+        cursor = self.textCursor()
+        cursor.setPosition(cursor.position() - utf16_len(self._typed), QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
+
+    def _image_paths(self, source):
+        if not source.hasUrls():
+            return []
+        paths = [url.toLocalFile() for url in source.urls() if url.isLocalFile()]
+        return [path for path in paths if path.lower().endswith(IMAGE_SUFFIXES)]
+
+    def canInsertFromMimeData(self, source):
+        return bool(self._image_paths(source)) or super().canInsertFromMimeData(source)
+
+    def insertFromMimeData(self, source):
+        paths = self._image_paths(source)
+        if paths:
+            self.images_dropped.emit(paths)
+        else:
+            super().insertFromMimeData(source)
+
+
 class InsertCodeBlockDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -259,6 +479,19 @@ class SettingsDialog(QDialog):
         theme_layout.addWidget(self.theme_combo)
         layout.addLayout(theme_layout)
 
+        # 预览后端选择
+        backend_layout = QHBoxLayout()
+        backend_label = QLabel("预览引擎:")
+        self.backend_combo = QComboBox()
+        for name, (description, _) in PREVIEW_BACKENDS.items():
+            self.backend_combo.addItem(description, name)
+        index = self.backend_combo.findData(self.settings_manager.get_preview_backend())
+        self.backend_combo.setCurrentIndex(index if index >= 0 else 0)
+        self.backend_combo.currentIndexChanged.connect(self.change_preview_backend)
+        backend_layout.addWidget(backend_label)
+        backend_layout.addWidget(self.backend_combo)
+        layout.addLayout(backend_layout)
+
         # 字体设置按钮
         self.font_btn = QPushButton("选择全局字体")
         self.font_btn.clicked.connect(self.choose_font)
@@ -274,6 +507,14 @@ class SettingsDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"切换主题时发生错误: {e}")
 
+    def change_preview_backend(self, index):
+        try:
+            name = self.backend_combo.currentData()
+            self.settings_manager.set_preview_backend(name)
+            self.parent_editor.set_preview_backend(name)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"切换预览引擎时发生错误: {e}")
+
     def choose_font(self):
         try:
             # 获取当前全局字体
@@ -306,6 +547,38 @@ class MarkdownEditor(QMainWindow):
         # 初始化设置管理器
         self.settings_manager = SettingsManager()
 
+        # 各环节耗时（状态栏性能面板）
+        self.perf = PerfMonitor(parent=self)
+        self.pending_renders = 0  # 防抖合并后尚未渲染的预览刷新请求数
+        self.last_render = None  # 最后一次渲染的 (Markdown 文本, head, HTML, 行号列表, {被包含的文件: 内容哈希})，写入会话快照
+        self._restore_scroll = None  # 载入文件后恢复滚动位置的槽函数
+
+        # 后台图片导入
+        self.asset_importer = AssetImporter(self)
+        self.asset_importer.finished.connect(self.on_images_imported)
+
+        # 预览区缩略图缓存，缩略图生成后刷新预览
+        self.thumbnail_cache = ThumbnailCache(self.settings_manager.get_preview_thumbnail_width(), parent=self)
+        self.thumbnail_cache.ready.connect(lambda: self.preview_update_timer.start(300))
+
+        # 包含指令的渲染缓存：各段与被包含的片段按内容哈希缓存，片段在外部修改时只刷新依赖它的文档
+        self.fragment_cache = FragmentCache()
+        self.thumbnail_cache.ready.connect(self.fragment_cache.clear)
+        self.include_watcher = QFileSystemWatcher(self)
+        self.include_watcher.fileChanged.connect(self.on_include_changed)
+
+        # 监视打开的文件和文件夹在外部的修改
+        self.file_watcher = FileWatcher(parent=self)
+        self.file_watcher.file_changed.connect(self.on_file_changed_externally)
+        self.file_watcher.folder_changed.connect(self.on_folder_changed_externally)
+
+        # 工作区链接索引：反向链接、失效链接与重命名时改写链接
+        self.link_index = LinkIndex(self)
+        # 在链接目标中输入时补全文件、图片和标题锚点
+        self.link_completer = LinkCompleter(self.link_index, self)
+        # 工作区元数据索引：各文件 front matter 中的 tags、owner、status 等
+        self.metadata_index = MetadataIndex(self)
+
         # 初始化防抖定时器
         self.preview_update_timer = QTimer()
         self.preview_update_timer.setSingleShot(True)
@@ -323,13 +596,73 @@ class MarkdownEditor(QMainWindow):
     def load_last_session(self):
         last_folder = self.settings_manager.get_last_opened_folder()
         last_file = self.settings_manager.get_last_opened_file()
+        # 上次退出时的快照：校验通过的文件列表、光标、滚动位置和预览直接复用
+        snapshot = session_snapshot.load_snapshot()
 
         if last_folder and os.path.isdir(last_folder):
             self.current_folder = last_folder
-            self.populate_file_list(last_folder)
+            self.file_watcher.watch_folder(last_folder)
+            self.link_index.set_folder(last_folder)
+            self.link_completer.set_folder(last_folder)
+            self.metadata_index.set_folder(last_folder)
+            names = session_snapshot.cached_file_list(snapshot, last_folder)
+            if names is not None:
+                self.file_list.clear()
+                self.file_list.addItems(names)
+            else:
+                self.populate_file_list(last_folder)
 
         if last_file and os.path.isfile(last_file):
-            self.load_file(last_file)
+            self.load_file(last_file, session_snapshot.file_entry(snapshot, last_file))
+
+    def save_session_snapshot(self):
+        """退出时写入会话快照；预览只有在与磁盘上的文件内容一致时才会保存。"""
+        try:
+            snapshot = {'folder': self.current_folder, 'folder_mtime': None, 'file_list': [], 'files': []}
+            if self.current_folder:
+                snapshot['folder_mtime'] = session_snapshot.folder_mtime(self.current_folder)
+                snapshot['file_list'] = [self.file_list.item(i).text() for i in range(self.file_list.count())]
+            if self.current_file and os.path.isfile(self.current_file):
+                with open(self.current_file, 'rb') as f:
+                    data = f.read()
+                entry = session_snapshot.fingerprint(self.current_file, data)
+                entry['cursor'] = self.editor.textCursor().position()
+                entry['top_line'] = self.scroll_sync.editor_top_line()
+                if self.last_render and self.last_render[0] == data.decode('utf-8', errors='replace'):
+                    _, head, body, source_lines, includes = self.last_render
+                    entry['preview'] = {'head': head, 'body': body, 'source_lines': source_lines,
+                                        'includes': includes}
+                snapshot['files'].append(entry)
+            session_snapshot.save_snapshot(snapshot)
+        except Exception as e:
+            print(f"保存会话快照时发生错误: {e}")
+
+    def restore_scroll(self, line):
+        """
+        恢复编辑区的滚动位置。大文档分批布局、分批高亮时行高和滚动范围还会变化，
+        因此每次范围变化都重新定位到该行，直到用户自己滚动或移动光标。
+        """
+        self.cancel_restore_scroll()
+        scrollbar = self.editor.verticalScrollBar()
+        self.scroll_sync.scroll_editor_to_line(line)
+        self._restore_scroll = lambda *_: self.scroll_sync.scroll_editor_to_line(line)
+        scrollbar.rangeChanged.connect(self._restore_scroll)
+        scrollbar.actionTriggered.connect(self.cancel_restore_scroll)
+        self.editor.cursorPositionChanged.connect(self.cancel_restore_scroll)
+
+    def cancel_restore_scroll(self, *_):
+        if self._restore_scroll is None:
+            return
+        self.editor.verticalScrollBar().rangeChanged.disconnect(self._restore_scroll)
+        self.editor.verticalScrollBar().actionTriggered.disconnect(self.cancel_restore_scroll)
+        self.editor.cursorPositionChanged.disconnect(self.cancel_restore_scroll)
+        self._restore_scroll = None
+
+    def closeEvent(self, event):
+        self.save_session_snapshot()
+        self.link_index.save()
+        self.metadata_index.save()
+        super().closeEvent(event)
 
     def initUI(self):
         try:
@@ -337,6 +670,7 @@ class MarkdownEditor(QMainWindow):
             menubar = self.menuBar()
             file_menu = menubar.addMenu('&文件')
             settings_menu = menubar.addMenu('&设置')
+            self.view_menu = menubar.addMenu('&视图')
 
             # 新建文件
             new_action = QAction('&新建', self)
@@ -362,18 +696,37 @@ class MarkdownEditor(QMainWindow):
             save_action.triggered.connect(self.save_file)
             file_menu.addAction(save_action)
 
+            # 与已保存的文件或其他文件比较
+            diff_action = QAction('与已保存文件比较', self)
+            diff_action.setShortcut('Ctrl+Shift+D')
+            diff_action.triggered.connect(lambda: self.show_diff())
+            file_menu.addAction(diff_action)
+            compare_action = QAction('与其他文件比较…', self)
+            compare_action.triggered.connect(self.compare_with_file)
+            file_menu.addAction(compare_action)
+
             # 插入图片
             insert_image_action = QAction('&插入图片', self)
             insert_image_action.setShortcut('Ctrl+I')
             insert_image_action.triggered.connect(self.insert_image)
             file_menu.addAction(insert_image_action)
 
+            # 批量导出 PDF
+            export_pdf_action = QAction('&批量导出 PDF', self)
+            export_pdf_action.triggered.connect(self.export_pdf_folder)
+            file_menu.addAction(export_pdf_action)
+
             # 退出
             exit_action = QAction('&退出', self)
             exit_action.setShortcut('Ctrl+Q')
             exit_action.triggered.connect(self.close)
             file_menu.addAction(exit_action)
 
+            rename_action = QAction("&重命名文件", self)
+            rename_action.setShortcut('F2')
+            rename_action.triggered.connect(self.rename_file)
+            file_menu.addAction(rename_action)
+
             delete_action = QAction("&删除文件", self)
             delete_action.setShortcut('Ctrl+D')
             delete_action.triggered.connect(self.del_file)
@@ -428,7 +781,9 @@ class MarkdownEditor(QMainWindow):
             right_splitter = QSplitter(Qt.Vertical)
 
             # 编辑区
-            self.editor = QTextEdit()
+            self.editor = MarkdownTextEdit()
+            self.editor.images_dropped.connect(self.import_images)
+            self.editor.completion_source = self.link_completions
             current_font = self.settings_manager.get_font()
             self.editor.setFont(current_font)
             # 应用 Markdown 高亮
@@ -441,10 +796,98 @@ class MarkdownEditor(QMainWindow):
 
             right_splitter.addWidget(self.editor)
 
+            # 大纲面板：由高亮器增量维护的标题索引驱动
+            self.outline_model = OutlineModel(self.editor.document(), self)
+            self.highlighter.outline = self.outline_model
+            self.outline_view = QListView()
+            self.outline_view.setModel(self.outline_model)
+            self.outline_view.setEditTriggers(QListView.NoEditTriggers)
+            self.outline_view.clicked.connect(self.goto_outline_item)
+            self.outline_dock = QDockWidget("大纲", self)
+            self.outline_dock.setWidget(self.outline_view)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.outline_dock)
+            self.view_menu.addAction(self.outline_dock.toggleViewAction())
+            self.editor.cursorPositionChanged.connect(self.sync_outline_selection)
+
+            # 后台检查器：问题以波浪线标出，并列在问题面板中
+            self.linter = DocumentLinter(self.editor.document(), self.outline_model,
+                                         MarkdownHighlighter.CODE_STATES, self)
+            self.highlighter.linter = self.linter
+            self.problem_view = QListView()
+            self.problem_view.setModel(self.linter.model)
+            self.problem_view.setUniformItemSizes(True)  # 只绘制可见的行，问题再多也不需要逐行计算尺寸
+            self.problem_view.setEditTriggers(QListView.NoEditTriggers)
+            self.problem_view.clicked.connect(self.goto_problem)
+            self.problem_dock = QDockWidget("问题", self)
+            self.problem_dock.setWidget(self.problem_view)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.problem_dock)
+            self.view_menu.addAction(self.problem_dock.toggleViewAction())
+            self.linter.changed.connect(self.show_lint_results)
+            # 波浪线只标出可见范围内的问题，滚动时更新
+            self.editor.verticalScrollBar().valueChanged.connect(self.update_lint_underlines)
+
+            # 差异面板：在后台比较编辑区与磁盘上的文件，打开时随编辑刷新
+            self.diff_path = None
+            self.diff_panel = DiffPanel()
+            self.diff_panel.set_font(current_font)
+            self.diff_panel.line_activated.connect(self.goto_block)
+            self.diff_panel.refresh_requested.connect(self.refresh_diff)
+            self.diff_dock = QDockWidget("差异", self)
+            self.diff_dock.setWidget(self.diff_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.diff_dock)
+            self.view_menu.addAction(self.diff_dock.toggleViewAction())
+            self.diff_dock.hide()
+            self.diff_timer = QTimer(self)
+            self.diff_timer.setSingleShot(True)
+            self.diff_timer.timeout.connect(self.refresh_diff)
+
+            # 链接面板：当前文件的反向链接与工作区中的失效链接
+            self.backlink_list = QListWidget()
+            self.backlink_list.itemClicked.connect(self.open_link_item)
+            self.dead_link_list = QListWidget()
+            self.dead_link_list.itemClicked.connect(self.open_link_item)
+            self.link_tabs = QTabWidget()
+            self.link_tabs.addTab(self.backlink_list, "反向链接")
+            self.link_tabs.addTab(self.dead_link_list, "失效链接")
+            self.link_dock = QDockWidget("链接", self)
+            self.link_dock.setWidget(self.link_tabs)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.link_dock)
+            self.view_menu.addAction(self.link_dock.toggleViewAction())
+            self.link_index.changed.connect(self.show_links)
+
+            # 元数据面板：按 front matter 中的字段筛选和排序工作区中的文件
+            self.metadata_panel = MetadataPanel(self.metadata_index)
+            self.metadata_panel.file_activated.connect(self.open_workspace_file)
+            self.metadata_dock = QDockWidget("元数据", self)
+            self.metadata_dock.setWidget(self.metadata_panel)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.metadata_dock)
+            self.tabifyDockWidget(self.link_dock, self.metadata_dock)
+            self.link_dock.raise_()
+            self.view_menu.addAction(self.metadata_dock.toggleViewAction())
+
+            # 状态栏中的文档统计，按块增量维护
+            self.doc_stats = DocumentStats(self.editor.document(), self)
+            self.stats_label = QLabel()
+            self.statusBar().addPermanentWidget(self.stats_label)
+            self.doc_stats.changed.connect(self.update_stats_label)
+            self.update_stats_label()
+
+            # 状态栏中的性能面板：各环节耗时（最近一次/p95）、文档规模、待渲染数与内存，每秒采样
+            self.perf_label = QLabel()
+            self.statusBar().addPermanentWidget(self.perf_label)
+            self.perf_timer = QTimer(self)
+            self.perf_timer.timeout.connect(self.update_perf_label)
+            perf_action = QAction('性能面板', self, checkable=True)
+            perf_action.toggled.connect(self.toggle_perf_hud)
+            self.view_menu.addAction(perf_action)
+            perf_action.setChecked(self.settings_manager.get_show_perf_hud())
+            self.toggle_perf_hud(perf_action.isChecked())
+
             # 预览区
-            self.preview = QWebEngineView()
-            self.preview.setContextMenuPolicy(Qt.NoContextMenu)  # 禁用右键菜单
+            self.preview = create_preview(self.settings_manager.get_preview_backend())
             right_splitter.addWidget(self.preview)
+            self.scroll_sync = ScrollSync(self.editor, self.preview, self)
+            self.scroll_sync.shown.connect(lambda: self.perf.stop('preview'))
 
             splitter.addWidget(right_splitter)
             splitter.setSizes([200, 1200])
@@ -470,6 +913,9 @@ class MarkdownEditor(QMainWindow):
                 QMessageBox.warning(self, "警告", f"未知的主题名称: {theme_name}")
                 return
 
+            # 先记下可见区域，设置调色板后布局会失效
+            visible_blocks = self.visible_block_range()
+
             palette = QPalette()
             for role, color in theme_config["palette"].items():
                 qcolor = QColor(color)
@@ -479,15 +925,27 @@ class MarkdownEditor(QMainWindow):
             # 设置全局调色板
             QApplication.setPalette(palette)
 
-            # 更新高亮器颜色
-            self.highlighter.set_theme(theme_config["highlighter"])
+            # 更新高亮器颜色：可见区域立即重新高亮，其余部分分批进行
+            self.highlighter.set_theme(theme_config["highlighter"], visible_blocks)
 
-            # 更新预览区以应用新的颜色
-            self.update_preview()
+            # 预览区只替换颜色变量，无需重新渲染
+            variables = theme_variables(theme_config["palette"]["Window"], theme_config["palette"]["WindowText"])
+            if not self.scroll_sync.set_theme(self.generate_css(), variables):
+                self.update_preview()
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"应用主题时发生错误: {e}")
 
+    def visible_block_range(self):
+        """返回编辑区中可见的 (首块号, 末块号)。"""
+        first = self.editor.cursorForPosition(QPoint(0, 0)).block()
+        layout = self.editor.document().documentLayout()
+        bottom = self.editor.verticalScrollBar().value() + self.editor.viewport().height()
+        block = first
+        while block.next().isValid() and layout.blockBoundingRect(block.next()).top() < bottom:
+            block = block.next()
+        return first.blockNumber(), block.blockNumber()
+
     def new_file(self):
         try:
             if self.maybe_save():
@@ -522,6 +980,8 @@ class MarkdownEditor(QMainWindow):
                         # 清空编辑区并设置新文件的路径
                         self.editor.clear()
                         self.current_file = new_file_path
+                        self.file_watcher.watch_file(new_file_path)
+                        self.linter.set_base_dir(os.path.dirname(new_file_path))
                         self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(self.current_file)}")
 
                         # 将新文件添加到左侧文件列表
@@ -543,6 +1003,10 @@ class MarkdownEditor(QMainWindow):
             folder = QFileDialog.getExistingDirectory(self, "选择文件夹", "")
             if folder:
                 self.current_folder = folder
+                self.file_watcher.watch_folder(folder)
+                self.link_index.set_folder(folder)
+                self.link_completer.set_folder(folder)
+                self.metadata_index.set_folder(folder)
                 self.populate_file_list(folder)
                 # 保存上次打开的文件夹
                 self.settings_manager.set_last_opened_folder(folder)
@@ -552,7 +1016,11 @@ class MarkdownEditor(QMainWindow):
     def del_file(self):
         try:
             if self.current_file:
-                reply = QMessageBox.question(self, "删除文件", f"确定要删除文件 '{os.path.basename(self.current_file)}' 吗？",
+                message = f"确定要删除文件 '{os.path.basename(self.current_file)}' 吗？"
+                sources = {source for source, _ in self.link_index.backlinks(self.current_file)}
+                if sources:
+                    message += f"\n工作区中有 {len(sources)} 个文件链接到它，删除后这些链接会失效。"
+                reply = QMessageBox.question(self, "删除文件", message,
                                              QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
                 if reply == QMessageBox.Yes:
                     os.remove(self.current_file)
@@ -584,19 +1052,266 @@ class MarkdownEditor(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"打开文件时发生错误: {e}")
 
-    def load_file(self, file_path):
+    def load_file(self, file_path, snapshot=None):
+        """
+        载入文件。snapshot 为会话快照中该文件的记录，文件未变化时恢复光标、
+        滚动位置，并直接显示缓存的预览。
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            self.editor.setPlainText(content)
+            # 先记录指纹再读取，读取期间发生的外部修改仍会被发现
+            self.file_watcher.watch_file(file_path)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            content = data.decode('utf-8')
+            if snapshot is not None and not session_snapshot.matches(snapshot, file_path, data):
+                snapshot = None
+
+            self.cancel_restore_scroll()
+            # 载入时只计算代码块状态，可见区域立即高亮，其余部分分批高亮
+            self.highlighter.begin_deferred()
+            try:
+                self.editor.setPlainText(content)
+            finally:
+                if snapshot is not None:
+                    cursor = self.editor.textCursor()
+                    cursor.setPosition(min(snapshot.get('cursor', 0), self.editor.document().characterCount() - 1))
+                    self.editor.setTextCursor(cursor)
+                    self.restore_scroll(snapshot.get('top_line', 0))
+                self.highlighter.end_deferred(self.visible_block_range())
             self.current_file = file_path
+            self.linter.set_base_dir(os.path.dirname(file_path))
             self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(file_path)}")
-            self.update_preview()  # 更新预览区
+            self.show_links()
+
+            cached = snapshot.get('preview') if snapshot is not None else None
+            # 被包含的片段在两次会话之间可能被修改，逐个比较内容哈希
+            if cached and cached['head'] == self.preview_head() and all(
+                    self.fragment_cache.digest(path) == digest for path, digest in cached.get('includes', {}).items()):
+                # 缓存的预览仍然有效，先直接显示，稍后在空闲时重新渲染一次
+                includes = cached.get('includes', {})
+                self.watch_includes(includes)
+                self.last_render = (content, cached['head'], cached['body'], cached['source_lines'], includes)
+                self.scroll_sync.show_html(cached['head'], cached['body'], self.preview_base_url(),
+                                           cached['source_lines'])
+                refresh = True
+            else:
+                self.update_preview()  # 更新预览区
+                refresh = False
+            # setPlainText 触发的防抖刷新已经不需要了
+            self.preview_update_timer.stop()
+            self.pending_renders = 0
+            if refresh:
+                # 窗口已经显示缓存的预览，防抖后照常重新渲染一次，保证与当前状态一致
+                self.preview_update_timer.start(300)
             # 保存上次打开的文件
             self.settings_manager.set_last_opened_file(file_path)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法打开文件: {e}")
 
+    def on_file_changed_externally(self, path):
+        """当前文件在外部被修改：没有未保存的修改时直接重新载入，否则先询问。"""
+        try:
+            if path != self.current_file:
+                return
+            name = os.path.basename(path)
+            if not os.path.exists(path):
+                self.statusBar().showMessage(f"文件 '{name}' 已在外部被删除", 5000)
+                return
+            if self.editor.document().isModified():
+                reply = QMessageBox.question(
+                    self, "文件已修改",
+                    f"文件 '{name}' 已在外部被修改，是否重新载入？\n编辑区中未保存的修改可以撤销找回。",
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+                if reply != QMessageBox.Yes:
+                    self.statusBar().showMessage("已保留编辑区的内容，保存时会再次确认", 5000)
+                    return
+            self.reload_file()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"重新载入文件时发生错误: {e}")
+
+    def reload_file(self):
+        """按差异把磁盘上的内容应用到文档，保留撤销历史、光标位置和未变化部分的高亮。"""
+        self.file_watcher.acknowledge()
+        with open(self.current_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        changes = apply_text_diff(self.editor.document(), content)
+        self.link_index.update_file(self.current_file)
+        self.metadata_index.update_file(self.current_file)
+        self.editor.document().setModified(False)
+        self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(self.current_file)}")
+        self.statusBar().showMessage(f"已重新载入外部修改（{changes} 处）", 3000)
+
+    def on_folder_changed_externally(self, folder):
+        """文件夹中增删了文件时刷新文件列表和链接索引。"""
+        if folder != self.current_folder:
+            return
+        self.refresh_file_list()
+        self.link_index.refresh()
+        self.link_completer.refresh()
+        self.metadata_index.refresh()
+
+    def link_completions(self, before):
+        """编辑区的补全来源：当前文档的锚点取自大纲，其他文件与图片取自工作区前缀树。"""
+        titles = [title for _, _, title in self.outline_model.headings()]
+        return self.link_completer.suggestions(before, self.current_file, titles)
+
+    def refresh_file_list(self):
+        """重新列出当前文件夹，并保持当前文件的选中状态。"""
+        folder = self.current_folder
+        if not folder:
+            return
+        self.populate_file_list(folder)
+        if self.current_file and os.path.dirname(self.current_file) == folder:
+            items = self.file_list.findItems(os.path.basename(self.current_file), Qt.MatchExactly)
+            if items:
+                self.file_list.setCurrentItem(items[0])
+
+    def show_links(self):
+        """刷新链接面板：当前文件的反向链接，以及整个工作区中的失效链接。"""
+        backlinks = self.link_index.backlinks(self.current_file) if self.current_file else []
+        self.backlink_list.clear()
+        for source, link in backlinks:
+            item = QListWidgetItem(f"{source}:{link.line + 1}  {link.text}")
+            item.setData(Qt.UserRole, (source, link.line))
+            self.backlink_list.addItem(item)
+        dead_links = self.link_index.dead_links()
+        self.dead_link_list.clear()
+        for source, link, reason in dead_links:
+            item = QListWidgetItem(f"{source}:{link.line + 1}  {reason}")
+            item.setData(Qt.UserRole, (source, link.line))
+            self.dead_link_list.addItem(item)
+        self.link_tabs.setTabText(0, f"反向链接 ({len(backlinks)})")
+        self.link_tabs.setTabText(1, f"失效链接 ({len(dead_links)})")
+
+    def open_link_item(self, item):
+        """打开链接所在的文件并跳到对应的行。"""
+        try:
+            source, line = item.data(Qt.UserRole)
+            path = os.path.join(self.link_index.folder, *source.split('/'))
+            if os.path.normcase(path) != os.path.normcase(self.current_file or ''):
+                if not self.maybe_save():
+                    return
+                self.load_file(path)
+            self.goto_block(line)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"打开链接时发生错误: {e}")
+
+    def open_workspace_file(self, source):
+        """打开元数据面板中双击的文件，source 为相对工作区的路径。"""
+        try:
+            path = os.path.join(self.metadata_index.folder, *source.split('/'))
+            if os.path.normcase(path) == os.path.normcase(self.current_file or ''):
+                return
+            if self.maybe_save():
+                self.load_file(path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"打开文件时发生错误: {e}")
+
+    def rename_file(self):
+        """重命名当前文件，并可同时改写工作区中指向它的链接。"""
+        try:
+            if not self.current_file:
+                return
+            old_path = self.current_file
+            old_name = os.path.basename(old_path)
+            name, ok = QInputDialog.getText(self, "重命名文件", "新文件名:", text=old_name)
+            name = name.strip()
+            if not ok or not name or name == old_name:
+                return
+            if not name.lower().endswith(('.md', '.markdown')):
+                name += '.md'
+            new_path = os.path.join(os.path.dirname(old_path), name)
+            if os.path.exists(new_path):
+                QMessageBox.warning(self, "警告", f"文件 '{name}' 已存在，请选择其他名称。")
+                return
+            if self.editor.document().isModified():
+                self.save_file()
+                if self.editor.document().isModified():
+                    return
+
+            edits = self.link_index.rename_edits(old_path, new_path)
+            count = sum(len(changes) for changes in edits.values())
+            if edits:
+                reply = QMessageBox.question(
+                    self, "重命名文件",
+                    f"工作区中有 {len(edits)} 个文件的 {count} 处链接指向 '{old_name}'，是否同时更新这些链接？",
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes)
+                if reply == QMessageBox.Cancel:
+                    return
+                if reply == QMessageBox.No:
+                    edits, count = {}, 0
+
+            os.rename(old_path, new_path)
+            self.current_file = new_path
+            self.file_watcher.watch_file(new_path)
+            self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {name}")
+            self.settings_manager.set_last_opened_file(new_path)
+            new_source = self.link_index.relative(new_path)
+            for source, changes in edits.items():
+                if source == new_source:
+                    continue
+                path = os.path.join(self.link_index.folder, *source.split('/'))
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    text = f.read()
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(apply_link_edits(text, changes))
+            if new_source in edits:
+                # 当前文件中指向自身的链接在编辑区中改写（可以撤销），再保存
+                self.replace_in_editor(edits[new_source])
+                self.save_file()
+            self.link_index.refresh()
+            self.refresh_file_list()
+            self.statusBar().showMessage(f"已重命名为 {name}，更新了 {count} 处链接", 3000)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"重命名文件时发生错误: {e}")
+
+    def replace_in_editor(self, edits):
+        """按 [(行号, 起始列, 长度, 新文字), ...] 改写编辑区，作为一步撤销。"""
+        document = self.editor.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for number, start, length, replacement in sorted(edits, reverse=True):
+            block = document.findBlockByNumber(number)
+            text = block.text()
+            cursor.setPosition(block.position() + utf16_len(text[:start]))
+            cursor.setPosition(block.position() + utf16_len(text[:start + length]), QTextCursor.KeepAnchor)
+            cursor.insertText(replacement)
+        cursor.endEditBlock()
+
+    def show_diff(self, path=None):
+        """在差异面板中比较编辑区与 path，默认为当前文件在磁盘上的内容。"""
+        try:
+            path = path or self.current_file
+            if not path:
+                QMessageBox.information(self, "差异", "当前文档还没有保存为文件。")
+                return
+            self.diff_path = path
+            self.diff_dock.show()
+            self.diff_dock.raise_()
+            self.refresh_diff()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"比较文件时发生错误: {e}")
+
+    def compare_with_file(self):
+        try:
+            file_name, _ = QFileDialog.getOpenFileName(
+                self, "选择要比较的文件", self.current_folder or "",
+                "Markdown Files (*.md *.markdown);;All Files (*)")
+            if file_name:
+                self.show_diff(file_name)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"比较文件时发生错误: {e}")
+
+    def refresh_diff(self):
+        if not self.diff_path:
+            return
+        try:
+            with open(self.diff_path, 'r', encoding='utf-8') as f:
+                old_text = f.read()
+        except OSError:
+            old_text = ""  # 文件已被删除，整篇显示为新增
+        self.diff_panel.compare(old_text, self.editor.toPlainText(), os.path.basename(self.diff_path))
+
     def load_selected_file(self, item):
         try:
             if self.maybe_save():
@@ -608,10 +1323,25 @@ class MarkdownEditor(QMainWindow):
     def save_file(self):
         try:
             if self.current_file:
+                if self.file_watcher.changed_on_disk():
+                    reply = QMessageBox.question(
+                        self, "文件已修改",
+                        f"文件 '{os.path.basename(self.current_file)}' 已在外部被修改，是否用编辑区的内容覆盖？",
+                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                    if reply != QMessageBox.Yes:
+                        return
+                self.perf.start('save')
+                text = self.editor.toPlainText()
                 with open(self.current_file, 'w', encoding='utf-8') as f:
-                    f.write(self.editor.toPlainText())
+                    f.write(text)
+                self.file_watcher.acknowledge()
+                self.perf.stop('save')
+                self.link_index.update_file(self.current_file, text)
+                self.metadata_index.update_file(self.current_file)
                 self.editor.document().setModified(False)
                 self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(self.current_file)}")
+                if self.diff_dock.isVisible():
+                    self.diff_timer.start(0)
             else:
                 self.save_file_as()
         except Exception as e:
@@ -624,9 +1354,14 @@ class MarkdownEditor(QMainWindow):
                 self, "保存 Markdown 文件", "",
                 "Markdown Files (*.md *.markdown);;All Files (*)", options=options)
             if file_name:
+                text = self.editor.toPlainText()
                 with open(file_name, 'w', encoding='utf-8') as f:
-                    f.write(self.editor.toPlainText())
+                    f.write(text)
                 self.current_file = file_name
+                self.file_watcher.watch_file(file_name)
+                self.link_index.update_file(file_name, text)
+                self.metadata_index.update_file(file_name)
+                self.linter.set_base_dir(os.path.dirname(file_name))
                 self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(file_name)}")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法保存文件: {e}")
@@ -634,10 +1369,14 @@ class MarkdownEditor(QMainWindow):
     def maybe_save(self):
         try:
             if self.editor.document().isModified():
-                ret = QMessageBox.warning(
-                    self, "警告",
-                    "文档已修改但未保存。是否保存？",
-                    QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
+                box = QMessageBox(QMessageBox.Warning, "警告", "文档已修改但未保存。是否保存？",
+                                  QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, self)
+                diff_button = box.addButton("查看差异", QMessageBox.ActionRole) if self.current_file else None
+                ret = box.exec_()
+                if diff_button is not None and box.clickedButton() is diff_button:
+                    # 先查看改动，取消本次操作
+                    self.show_diff()
+                    return False
                 if ret == QMessageBox.Save:
                     self.save_file()
                     return True
@@ -649,37 +1388,163 @@ class MarkdownEditor(QMainWindow):
             return False
 
     def on_text_changed(self):
+        # 分批重新高亮只修改格式，但每批结束时同样会发出 textChanged，不需要刷新预览
+        if self.highlighter.restyling:
+            return
         # 每次文本变化时，重新启动防抖定时器
+        self.pending_renders += 1
         self.preview_update_timer.start(300)  # 300毫秒后执行预览更新
-
-    def update_preview(self):
+        if self.diff_dock.isVisible() and self.diff_path:
+            self.diff_timer.start(1000)
+
+    def goto_block(self, block_number):
+        """把光标移动到指定块的开头。"""
+        block = self.editor.document().findBlockByNumber(block_number)
+        if block.isValid():
+            self.editor.setTextCursor(QTextCursor(block))
+            self.editor.ensureCursorVisible()
+            self.editor.setFocus()
+
+    def goto_outline_item(self, index):
         try:
-            md_text = self.editor.toPlainText()
-            html = markdown.markdown(
-                md_text,
-                extensions=['fenced_code', 'tables', 'codehilite'],
-                extension_configs={
-                    'codehilite': {
-                        'noclasses': False,  # 使用类而不是行内样式
-                        'guess_lang': False  # 禁止自动猜测语言
-                    }
-                }
-            )
-            # 生成 CSS 和引入 highlight.js
-            css = self.generate_css()
-            # 组合完整的 HTML
-            full_html = f"<head>{css}</head><body>{html}</body>"
+            self.goto_block(index.data(OutlineModel.BlockNumberRole))
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"跳转到标题时发生错误: {e}")
 
-            # 设置 baseUrl 为当前文件所在目录
-            if self.current_file:
-                base_url = QUrl.fromLocalFile(os.path.dirname(self.current_file) + os.sep)
+    def goto_problem(self, index):
+        try:
+            self.goto_block(index.data(DiagnosticModel.LineRole))
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"跳转到问题时发生错误: {e}")
+
+    def show_lint_results(self, first, last):
+        """检查完成：问题面板由模型自动更新，只有结果变化的范围可见时才重新标出波浪线。"""
+        count = self.linter.model.rowCount()
+        self.problem_dock.setWindowTitle(f"问题 ({count})" if count else "问题")
+        visible_first, visible_last = self.visible_block_range()
+        if first <= visible_last and last >= visible_first:
+            self.update_lint_underlines()
+
+    def update_lint_underlines(self):
+        """用波浪下划线标出编辑区可见范围内的问题；选区的光标会随编辑自动移动。"""
+        doc = self.editor.document()
+        selections = []
+        for diagnostic in self.linter.between(*self.visible_block_range()):
+            block = doc.findBlockByNumber(diagnostic.line)
+            if not block.isValid():
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+            selection.format.setUnderlineColor(QColor("#ff0000"))
+            selection.format.setToolTip(diagnostic.message)
+            cursor = QTextCursor(block)
+            cursor.setPosition(block.position() + diagnostic.start)
+            if diagnostic.length < 0:
+                cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
             else:
-                base_url = QUrl()
+                cursor.setPosition(block.position() + diagnostic.start + diagnostic.length,
+                                   QTextCursor.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+        self.editor.setExtraSelections(selections)
+
+    def sync_outline_selection(self):
+        """在大纲中选中光标所在的章节（二分查找，不遍历文档）。"""
+        row = self.outline_model.section_at(self.editor.textCursor().blockNumber())
+        if row < 0:
+            self.outline_view.clearSelection()
+        elif self.outline_view.currentIndex().row() != row:
+            self.outline_view.setCurrentIndex(self.outline_model.index(row))
+
+    def update_stats_label(self):
+        stats = self.doc_stats
+        self.stats_label.setText(
+            f"单词: {stats.words}  中日韩字符: {stats.cjk}  字符: {stats.chars}  "
+            f"预计阅读: {stats.reading_minutes():.1f} 分钟")
+
+    def toggle_perf_hud(self, checked):
+        self.settings_manager.set_show_perf_hud(checked)
+        self.perf_label.setVisible(checked)
+        # 高亮逐块调用，面板关闭时不计时
+        self.highlighter.perf = self.perf if checked else None
+        if checked:
+            self.update_perf_label()
+            self.perf_timer.start(1000)
+        else:
+            self.perf_timer.stop()
+
+    def update_perf_label(self):
+        doc = self.editor.document()
+        queue = self.pending_renders + (1 if self.perf.running('preview') else 0)
+        rss = process_rss()
+        memory = f"{rss / 1024 / 1024:.0f} MB" if rss is not None else "-"
+        self.perf_label.setText(
+            f"{self.perf.summary()}  大小: {doc.characterCount() / 1024:.0f} KB  块: {doc.blockCount()}  "
+            f"待渲染: {queue}  内存: {memory}")
+
+    def set_preview_backend(self, name):
+        """运行时切换预览后端，旧的预览控件（及其渲染进程）随之释放。"""
+        if self.preview.backend_name == name:
+            return
+        old = self.preview
+        splitter = old.parentWidget()
+        self.preview = create_preview(name)
+        splitter.replaceWidget(splitter.indexOf(old), self.preview)
+        old.deleteLater()
+        self.scroll_sync.set_preview(self.preview)
+        self.update_preview()
 
-            self.preview.setHtml(full_html, base_url)
+    def update_preview(self):
+        try:
+            md_text = self.editor.toPlainText()
+            # 渲染时为顶层元素标注源码行号，供滚动同步使用；本地图片换成缩略图并预留尺寸；
+            # 展开包含指令，没有变化的段和片段直接取缓存
+            self.pending_renders = 0
+            self.perf.start('render')
+            html, source_lines, dependencies = render_document(
+                md_text, self.current_file, self.fragment_cache,
+                source_map=True, image_resolver=self.thumbnail_cache.resolve)
+            self.perf.stop('render')
+            self.watch_includes(dependencies)
+            css = self.preview_head()
+            includes = {path: self.fragment_cache.digest(path) for path in dependencies}
+            self.last_render = (md_text, css, html, source_lines, includes)
+
+            # 样式未变化时原地替换正文，不会把预览重置到顶部
+            self.perf.start('preview')
+            self.scroll_sync.show_html(css, html, self.preview_base_url(), source_lines)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"更新预览时发生错误: {e}")
 
+    def watch_includes(self, paths):
+        """只监视当前文档包含的文件。"""
+        watched = set(self.include_watcher.files())
+        wanted = {path for path in paths if os.path.exists(path)}
+        if watched - wanted:
+            self.include_watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.include_watcher.addPaths(list(wanted - watched))
+
+    def on_include_changed(self, path):
+        """被包含的文件在外部修改后，只有依赖它的文档需要重新渲染。"""
+        affected = self.fragment_cache.invalidate(path)
+        if os.path.exists(path) and path not in self.include_watcher.files():
+            # 改名保存的文件会从监视列表中消失
+            self.include_watcher.addPath(path)
+        if self.current_file and os.path.normcase(os.path.abspath(self.current_file)) in {
+                os.path.normcase(p) for p in affected}:
+            self.preview_update_timer.start(300)
+
+    def preview_head(self):
+        # 生成 CSS 和引入 highlight.js
+        return self.generate_css() + LAZY_IMAGE_SCRIPT
+
+    def preview_base_url(self):
+        # 设置 baseUrl 为当前文件所在目录
+        if self.current_file:
+            return QUrl.fromLocalFile(os.path.dirname(self.current_file) + os.sep)
+        return QUrl()
+
     def generate_css(self):
         """
         生成当前编辑器和预览区的 CSS 样式
@@ -692,57 +1557,7 @@ class MarkdownEditor(QMainWindow):
         font_family = font.family()
         font_size = font.pointSize()
 
-        # 选择一个 highlight.js 主题，例如 GitHub
-        highlight_css = """
-        <link rel="stylesheet"
-              href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/styles/github.min.css">
-        """
-
-        highlight_js = """
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/highlight.min.js"></script>
-        <script>hljs.highlightAll();</script>
-        """
-
-        css = f"""
-        <style>
-            body {{
-                background-color: {bg_color};
-                color: {text_color};
-                font-family: "{font_family}";
-                font-size: {font_size}pt;
-                padding: 20px;
-            }}
-            pre {{
-                background-color: #f0f0f0;
-                color: #333333;
-                padding: 10px;
-                border-radius: 5px;
-                overflow: auto;
-            }}
-            code {{
-                background-color: #f0f0f0;
-                color: #333333;
-                padding: 2px 4px;
-                border-radius: 3px;
-            }}
-            table {{
-                border-collapse: collapse;
-            }}
-            table, th, td {{
-                border: 1px solid #555555;
-            }}
-            th, td {{
-                padding: 8px;
-                text-align: left;
-            }}
-            a {{
-                color: #1e90ff;
-            }}
-        </style>
-        {highlight_css}
-        {highlight_js}
-        """
-        return css
+        return build_css(bg_color, text_color, font_family, font_size)
 
     def init_auto_save(self):
         try:
@@ -755,8 +1570,19 @@ class MarkdownEditor(QMainWindow):
     def auto_save(self):
         try:
             if self.current_file and self.editor.document().isModified():
+                if self.file_watcher.changed_on_disk():
+                    # 不覆盖外部的修改；通知可能还在防抖中，立即检查一次
+                    self.statusBar().showMessage("文件已在外部被修改，自动保存已暂停", 5000)
+                    self.file_watcher.check(self.current_file)
+                    return
+                self.perf.start('save')
+                text = self.editor.toPlainText()
                 with open(self.current_file, 'w', encoding='utf-8') as f:
-                    f.write(self.editor.toPlainText())
+                    f.write(text)
+                self.file_watcher.acknowledge()
+                self.perf.stop('save')
+                self.link_index.update_file(self.current_file, text)
+                self.metadata_index.update_file(self.current_file)
                 self.editor.document().setModified(False)
                 self.setWindowTitle(f"Cmx的 Markdown 编辑器 - {os.path.basename(self.current_file)}")
                 # 为了避免频繁弹出提示，注释掉以下行
@@ -764,6 +1590,29 @@ class MarkdownEditor(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"自动保存时发生错误: {e}")
 
+    def export_pdf_folder(self):
+        try:
+            folder = self.current_folder or QFileDialog.getExistingDirectory(self, "选择要导出的文件夹", "")
+            if not folder:
+                return
+            output = QFileDialog.getExistingDirectory(self, "选择 PDF 输出目录", folder)
+            if not output:
+                return
+            self.pdf_exporter = PdfBatchExporter(folder, output, self.generate_css(), parent=self)
+            self.pdf_exporter.progress.connect(
+                lambda relative, ok, seconds: self.statusBar().showMessage(
+                    f"已导出 {relative}" if ok else f"导出失败 {relative}", 3000))
+            self.pdf_exporter.finished.connect(self.on_pdf_export_finished)
+            self.pdf_exporter.start()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"批量导出 PDF 时发生错误: {e}")
+
+    def on_pdf_export_finished(self, stats):
+        QMessageBox.information(
+            self, "批量导出 PDF",
+            f"导出 {stats['exported']} 个，跳过 {stats['skipped']} 个未修改文件，失败 {stats['failed']} 个，"
+            f"耗时 {stats['elapsed']:.1f} 秒。")
+
     def open_settings(self):
         try:
             dialog = SettingsDialog(self)
@@ -817,30 +1666,60 @@ class MarkdownEditor(QMainWindow):
     def insert_image(self):
         try:
             options = QFileDialog.Options()
-            image_path, _ = QFileDialog.getOpenFileName(
+            image_paths, _ = QFileDialog.getOpenFileNames(
                 self, "选择图片", "",
-                "Image Files (*.png *.jpg *.jpeg *.bmp *.gif);;All Files (*)", options=options)
-            if image_path:
-                # 将图片复制到当前文件夹下的images目录
-                if self.current_file:
-                    images_dir = os.path.join(os.path.dirname(self.current_file), 'images')
-                    os.makedirs(images_dir, exist_ok=True)
-                    image_name = os.path.basename(image_path)
-                    new_image_path = os.path.join(images_dir, image_name)
-                    if not os.path.exists(new_image_path):
-                        try:
-                            shutil.copy(image_path, new_image_path)
-                        except Exception as e:
-                            QMessageBox.critical(self, "错误", f"无法复制图片: {e}")
-                            return
-                    relative_path = os.path.relpath(new_image_path, os.path.dirname(self.current_file))
-                    cursor = self.editor.textCursor()
-                    markdown_image = f"![图片]({relative_path})"
-                    cursor.insertText(markdown_image)
-                    self.editor.setTextCursor(cursor)
-                    # 不需要在这里启动防抖定时器，因为 textChanged 已经处理
+                "Image Files (*.png *.jpg *.jpeg *.bmp *.gif *.webp *.svg);;All Files (*)", options=options)
+            if image_paths:
+                self.import_images(image_paths)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"插入图片时发生错误: {e}")
+
+    def images_dir(self):
+        """图片统一存放在工作区（或当前文件所在目录）的 images 目录下，按内容去重。"""
+        file_dir = os.path.dirname(self.current_file)
+        if self.current_folder:
+            folder = os.path.abspath(self.current_folder)
+            if os.path.commonpath([folder, os.path.abspath(file_dir)]) == folder:
+                return os.path.join(folder, 'images')
+        return os.path.join(file_dir, 'images')
+
+    def import_images(self, paths):
+        try:
+            if not self.current_file:
+                QMessageBox.warning(self, "警告", "请先保存文件后再插入图片。")
+                return
+            # 记录插入位置：QTextCursor 会随文档编辑自动移动
+            cursor = QTextCursor(self.editor.textCursor())
+            self.statusBar().showMessage(f"正在导入 {len(paths)} 张图片…")
+            self.asset_importer.submit(paths, self.images_dir(), self.settings_manager.get_web_image_width(),
+                                       (self.current_file, cursor))
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导入图片时发生错误: {e}")
+
+    def on_images_imported(self, results, context):
+        try:
+            file_path, cursor = context
+            failed = [f"{os.path.basename(r.source)}: {r.error}" for r in results if r.error]
+            stored = [r for r in results if not r.error]
+            self.statusBar().showMessage(f"已导入 {len(stored)} 张图片", 3000)
+            if failed:
+                QMessageBox.critical(self, "错误", "无法复制图片:\n" + "\n".join(failed))
+            # 导入期间切换了文件时不再插入引用
+            if file_path != self.current_file or not stored:
+                return
+            base_dir = os.path.dirname(self.current_file)
+            lines = []
+            for result in stored:
+                relative_path = os.path.relpath(result.stored, base_dir).replace(os.sep, '/')
+                if result.variant:
+                    # 显示网页尺寸的版本，点击打开原图
+                    variant_path = os.path.relpath(result.variant, base_dir).replace(os.sep, '/')
+                    lines.append(f"[![图片]({variant_path})]({relative_path})")
                 else:
-                    QMessageBox.warning(self, "警告", "请先保存文件后再插入图片。")
+                    lines.append(f"![图片]({relative_path})")
+            cursor.insertText("\n".join(lines))
+            self.editor.setTextCursor(cursor)
+            # 不需要在这里启动防抖定时器，因为 textChanged 已经处理
         except Exception as e:
             QMessageBox.critical(self, "错误", f"插入图片时发生错误: {e}")
 
@@ -872,6 +1751,8 @@ class MarkdownEditor(QMainWindow):
 
 def main():
     try:
+        # 预览后端和 PDF 导出在需要时才导入 QtWebEngine，这要求创建 QApplication 之前开启 OpenGL 上下文共享
+        QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
         app = QApplication(sys.argv)
         app.setApplicationName("Cmx的 Markdown 编辑器")
 
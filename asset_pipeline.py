@@ -0,0 +1,94 @@
+# asset_pipeline.py
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.svg')
+# 这些格式不生成缩小版本（动图、矢量图）
+NO_VARIANT_SUFFIXES = ('.gif', '.svg')
+
+# 一张图片的导入结果；variant 为缩小后的网页版本（没有生成时为 None），error 为失败原因
+ImportResult = namedtuple('ImportResult', ['source', 'stored', 'variant', 'error'])
+
+
+def content_name(path, chunk_size=1 << 20):
+    """按内容哈希生成文件名（保留小写扩展名），相同内容的图片得到相同的名字。"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16] + os.path.splitext(path)[1].lower()
+
+
+def _temp_path(target):
+    return f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_scaled(source, target, width):
+    """把图片缩小到指定宽度写入 target；图片不比 width 宽或无法读取时返回 False。"""
+    image = QImage(source)
+    if image.isNull() or image.width() <= width:
+        return False
+    temp = _temp_path(target)
+    scaled = image.scaledToWidth(width, Qt.SmoothTransformation)
+    if not scaled.save(temp, os.path.splitext(target)[1][1:].upper()):
+        return False
+    os.replace(temp, target)
+    return True
+
+
+def import_image(source, images_dir, web_width=0):
+    """
+    在工作线程中导入一张图片：以内容哈希命名复制到 images_dir，已存在则直接复用；
+    web_width 大于 0 且图片更宽时，额外写入一个缩小到该宽度的版本。
+    """
+    try:
+        os.makedirs(images_dir, exist_ok=True)
+        name = content_name(source)
+        stored = os.path.join(images_dir, name)
+        if not os.path.exists(stored):
+            temp = _temp_path(stored)
+            shutil.copyfile(source, temp)
+            os.replace(temp, stored)
+
+        variant = None
+        stem, suffix = os.path.splitext(name)
+        if web_width > 0 and suffix not in NO_VARIANT_SUFFIXES:
+            variant = os.path.join(images_dir, f"{stem}.w{web_width}{suffix}")
+            if not os.path.exists(variant) and not write_scaled(stored, variant, web_width):
+                variant = None
+        return ImportResult(source, stored, variant, None)
+    except Exception as e:
+        return ImportResult(source, None, None, str(e))
+
+
+class AssetImporter(QObject):
+    """在后台线程中批量导入图片，完成后通过 finished 信号把结果送回界面线程。"""
+
+    finished = pyqtSignal(object, object)  # [ImportResult, ...], 调用方传入的上下文
+
+    def __init__(self, parent=None, max_workers=2):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, paths, images_dir, web_width=0, context=None):
+        """异步导入一组图片；结果按 paths 的顺序返回。"""
+        futures = [self._executor.submit(import_image, path, images_dir, web_width) for path in paths]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.finished.emit([f.result() for f in futures], context)
+
+        for future in futures:
+            future.add_done_callback(done)
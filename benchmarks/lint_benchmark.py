@@ -0,0 +1,122 @@
+# lint_benchmark.py
+#
+# Markdown 检查器基准测试：
+#   1. 全文检查（lint_blocks）在不同文档规模下的耗时与吞吐量；
+#   2. 增量检查：在文档中做单字符修改，分别测量修改本身（Qt 文档与布局、
+#      所有 contentsChange 槽函数）的耗时，以及从修改完成到检查结果更新的耗时；
+#      后者理想情况下与文档大小无关。
+#
+# 用法: python benchmarks/lint_benchmark.py [--sizes 1000,10000,100000] [--edits 50]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QTextDocument, QTextCursor
+from PyQt5.QtCore import QEventLoop, QTimer
+from md_linter import DocumentLinter, lint_blocks
+from outline import OutlineModel
+
+SNIPPETS = [
+    "## 第 {i} 节",
+    "普通段落，包含一些 English words 和 **加粗** 文本 {i}。",
+    "| 列 A | 列 B | 列 C |\n|---|---|---|\n| 1 | 2 | 3 |\n| 4 | 5 |",
+    "![截图](images/shot_{i}.png)",
+    "```python\nprint({i})\n```",
+    "- 列表项 {i}\n- 列表项 {i}",
+    "",
+]
+
+
+def generate_document(lines):
+    random.seed(lines)
+    parts = []
+    count = 0
+    i = 0
+    while count < lines:
+        text = random.choice(SNIPPETS).format(i=i)
+        parts.append(text)
+        count += text.count("\n") + 1
+        i += 1
+    return "\n".join(parts)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench_full(text, base_dir):
+    items = [(n, line, False) for n, line in enumerate(text.split("\n"))]
+    start = time.perf_counter()
+    lint_blocks(items, base_dir)
+    return time.perf_counter() - start
+
+
+def bench_incremental(text, base_dir, edits):
+    DocumentLinter.DEBOUNCE_MS = 0
+    document = QTextDocument()
+    # 没有布局的文档不会发出 contentsChange，这里和 QTextEdit 一样先创建布局
+    document.documentLayout()
+    document.setPlainText(text)
+    outline = OutlineModel(document)
+    linter = DocumentLinter(document, outline, ())
+    linter.set_base_dir(base_dir)
+
+    loop = QEventLoop()
+    linter.changed.connect(loop.quit)
+    guard = QTimer()
+    guard.setSingleShot(True)
+    guard.timeout.connect(loop.quit)
+
+    def wait():
+        guard.start(60000)
+        loop.exec_()
+
+    wait()  # 首次全文检查
+
+    edit_timings = []
+    lint_timings = []
+    cursor = QTextCursor(document)
+    for _ in range(edits):
+        cursor.setPosition(random.randint(0, document.characterCount() - 1))
+        start = time.perf_counter()
+        cursor.insertText(random.choice("ab|#"))
+        edited = time.perf_counter()
+        wait()
+        edit_timings.append(edited - start)
+        lint_timings.append(time.perf_counter() - edited)
+    return edit_timings, lint_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown 检查器基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="文档行数，逗号分隔")
+    parser.add_argument("--edits", type=int, default=50, help="每个规模下的增量修改次数")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    base_dir = tempfile.mkdtemp()
+
+    print(f"{'行数':>8} {'大小(KB)':>9} {'全文(ms)':>9} {'行/秒':>9} "
+          f"{'修改 p50(ms)':>12} {'检查 p50(ms)':>12} {'检查 p95(ms)':>12}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        text = generate_document(size)
+        full = bench_full(text, base_dir)
+        edit_timings, lint_timings = bench_incremental(text, base_dir, args.edits)
+        print(f"{size:>8} {len(text.encode('utf-8')) / 1024:>9.0f} {full * 1000:>9.1f} {size / full:>9.0f} "
+              f"{statistics.median(edit_timings) * 1000:>12.2f} "
+              f"{statistics.median(lint_timings) * 1000:>12.2f} "
+              f"{percentile(lint_timings, 0.95) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
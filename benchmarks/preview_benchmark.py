@@ -0,0 +1,167 @@
+# preview_benchmark.py
+#
+# 预览后端基准测试：对每个后端分别启动一个子进程，测量
+#   1. 常驻内存：空进程（已创建 QApplication）、创建预览控件并加载文档后的 RSS，
+#      包括子进程（QtWebEngine 的渲染进程等）；
+#   2. 刷新延迟：首次整体加载，以及逐次修改后只替换正文（update_body）的耗时。
+# 读取 /proc 统计内存，只支持 Linux。
+#
+# 用法: python benchmarks/preview_benchmark.py [--backends webengine,textbrowser] [--lines 5000] [--refreshes 20]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECTION = """## 第 {i} 节
+
+普通段落，包含一些 English words、**加粗**、*斜体* 和 `行内代码` {i}。
+
+- 列表项 {i}
+- 列表项 {i}
+
+| 列 A | 列 B |
+|---|---|
+| {i} | {i} |
+
+```python
+print({i})
+```
+"""
+
+
+def generate_document(lines):
+    parts = []
+    i = 0
+    while sum(part.count("\n") for part in parts) < lines:
+        parts.append(SECTION.format(i=i))
+        i += 1
+    return "\n".join(parts)
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def descendants(pid):
+    result = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    result.append(int(child))
+                    result.extend(descendants(int(child)))
+    except OSError:
+        pass
+    return result
+
+
+def total_rss_kb():
+    pid = os.getpid()
+    return rss_kb(pid) + sum(rss_kb(child) for child in descendants(pid))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_child(backend, lines, refreshes):
+    """在子进程中测量单个后端，结果以一行 JSON 输出。"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QEventLoop, QTimer, QUrl
+    from PyQt5.QtWidgets import QApplication
+    from preview_backend import create_preview
+    from renderer import render_markdown, build_css
+
+    app = QApplication(sys.argv[:1])
+    done = []
+
+    def wait():
+        # textbrowser 同步完成，webengine 需要等待渲染进程回调
+        while not done:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        done.clear()
+
+    def settle(ms=500):
+        loop = QEventLoop()
+        QTimer.singleShot(ms, loop.quit)
+        loop.exec_()
+
+    settle()
+    baseline = total_rss_kb()
+
+    text = generate_document(lines)
+    css = build_css("#ffffff", "#000000", "Consolas", 12)
+    preview = create_preview(backend)
+    preview.resize(800, 1000)
+    preview.show()
+    preview.loaded.connect(lambda ok: done.append(ok))
+
+    html, _ = render_markdown(text, source_map=True)
+    start = time.perf_counter()
+    preview.set_html(css, html, QUrl.fromLocalFile(ROOT + os.sep))
+    wait()
+    first_load = time.perf_counter() - start
+    settle()
+    loaded = total_rss_kb()
+
+    timings = []
+    for n in range(refreshes):
+        html, _ = render_markdown(f"{text}\n\n修改 {n}\n", source_map=True)
+        start = time.perf_counter()
+        preview.update_body(html, lambda: done.append(True))
+        wait()
+        timings.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        "backend": backend, "baseline_kb": baseline, "loaded_kb": loaded, "first_load": first_load,
+        "refresh_p50": statistics.median(timings) if timings else 0.0,
+        "refresh_p95": percentile(timings, 0.95) if timings else 0.0,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预览后端内存与刷新延迟基准测试")
+    parser.add_argument("--backends", default="webengine,textbrowser", help="要测量的后端，逗号分隔")
+    parser.add_argument("--lines", type=int, default=5000, help="测试文档的行数")
+    parser.add_argument("--refreshes", type=int, default=20, help="正文刷新次数")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.lines, args.refreshes)
+        return
+
+    print(f"{'后端':>12} {'空进程(MB)':>10} {'加载后(MB)':>10} {'增量(MB)':>9} "
+          f"{'首次加载(ms)':>12} {'刷新 p50(ms)':>12} {'刷新 p95(ms)':>12}")
+    for backend in args.backends.split(","):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", backend,
+             "--lines", str(args.lines), "--refreshes", str(args.refreshes)],
+            capture_output=True, text=True)
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if output.returncode != 0 or not lines:
+            print(f"{backend:>12} 运行失败: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(lines[-1])
+        print(f"{backend:>12} {r['baseline_kb'] / 1024:>10.1f} {r['loaded_kb'] / 1024:>10.1f} "
+              f"{(r['loaded_kb'] - r['baseline_kb']) / 1024:>9.1f} {r['first_load'] * 1000:>12.1f} "
+              f"{r['refresh_p50'] * 1000:>12.1f} {r['refresh_p95'] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# render_daemon_benchmark.py
+#
+# 渲染服务压力测试：启动 render_daemon（或连接已在运行的服务），用多个并发客户端
+# 在持久连接上发送渲染请求，报告每秒请求数与延迟分布（p50/p95/p99/最大值）。
+#   - miss：每个请求的文档都不同，测量进程池与批处理的吞吐量；
+#   - hit：反复请求少量文档，测量共享结果缓存命中时的开销；
+#   - spawn：作为对照，每个文件启动一次 Python 解释器渲染（构建脚本原来的做法）。
+#
+# 用法: python benchmarks/render_daemon_benchmark.py [--url http://127.0.0.1:8765]
+#           [-j 服务进程数] [--clients 8] [--requests 2000] [--lines 200] [--spawn 10]
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECTION = """## 第 {i} 节
+
+普通段落，包含一些 English words、**加粗**、*斜体* 和 `行内代码` {i}。
+
+- 列表项 {i}
+- 列表项 {i}
+
+| 列 A | 列 B |
+|---|---|
+| {i} | {i} |
+
+```python
+print({i})
+```
+"""
+
+
+def generate_document(lines, seed):
+    parts = [f"# 文档 {seed}\n"]
+    i = 0
+    while sum(part.count("\n") for part in parts) < lines:
+        parts.append(SECTION.format(i=f"{seed}-{i}"))
+        i += 1
+    return "\n".join(parts)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def start_daemon(jobs):
+    """在子进程中启动服务（随机端口），返回 (进程, 地址)。"""
+    command = [sys.executable, os.path.join(ROOT, "render_daemon.py"), "--port", "0"]
+    if jobs:
+        command += ["-j", str(jobs)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "http://" not in line:
+        process.kill()
+        raise RuntimeError(f"渲染服务启动失败: {line.strip()}")
+    return process, line[line.index("http://"):].split()[0].rstrip("/")
+
+
+def run_clients(url, documents, clients, requests):
+    """clients 个线程各用一个持久连接，轮流发送 documents 中的文档，共 requests 个请求。"""
+    address = urlparse(url)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        connection = http.client.HTTPConnection(address.hostname, address.port)
+        local = []
+        for n in counter:
+            body = json.dumps({"text": documents[n % len(documents)]}).encode("utf-8")
+            start = time.perf_counter()
+            connection.request("POST", "/render", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            result = json.loads(response.read())
+            local.append(time.perf_counter() - start)
+            if response.status != 200 or "error" in result:
+                with lock:
+                    errors.append(result.get("error", response.status))
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, errors
+
+
+def fetch_stats(url):
+    address = urlparse(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port)
+    connection.request("GET", "/stats")
+    return json.loads(connection.getresponse().read())
+
+
+def spawn_per_file(documents):
+    """对照组：每个文档启动一个解释器渲染，返回每个文件的耗时。"""
+    script = "import sys, renderer; renderer.render_markdown(sys.stdin.read(), source_map=True)"
+    timings = []
+    for text in documents:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script], input=text, text=True, cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, elapsed, latencies, errors):
+    print(f"{name:>6} {len(latencies):>8} {len(latencies) / elapsed:>10.1f} "
+          f"{statistics.median(latencies) * 1000:>9.2f} {percentile(latencies, 0.95) * 1000:>9.2f} "
+          f"{percentile(latencies, 0.99) * 1000:>9.2f} {max(latencies) * 1000:>9.2f} {len(errors):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染服务吞吐量与尾延迟测试")
+    parser.add_argument("--url", help="已在运行的服务地址（默认启动一个新服务）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="启动服务时的渲染进程数")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=2000, help="每轮的请求数")
+    parser.add_argument("--lines", type=int, default=200, help="每个测试文档的行数")
+    parser.add_argument("--spawn", type=int, default=10, help="对照组逐个启动解释器渲染的文件数（0 表示跳过）")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_daemon(args.jobs)
+    try:
+        unique = [generate_document(args.lines, seed) for seed in range(args.requests)]
+        print(f"服务 {url}，{args.clients} 个客户端，每个文档 {args.lines} 行")
+        print(f"{'模式':>6} {'请求数':>8} {'请求/s':>10} {'p50(ms)':>9} {'p95(ms)':>9} "
+              f"{'p99(ms)':>9} {'最大(ms)':>9} {'错误':>6}")
+        report("miss", *run_clients(url, unique, args.clients, args.requests))
+        report("hit", *run_clients(url, unique[:16], args.clients, args.requests))
+        stats = fetch_stats(url)
+        print(f"服务统计: {stats['workers']} 个工作进程，渲染 {stats['renders']} 次，"
+              f"缓存命中 {stats['hits']} 次，平均批大小 {stats['average_batch']}")
+    finally:
+        if process is not None:
+            process.terminate()  # 服务收到 SIGTERM 后关闭进程池再退出
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    if args.spawn:
+        timings = spawn_per_file(unique[:args.spawn])
+        print(f"对照：每个文件启动一次解释器，平均 {statistics.mean(timings) * 1000:.1f} ms/文件，"
+              f"{len(timings) / sum(timings):.1f} 文件/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# typing_benchmark.py
+#
+# 按键到屏幕的延迟回放测试：在无界面（offscreen）的 MarkdownEditor 中回放打字会话，
+# 逐个事件测量从按键到界面重新空闲的耗时。这段时间包括 textChanged 与 contentsChange
+# 的所有槽函数、语法高亮、零延时定时器（大纲、检查器等）、预览防抖定时器的调度，
+# 以及编辑区的一次同步重绘。预览本身的渲染是防抖之后的事，不计入单个按键的延迟。
+#
+# 会话可以是合成的（按固定随机种子生成），也可以从 JSON Lines 文件读取，每行一个事件：
+#   {"op": "type", "text": "abc"}     逐字符按键输入
+#   {"op": "enter"} / {"op": "backspace"}
+#   {"op": "paste", "text": "..."}    粘贴一段文本
+#   {"op": "move", "position": 0.5}   把光标移到文档的相对位置
+#   {"op": "action", "name": "make_list"}   调用工具栏操作（make_list、insert_code_block 等）
+#
+# 作为回归门禁：--max-p95 / --max-p99 超出阈值，或与 --baseline 相比 p95 变慢超过
+# --tolerance 时，以退出码 1 结束。
+#
+# 用法: python benchmarks/typing_benchmark.py [--sizes 100,1000,10000] [--events 300]
+#       [--session 会话.jsonl] [--save-session 会话.jsonl] [--backend textbrowser]
+#       [--max-p95 毫秒] [--max-p99 毫秒] [--baseline 基线.json] [--save-baseline 基线.json]
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QEvent
+from PyQt5.QtGui import QKeyEvent
+from PyQt5.QtWidgets import QApplication, QInputDialog, QMessageBox
+
+import app as editor_app
+
+ACTIONS = ("make_list", "insert_code_block", "make_bold", "make_italic", "make_heading")
+
+PARAGRAPHS = [
+    "## 第 {i} 节",
+    "普通段落，包含一些 English words、**加粗**、*斜体*、`代码` 和 [链接](other.md) {i}。",
+    "- 列表项 {i}\n- 列表项 {i}\n    - 子项 {i}",
+    "| 列 A | 列 B |\n|---|---|\n| {i} | {i} |",
+    "```python\ndef f{i}():\n    return {i}\n```",
+    "> 引用 {i}",
+    "",
+]
+
+
+def generate_document(lines, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    count = 0
+    i = 0
+    while count < lines:
+        text = rng.choice(PARAGRAPHS).format(i=i)
+        parts.append(text)
+        count += text.count("\n") + 1
+        i += 1
+    return "\n".join(parts)
+
+
+def synthetic_session(events, seed=1):
+    """生成合成会话：以逐字输入为主，穿插换行、删除、粘贴与工具栏操作。"""
+    rng = random.Random(seed)
+    words = ["markdown", "编辑器", "延迟", "test", "**粗体**", "`code`", "[链接](a.md)", "# "]
+    session = [{"op": "move", "position": 0.5}]
+    while len(session) < events:
+        roll = rng.random()
+        if roll < 0.70:
+            session.append({"op": "type", "text": rng.choice(words) + " "})
+        elif roll < 0.80:
+            session.append({"op": "enter"})
+        elif roll < 0.90:
+            session.append({"op": "backspace"})
+        elif roll < 0.95:
+            session.append({"op": "paste", "text": generate_document(20, rng.random())})
+        else:
+            session.append({"op": "action", "name": rng.choice(ACTIONS)})
+    return session
+
+
+def load_session(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Replayer:
+    """在一个无界面的编辑器窗口中回放事件并计时。"""
+
+    def __init__(self, app, window):
+        self.app = app
+        self.window = window
+        self.editor = window.editor
+
+    def key(self, key, text=""):
+        """发送一次按键（按下与释放）；直接携带文本，中文等非 ASCII 字符也能输入。"""
+        for event_type in (QEvent.KeyPress, QEvent.KeyRelease):
+            QApplication.sendEvent(self.editor, QKeyEvent(event_type, key, Qt.NoModifier, text))
+
+    def settle(self):
+        """处理完所有已排队的事件与零延时定时器，并同步重绘编辑区。"""
+        self.app.processEvents()
+        self.app.processEvents()
+        self.editor.viewport().repaint()
+
+    def apply(self, event):
+        """执行一个事件，返回各次按键的耗时（秒）列表；逐字输入按每个按键分别计时。"""
+        op = event["op"]
+        if op == "move":
+            cursor = self.editor.textCursor()
+            cursor.setPosition(int(event["position"] * (self.editor.document().characterCount() - 1)))
+            self.editor.setTextCursor(cursor)
+            self.settle()
+            return []
+        if op == "type":
+            timings = []
+            for char in event["text"]:
+                start = time.perf_counter()
+                self.key(Qt.Key_unknown if ord(char) > 127 else ord(char.upper()), char)
+                self.settle()
+                timings.append(time.perf_counter() - start)
+            return timings
+
+        start = time.perf_counter()
+        if op == "enter":
+            self.key(Qt.Key_Return, "\r")
+        elif op == "backspace":
+            self.key(Qt.Key_Backspace)
+        elif op == "paste":
+            QApplication.clipboard().setText(event["text"])
+            self.editor.paste()
+        elif op == "action":
+            getattr(self.window, event["name"])()
+        else:
+            raise ValueError(f"未知的事件类型: {op}")
+        self.settle()
+        return [time.perf_counter() - start]
+
+
+def run_size(app, lines, session):
+    window = editor_app.MarkdownEditor()
+    window.resize(1400, 800)
+    window.show()
+    window.editor.setPlainText(generate_document(lines))
+    window.editor.setFocus()
+    replayer = Replayer(app, window)
+    replayer.settle()
+
+    timings = {}
+    scheduled = 0
+    for event in session:
+        key = event["op"] if event["op"] != "action" else event["name"]
+        window.preview_update_timer.stop()
+        found = replayer.apply(event)
+        if found:
+            timings.setdefault(key, []).extend(found)
+            scheduled += window.preview_update_timer.isActive()
+
+    window.editor.document().setModified(False)
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return timings, scheduled
+
+
+def summarize(timings):
+    values = [t for found in timings.values() for t in found]
+    return {
+        "events": len(values),
+        "p50": statistics.median(values) * 1000,
+        "p95": percentile(values, 0.95) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "max": max(values) * 1000,
+        "ops": {key: percentile(found, 0.95) * 1000 for key, found in sorted(timings.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按键到屏幕的延迟回放测试")
+    parser.add_argument("--sizes", default="100,1000,10000", help="文档行数，逗号分隔")
+    parser.add_argument("--events", type=int, default=300, help="合成会话的事件数")
+    parser.add_argument("--session", help="从 JSON Lines 文件读取会话")
+    parser.add_argument("--save-session", help="把本次使用的会话写入文件")
+    parser.add_argument("--backend", default="textbrowser", help="预览后端（默认使用低内存后端）")
+    parser.add_argument("--max-p95", type=float, help="p95 延迟上限（毫秒）")
+    parser.add_argument("--max-p99", type=float, help="p99 延迟上限（毫秒）")
+    parser.add_argument("--baseline", help="与之前保存的基线结果比较")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="相对基线允许的 p95 变慢比例")
+    args = parser.parse_args()
+
+    session = load_session(args.session) if args.session else synthetic_session(args.events)
+    if args.save_session:
+        with open(args.save_session, "w", encoding="utf-8") as f:
+            for event in session:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    save_baseline = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    # 编辑器从当前目录读写 settings.json，在临时目录中运行以免影响用户设置
+    os.chdir(tempfile.mkdtemp(prefix="md-typing-"))
+    with open("settings.json", "w", encoding="utf-8") as f:
+        json.dump({"preview_backend": args.backend}, f)
+
+    # 测试过程中不能弹出模态对话框
+    errors = []
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *rest: errors.append(text))
+    QInputDialog.getItem = staticmethod(lambda *a, **k: ("python", True))
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    failed = False
+    results = {}
+    print(f"{'行数':>8} {'事件':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9} {'预览调度':>8}")
+    for lines in [int(s) for s in args.sizes.split(",")]:
+        timings, scheduled = run_size(app, lines, session)
+        summary = summarize(timings)
+        results[str(lines)] = summary
+        print(f"{lines:>8} {summary['events']:>6} {summary['p50']:>9.2f} {summary['p95']:>9.2f} "
+              f"{summary['p99']:>9.2f} {summary['max']:>9.2f} {scheduled:>8}")
+        print("         p95 按事件类型: " + "  ".join(f"{k} {v:.2f}" for k, v in summary["ops"].items()))
+
+        if args.max_p95 is not None and summary["p95"] > args.max_p95:
+            print(f"  超出门限: p95 {summary['p95']:.2f} ms > {args.max_p95} ms")
+            failed = True
+        if args.max_p99 is not None and summary["p99"] > args.max_p99:
+            print(f"  超出门限: p99 {summary['p99']:.2f} ms > {args.max_p99} ms")
+            failed = True
+        if baseline and str(lines) in baseline:
+            limit = baseline[str(lines)]["p95"] * (1 + args.tolerance)
+            if summary["p95"] > limit:
+                print(f"  相对基线变慢: p95 {summary['p95']:.2f} ms > {limit:.2f} ms")
+                failed = True
+
+    if errors:
+        print(f"回放过程中发生 {len(errors)} 个错误，例如: {errors[0]}")
+        failed = True
+    if save_baseline:
+        with open(save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# completion.py
+#
+# 链接补全：在 ]( 之后输入时提示工作区中的文件，在 # 之后提示标题锚点。
+#   - 候选项存放在压缩前缀树中，查询只走输入前缀对应的那条路径，与候选总数无关；
+#   - 打开文件夹时在工作线程中遍历一次，之后按文件夹变化与链接索引的变化增量增删；
+#   - Markdown 文件与“文件#锚点”在同一棵树中，图片单独一棵树（![...]( 之后只提示图片）。
+
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from asset_pipeline import IMAGE_SUFFIXES
+from link_index import MARKDOWN_SUFFIXES, SCHEME_RE, unique_slugs
+
+# 光标前是一个尚未闭合的链接目标：(是否为图片, 已输入的目标)
+LINK_CONTEXT_RE = re.compile(r'(!?)\[[^\]]*\]\(<?([^)\s>]*)$')
+MAX_SUGGESTIONS = 50
+
+
+class _Node:
+    __slots__ = ('edges', 'values')
+
+    def __init__(self):
+        self.edges = None   # 边的首字符 -> [边上的字符串, 子结点]
+        self.values = None  # 以该结点结束的键对应的候选项集合
+
+
+def _common_length(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PrefixTrie:
+    """压缩前缀树（radix tree）。一个键可以对应多个候选项，同一个候选项也可以用多个键插入。"""
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, key, value):
+        node = self._root
+        while key:
+            edge = node.edges.get(key[0]) if node.edges else None
+            if edge is None:
+                child = _Node()
+                if node.edges is None:
+                    node.edges = {}
+                node.edges[key[0]] = [key, child]
+                node = child
+                break
+            label, child = edge
+            common = _common_length(label, key)
+            if common < len(label):
+                # 在公共前缀处把这条边拆成两段
+                middle = _Node()
+                middle.edges = {label[common]: [label[common:], child]}
+                edge[0], edge[1] = label[:common], middle
+                child = middle
+            node = child
+            key = key[common:]
+        if node.values is None:
+            node.values = set()
+        if value not in node.values:
+            node.values.add(value)
+            self._size += 1
+
+    def remove(self, key, value):
+        path = []
+        node = self._root
+        while key:
+            edge = node.edges.get(key[0]) if node.edges else None
+            if edge is None or not key.startswith(edge[0]):
+                return False
+            path.append((node, key[0]))
+            node = edge[1]
+            key = key[len(edge[0]):]
+        if not node.values or value not in node.values:
+            return False
+        node.values.discard(value)
+        self._size -= 1
+        if not node.values:
+            node.values = None
+        # 剪掉空的叶子结点
+        while path and node.values is None and not node.edges:
+            parent, first = path.pop()
+            del parent.edges[first]
+            if not parent.edges:
+                parent.edges = None
+            node = parent
+        return True
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        """返回键以 prefix 开头的候选项（去重），按键的字典序，最多 limit 个。"""
+        node = self._root
+        while prefix:
+            edge = node.edges.get(prefix[0]) if node.edges else None
+            if edge is None:
+                return []
+            label, child = edge
+            if prefix.startswith(label):
+                prefix = prefix[len(label):]
+            elif not label.startswith(prefix):
+                return []
+            else:
+                prefix = ''
+            node = child
+
+        results, seen = [], set()
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            if node.values:
+                for value in sorted(node.values):
+                    if value not in seen:
+                        seen.add(value)
+                        results.append(value)
+            if node.edges:
+                stack.extend(node.edges[first][1] for first in sorted(node.edges, reverse=True))
+        return results[:limit]
+
+
+def candidate_keys(path):
+    """一个候选项的查找键：完整路径和文件名（不区分大小写），输入文件名也能找到子目录中的文件。"""
+    keys = {path.lower()}
+    name = posixpath.basename(path.split('#', 1)[0])
+    if name:
+        keys.add(name.lower() + path[len(path.split('#', 1)[0]):].lower())
+    return keys
+
+
+def list_files(folder):
+    """在工作线程中执行：返回 (Markdown 文件集合, 图片集合)，路径相对 folder，用 / 分隔。"""
+    documents, images = set(), set()
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            lower = name.lower()
+            if lower.endswith(MARKDOWN_SUFFIXES):
+                documents.add(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/'))
+            elif lower.endswith(IMAGE_SUFFIXES):
+                images.add(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/'))
+    return documents, images
+
+
+class LinkCompleter(QObject):
+    """为编辑区提供链接补全候选；文件列表来自后台遍历，锚点来自链接索引。"""
+
+    _listed = pyqtSignal(int, object)
+
+    def __init__(self, link_index, parent=None):
+        super().__init__(parent)
+        self.link_index = link_index
+        self.documents = PrefixTrie()  # Markdown 文件与 文件#锚点
+        self.images = PrefixTrie()
+        self._files = (set(), set())
+        self._anchors = {}  # 文件 -> 已加入前缀树的锚点列表
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._listed.connect(self._on_listed)
+        link_index.changed.connect(self.sync_anchors)
+
+    def set_folder(self, folder):
+        self._generation += 1
+        self.documents, self.images = PrefixTrie(), PrefixTrie()
+        self._files = (set(), set())
+        self._anchors = {}
+        self.sync_anchors()
+        self.refresh()
+
+    def refresh(self):
+        """在后台重新列出文件夹，只把增删的文件同步到前缀树。"""
+        if not self.link_index.folder:
+            return
+        generation = self._generation
+        future = self._executor.submit(list_files, self.link_index.folder)
+        future.add_done_callback(lambda f: self._listed.emit(generation, f))
+
+    def _on_listed(self, generation, future):
+        if generation != self._generation or future.exception() is not None:
+            return
+        for trie, old, new in zip((self.documents, self.images), self._files, future.result()):
+            for path in old - new:
+                for key in candidate_keys(path):
+                    trie.remove(key, path)
+            for path in new - old:
+                for key in candidate_keys(path):
+                    trie.insert(key, path)
+        self._files = future.result()
+
+    def sync_anchors(self):
+        """链接索引变化后，只更新锚点列表被替换了的文件。"""
+        current = self.link_index.anchor_lists()
+        for source in set(self._anchors) | set(current):
+            old, new = self._anchors.get(source, []), current.get(source, [])
+            if old is new:
+                continue
+            for anchor in old:
+                for key in candidate_keys(f"{source}#{anchor}"):
+                    self.documents.remove(key, f"{source}#{anchor}")
+            for anchor in new:
+                for key in candidate_keys(f"{source}#{anchor}"):
+                    self.documents.insert(key, f"{source}#{anchor}")
+            if new:
+                self._anchors[source] = new
+            else:
+                self._anchors.pop(source, None)
+
+    def suggestions(self, before, current_file=None, headings=()):
+        """
+        before 为光标前的同一行文字，headings 为当前文档的标题。
+        不在链接目标中时返回 None，否则返回 (已输入的目标, 候选列表)；候选为相对当前文件的路径。
+        """
+        if '](' not in before:
+            return None
+        match = LINK_CONTEXT_RE.search(before)
+        if not match or SCHEME_RE.match(match.group(2)):
+            return None
+        image, typed = match.group(1) == '!', match.group(2)
+        if typed.startswith('#'):
+            if image:
+                return None
+            prefix = typed[1:].lower()
+            anchors = [f"#{slug}" for slug in unique_slugs(headings) if slug.startswith(prefix)]
+            return typed, anchors[:MAX_SUGGESTIONS]
+
+        source = self.link_index.relative(current_file) if current_file else None
+        base = posixpath.dirname(source) if source else ''
+        wanted = unquote(typed)
+        # 按当前文件所在目录解析已输入的路径，得到相对工作区的前缀
+        resolved = posixpath.normpath(posixpath.join(base, wanted))
+        resolved = '' if resolved == '.' else resolved
+        if resolved and (not wanted or wanted.endswith('/')):
+            resolved += '/'
+        trie = self.images if image else self.documents
+        paths = trie.complete(resolved.lower())
+        if wanted and '/' not in wanted and len(paths) < MAX_SUGGESTIONS:
+            # 只输入了文件名时，也匹配其他目录中的同名文件
+            paths += [path for path in trie.complete(wanted.lower()) if path not in paths]
+        candidates = [quote(posixpath.relpath(path, base or '.'), safe="/#")
+                      for path in paths[:MAX_SUGGESTIONS]]
+        return typed, candidates
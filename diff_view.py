@@ -0,0 +1,214 @@
+# diff_view.py
+#
+# 差异面板：比较编辑区与已保存的文件（或任意其他文件）。
+#   - 行级差异在工作线程中计算（text_diff），界面线程只接收分组好的 hunk；
+#   - hunk 也在工作线程中展开成按行的列表，QListView 只绘制可见的行，十万行的文档也不会卡住；
+#   - 词级差异在某一行第一次绘制时才计算，并缓存下来。
+
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QVariant, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QListView, QStyledItemDelegate, QStyle
+)
+
+from text_diff import diff_lines, group_hunks, split_lines, word_diff
+
+# 行背景与词级高亮的颜色，半透明以便同时适用于浅色和深色主题
+COLORS = {
+    'insert': (QColor(46, 160, 67, 50), QColor(46, 160, 67, 130)),
+    'delete': (QColor(248, 81, 73, 50), QColor(248, 81, 73, 130)),
+    'hunk': (QColor(128, 128, 128, 40), None),
+}
+SIGNS = {'equal': ' ', 'insert': '+', 'delete': '-', 'hunk': ''}
+
+
+def compute_diff(old_text, new_text, context=3):
+    """在工作线程中执行：返回 (旧行列表, 新行列表, 展开的行, 新增行数, 删除行数)。行尾的换行符已去掉。"""
+    old_lines, new_lines = split_lines(old_text), split_lines(new_text)
+    hunks = group_hunks(diff_lines(old_lines, new_lines), context)
+    return (display_lines(old_lines), display_lines(new_lines)) + flatten_hunks(hunks)
+
+
+def display_lines(lines):
+    return [line.rstrip('\n').replace('\t', '    ') for line in lines]
+
+
+def flatten_hunks(hunks):
+    """
+    把 hunk 展开成行：(类型, 旧行号, 新行号, 配对行)，配对行用于计算词级差异；
+    hunk 标题行的最后一项是标题文字。返回 (行列表, 新增行数, 删除行数)。
+    """
+    rows = []
+    added_total = removed_total = 0
+    for hunk in hunks:
+        _, i1, _, j1, _ = hunk[0]
+        _, _, i2, _, j2 = hunk[-1]
+        rows.append(('hunk', i1, j1, f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@"))
+        for tag, i1, i2, j1, j2 in hunk:
+            if tag == 'equal':
+                rows.extend(('equal', i1 + k, j1 + k, None) for k in range(i2 - i1))
+                continue
+            first = len(rows)
+            removed, added = i2 - i1, j2 - j1
+            # 替换时第 k 个删除行与第 k 个新增行配对，计算词级差异
+            rows.extend(('delete', i1 + k, j1, first + removed + k if k < added else None)
+                        for k in range(removed))
+            rows.extend(('insert', i1, j1 + k, first + k if k < removed else None)
+                        for k in range(added))
+            removed_total += removed
+            added_total += added
+    return rows, added_total, removed_total
+
+
+class DiffModel(QAbstractListModel):
+    """显示 flatten_hunks 展开的行。"""
+
+    KindRole = Qt.UserRole + 1
+    LineRole = Qt.UserRole + 2  # 对应编辑区（新内容）中的块号
+    SpansRole = Qt.UserRole + 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._old, self._new = [], []
+        self._rows = []
+        self._spans = {}  # 行号 -> 词级变化区间，绘制时才计算
+        self.added = self.removed = 0
+
+    def set_diff(self, old_lines, new_lines, rows, added, removed):
+        """参数为 compute_diff 的结果；行已在工作线程中展开，这里只替换引用。"""
+        self.beginResetModel()
+        self._old, self._new = old_lines, new_lines
+        self._rows = rows
+        self._spans = {}
+        self.added, self.removed = added, removed
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return QVariant()
+        kind, i, j, partner = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            if kind == 'hunk':
+                return partner
+            old_number = f"{i + 1:>6}" if kind != 'insert' else " " * 6
+            new_number = f"{j + 1:>6}" if kind != 'delete' else " " * 6
+            return f"{old_number} {new_number} {SIGNS[kind]} {self._text(kind, i, j)}"
+        if role == self.KindRole:
+            return kind
+        if role == self.LineRole:
+            return j
+        if role == self.SpansRole:
+            return self.spans(index.row())
+        return QVariant()
+
+    def _text(self, kind, i, j):
+        return self._old[i] if kind == 'delete' else self._new[j]
+
+    def spans(self, row):
+        """返回该行中变化的词的区间（相对于显示文字），第一次访问时计算。"""
+        if row not in self._spans:
+            kind, i, j, partner = self._rows[row]
+            self._spans[row] = []
+            if kind in ('delete', 'insert') and partner is not None:
+                _, pi, pj, _ = self._rows[partner]
+                if kind == 'delete':
+                    old_spans, new_spans = word_diff(self._old[i], self._new[pj])
+                    self._spans[row], self._spans[partner] = old_spans, new_spans
+                else:
+                    old_spans, new_spans = word_diff(self._old[pi], self._new[j])
+                    self._spans[row], self._spans[partner] = new_spans, old_spans
+        return self._spans[row]
+
+
+class DiffDelegate(QStyledItemDelegate):
+    """按行类型绘制背景，并高亮词级变化。"""
+
+    PREFIX = 6 + 1 + 6 + 1 + 1 + 1  # 两列行号、符号和分隔空格
+
+    def sizeHint(self, option, index):
+        return QSize(option.fontMetrics.horizontalAdvance(index.data()), option.fontMetrics.height() + 2)
+
+    def paint(self, painter, option, index):
+        kind = index.data(DiffModel.KindRole)
+        text = index.data()
+        painter.save()
+        line_color, word_color = COLORS.get(kind, (None, None))
+        if line_color is not None:
+            painter.fillRect(option.rect, line_color)
+        if option.state & QStyle.State_Selected:
+            selected = QColor(option.palette.highlight().color())
+            selected.setAlpha(70)
+            painter.fillRect(option.rect, selected)
+        metrics = option.fontMetrics
+        if word_color is not None:
+            left = option.rect.left() + 2
+            for start, length in index.data(DiffModel.SpansRole):
+                start += self.PREFIX
+                x = left + metrics.horizontalAdvance(text[:start])
+                width = metrics.horizontalAdvance(text[start:start + length])
+                painter.fillRect(x, option.rect.top(), width, option.rect.height(), word_color)
+        painter.setPen(option.palette.text().color())
+        painter.drawText(option.rect.adjusted(2, 0, 0, 0), Qt.AlignVCenter | Qt.AlignLeft, text)
+        painter.restore()
+
+
+class DiffPanel(QWidget):
+    """差异面板。compare() 提交到工作线程，只显示最后一次提交的结果。"""
+
+    line_activated = pyqtSignal(int)  # 双击某一行，跳到编辑区对应的块号
+    refresh_requested = pyqtSignal()
+    _computed = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._generation = 0
+        self._label = ""
+
+        self.summary = QLabel("没有比较")
+        refresh_button = QPushButton("刷新")
+        refresh_button.clicked.connect(self.refresh_requested)
+        header = QHBoxLayout()
+        header.addWidget(self.summary, 1)
+        header.addWidget(refresh_button)
+
+        self.model = DiffModel(self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(DiffDelegate(self.view))
+        self.view.setUniformItemSizes(True)
+        self.view.doubleClicked.connect(lambda index: self.line_activated.emit(index.data(DiffModel.LineRole)))
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(header)
+        layout.addWidget(self.view)
+        self._computed.connect(self._on_computed)
+
+    def set_font(self, font):
+        self.view.setFont(font)
+
+    def compare(self, old_text, new_text, label):
+        """比较 old_text（label 说明其来源）与 new_text；上一次尚未完成的结果会被丢弃。"""
+        self._generation += 1
+        generation = self._generation
+        self._label = label
+        self.summary.setText(f"正在比较 {label}…")
+        future = self._executor.submit(compute_diff, old_text, new_text)
+        future.add_done_callback(lambda f: self._computed.emit(generation, f))
+
+    def _on_computed(self, generation, future):
+        if generation != self._generation:
+            return
+        if future.exception() is not None:
+            self.summary.setText(f"比较时发生错误: {future.exception()}")
+            return
+        self.model.set_diff(*future.result())
+        if self.model.rowCount():
+            self.summary.setText(f"{self._label}：+{self.model.added} -{self.model.removed}")
+        else:
+            self.summary.setText(f"{self._label}：没有差异")
@@ -0,0 +1,82 @@
+# doc_stats.py
+
+import re
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# 中日韩字符范围（假名、CJK 统一表意文字及扩展 A、谚文音节、兼容表意文字）
+CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+CJK_RE = re.compile(f'[{CJK_RANGES}]')
+WORD_RE = re.compile(f'[^\\W{CJK_RANGES}]+')
+
+
+def block_stats(text):
+    """返回单个块的 (单词数, 字符数, 中日韩字符数)。"""
+    return len(WORD_RE.findall(text)), len(text), len(CJK_RE.findall(text))
+
+
+class DocumentStats(QObject):
+    """
+    文档统计（单词、字符、中日韩字符、阅读时间），按块缓存、增量维护。
+
+    每个块的计数保存在与块号对齐的列表中，contentsChange 时只重新统计被修改的块，
+    并用旧值与新值的差更新总数。这里没有使用 QTextBlockUserData：被删除块的
+    用户数据在 contentsChange 发出之前就已经销毁，无法再从总数中扣除。
+    """
+
+    changed = pyqtSignal()
+
+    WORDS_PER_MINUTE = 200  # 英文阅读速度（单词/分钟）
+    CJK_PER_MINUTE = 400    # 中文阅读速度（字/分钟）
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self._document = document
+        self._blocks = []
+        self.words = self.chars = self.cjk = 0
+        self._recount()
+        document.contentsChange.connect(self.on_contents_change)
+
+    def _recount(self):
+        block = self._document.begin()
+        self._blocks = []
+        while block.isValid():
+            self._blocks.append(block_stats(block.text()))
+            block = block.next()
+        self.words = sum(s[0] for s in self._blocks)
+        self.chars = sum(s[1] for s in self._blocks)
+        self.cjk = sum(s[2] for s in self._blocks)
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        doc = self._document
+        delta = doc.blockCount() - len(self._blocks)
+        block = doc.findBlock(position)
+        if not block.isValid():
+            self._recount()
+            self.changed.emit()
+            return
+
+        first = block.blockNumber()
+        last_block = doc.findBlock(position + chars_added)
+        last_new = last_block.blockNumber() if last_block.isValid() else doc.blockCount() - 1
+        last_old = last_new - delta
+
+        new = []
+        for _ in range(last_new - first + 1):
+            new.append(block_stats(block.text()))
+            block = block.next()
+        old = self._blocks[first:last_old + 1]
+        self._blocks[first:last_old + 1] = new
+
+        for words, chars, cjk in old:
+            self.words -= words
+            self.chars -= chars
+            self.cjk -= cjk
+        for words, chars, cjk in new:
+            self.words += words
+            self.chars += chars
+            self.cjk += cjk
+        self.changed.emit()
+
+    def reading_minutes(self):
+        """按英文单词与中日韩字符分别估算阅读时间（分钟）。"""
+        return self.words / self.WORDS_PER_MINUTE + self.cjk / self.CJK_PER_MINUTE
@@ -0,0 +1,136 @@
+# file_watcher.py
+#
+# 监视当前打开的文件和文件夹在外部（git pull、同步盘等）发生的修改：
+#   - QFileSystemWatcher 的通知在一次保存中常常连发好几次，先防抖合并，再用 stat 指纹
+#     （mtime 与大小）判断文件是否真的变化；
+#   - 编辑器自己写入文件后调用 acknowledge() 记录新指纹，不会当作外部修改；
+#   - 重新载入时按行比较，只替换变化的部分（apply_text_diff），而不是 setPlainText。
+
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+from text_diff import diff_lines, split_lines
+
+
+def stat_fingerprint(path):
+    """返回 (mtime, 大小)；文件不存在时返回 None。"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def utf16_len(text):
+    # QTextDocument 中的位置按 UTF-16 编码单元计算，表情等字符占两个位置
+    return len(text.encode('utf-16-le')) // 2
+
+
+def apply_text_diff(document, new_text):
+    """
+    把 document 的内容改为 new_text：按行比较，只替换变化的行，所有修改合并为一步撤销。
+    与 setPlainText 不同，撤销历史、光标位置和未变化部分的高亮都会保留。返回修改的区段数。
+    """
+    old_lines = split_lines(document.toPlainText())
+    new_lines = split_lines(new_text)
+    opcodes = [op for op in diff_lines(old_lines, new_lines) if op[0] != 'equal']
+    if not opcodes:
+        return 0
+
+    offsets = [0]
+    for line in old_lines:
+        offsets.append(offsets[-1] + utf16_len(line))
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    # 从后往前替换，前面区段的位置不受影响
+    for _, i1, i2, j1, j2 in reversed(opcodes):
+        cursor.setPosition(offsets[i1])
+        cursor.setPosition(offsets[i2], QTextCursor.KeepAnchor)
+        cursor.insertText(''.join(new_lines[j1:j2]))
+    cursor.endEditBlock()
+    return len(opcodes)
+
+
+class FileWatcher(QObject):
+    """监视一个文件和一个文件夹，合并连续的通知后只在指纹变化时发出信号。"""
+
+    file_changed = pyqtSignal(str)  # 文件在外部被修改或删除
+    folder_changed = pyqtSignal(str)  # 文件夹中增删或重命名了文件
+
+    def __init__(self, delay=300, parent=None):
+        super().__init__(parent)
+        self.file = None
+        self.folder = None
+        self._known = {}  # 路径 -> 编辑器最近一次读取或写入时的指纹
+        self._notified = {}  # 路径 -> 最近一次发出信号时的指纹，同一次修改只通知一次
+        self._changed = set()
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self.check)
+        self._watcher.directoryChanged.connect(self.check)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._flush)
+
+    def watch_file(self, path):
+        if path != self.file:
+            self._unwatch(self.file)
+            self.file = path
+        self.acknowledge(path)
+
+    def watch_folder(self, folder):
+        if folder != self.folder:
+            self._unwatch(self.folder)
+            self.folder = folder
+        self.acknowledge(folder)
+
+    def acknowledge(self, path=None):
+        """编辑器自己读取或写入 path 之后调用，记录当前指纹。"""
+        path = path or self.file
+        if not path:
+            return
+        self._known[path] = self._notified[path] = stat_fingerprint(path)
+        self._ensure_watched(path)
+
+    def changed_on_disk(self, path=None):
+        """不等通知，立即比较 path 与编辑器最近一次读写时的指纹。"""
+        path = path or self.file
+        return path in self._known and stat_fingerprint(path) != self._known[path]
+
+    def check(self, path):
+        """记下发生变化的路径，防抖后统一检查。"""
+        self._changed.add(path)
+        if path == self.folder and self.file:
+            # 改名保存、删除后重建的文件可能只触发文件夹的通知
+            self._changed.add(self.file)
+        self._timer.start()
+
+    def _ensure_watched(self, path):
+        # 以“写临时文件再改名”方式保存的文件会从监视列表中消失，需要重新加入
+        if os.path.exists(path) and path not in self._watcher.files() + self._watcher.directories():
+            self._watcher.addPath(path)
+
+    def _unwatch(self, path):
+        if not path:
+            return
+        self._known.pop(path, None)
+        self._notified.pop(path, None)
+        if path in self._watcher.files() + self._watcher.directories():
+            self._watcher.removePath(path)
+
+    def _flush(self):
+        changed, self._changed = self._changed, set()
+        for path in changed:
+            if path not in self._known:
+                continue
+            self._ensure_watched(path)
+            fingerprint = stat_fingerprint(path)
+            if fingerprint == self._notified[path]:
+                continue
+            self._notified[path] = fingerprint
+            if path == self.folder:
+                self._known[path] = fingerprint
+                self.folder_changed.emit(path)
+            else:
+                self.file_changed.emit(path)
@@ -0,0 +1,249 @@
+# includes.py
+#
+# 包含指令：单独一行的 !include 路径，在该位置嵌入另一个 Markdown 文件的渲染结果。
+#   - 路径相对于写有指令的文件解析；被包含的文件可以继续包含，出现循环时显示错误而不是无限展开；
+#   - 文档按包含指令切成若干段，各段单独渲染并按内容哈希缓存，编辑时只有变化的段重新渲染；
+#   - 被包含的片段按 (路径, 内容哈希) 缓存，并记录它依赖的所有文件；
+#     某个文件变化时，invalidate() 返回直接或间接包含它的文件，只需刷新这些文档。
+# 每段单独渲染，所以引用式链接的定义只在本段内有效，列表等块也不能跨过包含指令。
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from html import escape
+from urllib.parse import quote, unquote
+
+from link_index import FENCE_RE, SCHEME_RE
+from renderer import render_markdown
+
+INCLUDE_RE = re.compile(r'^\s{0,3}!include\s+<?([^<>]+?)>?\s*$')
+SOURCE_LINE_RE = re.compile(r'(data-source-line(?:-end)?=")(\d+)(")')
+
+
+def split_includes(text):
+    """
+    按包含指令切分文档，返回 [(起始行号, 文字, 包含的路径或 None), ...]。
+    围栏代码块中的指令按原样保留。
+    """
+    lines = text.split('\n')
+    segments = []
+    start = 0
+    fence = None
+    for number, line in enumerate(lines):
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+            continue
+        if match:
+            fence = match.group(1)
+            continue
+        include = INCLUDE_RE.match(line)
+        if include:
+            if number > start:
+                segments.append((start, '\n'.join(lines[start:number]), None))
+            segments.append((number, line, include.group(1)))
+            start = number + 1
+    if start < len(lines) or not segments:
+        segments.append((start, '\n'.join(lines[start:]), None))
+    return segments
+
+
+def shift_source_lines(html, offset):
+    """把单独渲染的段中的 data-source-line 行号加上该段在文档中的起始行。"""
+    if not offset:
+        return html
+    return SOURCE_LINE_RE.sub(lambda m: f"{m.group(1)}{int(m.group(2)) + offset}{m.group(3)}", html)
+
+
+def include_error(message):
+    return f'<p class="include-error">{escape(message)}</p>'
+
+
+def rebase_resolver(image_resolver, fragment_dir, top_dir):
+    """片段中的相对图片路径改为相对于顶层文档，再交给 image_resolver(src, base_dir)。"""
+    def resolve(src):
+        if not src or SCHEME_RE.match(src) or src.startswith(('#', '/')):
+            return image_resolver(src, top_dir) if image_resolver else None
+        rebased = os.path.relpath(os.path.join(fragment_dir, unquote(src)), top_dir).replace(os.sep, '/')
+        attributes = dict(image_resolver(rebased, top_dir) or {}) if image_resolver else {}
+        attributes.setdefault('src', quote(rebased))
+        return attributes
+    return resolve
+
+
+def _normalize(path):
+    return os.path.normpath(os.path.abspath(path))
+
+
+class FragmentCache:
+    """
+    渲染缓存：顶层文档的段按内容哈希缓存，被包含的片段按 (路径, 内容哈希) 缓存。
+    片段的条目记录了它依赖的每个文件的内容哈希，使用前逐一比较（先比较 stat 指纹，不读文件）。
+    """
+
+    def __init__(self, max_entries=1024, root=None):
+        self.max_entries = max_entries
+        # 只允许包含该目录（及其子目录）中的文件；None 表示不限制
+        self.root = os.path.realpath(root) if root else None
+        self._segments = OrderedDict()   # (内容哈希, 基准目录, 是否标注行号) -> (html, 相对行号)
+        self._fragments = OrderedDict()  # (路径, 内容哈希, 基准目录) -> (html, {依赖的文件: 内容哈希})
+        self._digests = {}     # 路径 -> ((mtime, 大小), 内容哈希)
+        self._dependents = {}  # 路径 -> {直接包含它的文件}
+        self._children = {}    # 文件 -> {它直接包含的文件}，文件每次重新渲染时整体替换
+
+    def clear(self):
+        """丢弃所有渲染结果（如图片缩略图生成后）；文件哈希和依赖关系保留。"""
+        self._segments.clear()
+        self._fragments.clear()
+
+    def digest(self, path):
+        """文件内容的哈希；stat 指纹未变时直接复用。文件不存在时返回 None。"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._digests.pop(path, None)
+            return None
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        known = self._digests.get(path)
+        if known is not None and known[0] == fingerprint:
+            return known[1]
+        try:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return None
+        self._digests[path] = (fingerprint, digest)
+        return digest
+
+    def invalidate(self, path):
+        """文件变化后调用，返回直接或间接包含它的所有文件。"""
+        path = _normalize(path)
+        self._digests.pop(path, None)
+        affected, stack = set(), [path]
+        while stack:
+            for parent in self._dependents.get(stack.pop(), ()):
+                if parent not in affected:
+                    affected.add(parent)
+                    stack.append(parent)
+        return affected
+
+    def _get(self, table, key):
+        value = table.get(key)
+        if value is not None:
+            table.move_to_end(key)
+        return value
+
+    def _put(self, table, key, value):
+        table[key] = value
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    def segment(self, text, base_dir, source_map, image_resolver):
+        """渲染顶层文档中的一段，返回 (html, 相对行号)。"""
+        key = (hashlib.sha1(text.encode('utf-8')).hexdigest(), base_dir, source_map)
+        cached = self._get(self._segments, key)
+        if cached is None:
+            resolve = (lambda src: image_resolver(src, base_dir)) if image_resolver and base_dir else None
+            cached = render_markdown(text, source_map=source_map, image_resolver=resolve)
+            self._put(self._segments, key, cached)
+        return cached
+
+    def include(self, target, including, top_dir, image_resolver, stack, children):
+        """解析 including 文件中的包含路径 target 并渲染，解析出的路径加入 children，返回值同 fragment()。"""
+        path = _normalize(os.path.join(os.path.dirname(including), unquote(target)))
+        if self.root and not self._inside_root(path):
+            return include_error(f"不允许包含该目录之外的文件: {target}"), {}, True
+        children.add(path)
+        return self.fragment(path, top_dir, image_resolver, stack)
+
+    def _set_children(self, including, children):
+        """including 重新渲染后调用：用它现在直接包含的文件替换旧的依赖关系。"""
+        old = self._children.pop(including, set())
+        for child in old - children:
+            parents = self._dependents.get(child)
+            if parents is not None:
+                parents.discard(including)
+                if not parents:
+                    del self._dependents[child]
+        for child in children - old:
+            self._dependents.setdefault(child, set()).add(including)
+        if children:
+            self._children[including] = children
+
+    def _inside_root(self, path):
+        try:
+            return os.path.commonpath([self.root, os.path.realpath(path)]) == self.root
+        except ValueError:
+            # Windows 上两个路径位于不同的驱动器，视为在目录之外
+            return False
+
+    def fragment(self, path, top_dir, image_resolver, stack):
+        """
+        渲染被包含的文件，返回 (html, {依赖的文件: 内容哈希}, 是否可以缓存)。
+        stack 为正在展开的文件链，用于检测循环；遇到循环的结果与展开路径有关，不写入缓存。
+        """
+        digest = self.digest(path)
+        if digest is None:
+            return include_error(f"找不到包含的文件: {os.path.relpath(path, top_dir)}"), {path: None}, True
+        if path in stack:
+            chain = " → ".join(os.path.basename(p) for p in stack[stack.index(path):] + [path])
+            return include_error(f"循环包含: {chain}"), {path: digest}, False
+
+        key = (path, digest, top_dir)
+        cached = self._get(self._fragments, key)
+        if cached is not None and all(self.digest(dep) == known for dep, known in cached[1].items()):
+            return cached[0], cached[1], True
+
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        fragment_dir = os.path.dirname(path)
+        resolve = rebase_resolver(image_resolver, fragment_dir, top_dir)
+        parts, dependencies, cacheable, children = [], {path: digest}, True, set()
+        for _, segment, target in split_includes(text):
+            if target is None:
+                if segment.strip():
+                    parts.append(render_markdown(segment, image_resolver=resolve)[0])
+                continue
+            html, child_dependencies, child_cacheable = self.include(target, path, top_dir, image_resolver,
+                                                                     stack + [path], children)
+            parts.append(f'<div class="include">{html}</div>')
+            dependencies.update(child_dependencies)
+            cacheable = cacheable and child_cacheable
+        self._set_children(path, children)
+        html = '\n'.join(parts)
+        if cacheable:
+            self._put(self._fragments, key, (html, dependencies))
+        return html, dependencies, cacheable
+
+
+def render_document(text, path, cache, source_map=False, image_resolver=None):
+    """
+    渲染 Markdown 文本并展开包含指令；path 为该文本所在的文件，未保存时为 None（无法解析包含路径）。
+    image_resolver(src, base_dir) 返回要写入 <img> 的属性，见 renderer.ImageAttributeExtension。
+    返回 (html, 顶层元素起始行号列表, 依赖的文件集合)。
+    """
+    path = _normalize(path) if path else None
+    top_dir = os.path.dirname(path) if path else None
+    parts, source_lines, dependencies, children = [], [], set(), set()
+    for start, segment, target in split_includes(text):
+        if target is None:
+            if not segment.strip():
+                continue
+            html, lines = cache.segment(segment, top_dir, source_map, image_resolver)
+            parts.append(shift_source_lines(html, start))
+            source_lines.extend(line + start for line in lines)
+            continue
+        if path is None:
+            html = include_error("文件保存后才能解析包含的路径")
+        else:
+            html, child_dependencies, _ = cache.include(target, path, top_dir, image_resolver, [path], children)
+            dependencies.update(child_dependencies)
+        attributes = f' data-source-line="{start}" data-source-line-end="{start}"' if source_map else ''
+        parts.append(f'<div class="include"{attributes}>{html}</div>')
+        if source_map:
+            source_lines.append(start)
+    if path is not None:
+        cache._set_children(path, children)
+    return '\n'.join(parts), source_lines, dependencies
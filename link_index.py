@@ -0,0 +1,377 @@
+# link_index.py
+#
+# 工作区链接索引：记录文件夹下每个 Markdown 文件中的本地链接和标题锚点，
+# 由此得到反向链接和失效链接，并在重命名文件时改写指向它的链接。
+#   - 索引持久化在缓存目录中，打开文件夹时只 stat 一遍，重新解析 mtime/大小变化了的文件；
+#   - 扫描与解析在工作线程中进行，保存文件或文件夹变化时增量更新；
+#   - 反向链接表由各文件的链接在内存中推导，不写入磁盘。
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from PyQt5.QtCore import QObject, QStandardPaths, QTimer, pyqtSignal
+
+INDEX_VERSION = 1
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+LINK_RE = re.compile(r'(?<!!)\[([^\]]*)\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+REFERENCE_RE = re.compile(r'^\s{0,3}\[([^\]]+)\]:\s*<?([^\s>]+)>?')
+HEADING_RE = re.compile(r'^\s{0,3}#{1,6}\s+(.*?)(?:\s+#+)?\s*$')
+FENCE_RE = re.compile(r'^\s{0,3}(`{3,}|~{3,})')
+CODE_SPAN_RE = re.compile(r'`+[^`]*`+')
+INLINE_LINK_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+# 一条链接：行号、路径部分在该行中的起始列与长度（重命名时改写这一段）、
+# 链接文字、目标文件（相对工作区的路径）、锚点（没有时为空字符串）
+Link = namedtuple('Link', ['line', 'start', 'length', 'text', 'target', 'fragment'])
+
+
+def slugify(title):
+    """GitHub 风格的标题锚点：去掉行内链接语法和标点，转为小写，空格换成 -。"""
+    title = INLINE_LINK_RE.sub(r'\1', title)
+    return re.sub(r'[^\w\- ]', '', title.strip().lower()).replace(' ', '-')
+
+
+def unique_slugs(titles):
+    """按顺序为标题生成锚点，重名的依次加上 -1、-2 后缀。"""
+    slugs, counts = [], {}
+    for title in titles:
+        slug = slugify(title)
+        count = counts.get(slug, 0)
+        counts[slug] = count + 1
+        slugs.append(f"{slug}-{count}" if count else slug)
+    return slugs
+
+
+def parse_markdown(text, source):
+    """
+    解析一个文件，source 为它相对工作区的路径（/ 分隔）。
+    返回 (链接列表, 锚点列表)；代码块和行内代码中的内容不算链接。
+    """
+    links, titles = [], []
+    base = posixpath.dirname(source)
+    fence = None
+    for number, line in enumerate(text.split('\n')):
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+            continue
+        if match:
+            fence = match.group(1)
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            titles.append(heading.group(1))
+        if '](' not in line and ']:' not in line:
+            continue
+
+        masked = CODE_SPAN_RE.sub(lambda m: ' ' * len(m.group()), line)
+        found = [(m.group(1), m.start(2), m.group(2)) for m in LINK_RE.finditer(masked)]
+        reference = REFERENCE_RE.match(masked)
+        if reference:
+            found.append((reference.group(1), reference.start(2), reference.group(2)))
+        for label, start, raw in found:
+            if SCHEME_RE.match(raw) or raw.startswith(('/', '\\')):
+                continue
+            path, _, fragment = raw.partition('#')
+            path = path.split('?', 1)[0]
+            target = posixpath.normpath(posixpath.join(base, unquote(path))) if path else source
+            links.append(Link(number, start, len(path), label, target, unquote(fragment)))
+    return links, unique_slugs(titles)
+
+
+def parse_file(path, source, text=None):
+    """读取并解析文件，返回索引条目；text 不为 None 时使用它代替文件内容（如编辑区中刚保存的内容）。"""
+    stat = os.stat(path)
+    if text is None:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    links, anchors = parse_markdown(text, source)
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'links': links, 'anchors': anchors}
+
+
+def scan_folder(folder, known):
+    """
+    在工作线程中执行：遍历文件夹（跳过隐藏目录），known 为 {相对路径: (mtime, 大小)}。
+    返回 (现有的全部 Markdown 文件, {mtime/大小变化了的文件: 新条目})。
+    """
+    present, changed = set(), {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not name.lower().endswith(MARKDOWN_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            source = os.path.relpath(path, folder).replace(os.sep, '/')
+            present.add(source)
+            try:
+                stat = os.stat(path)
+                if known.get(source) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                changed[source] = parse_file(path, source)
+            except OSError:
+                present.discard(source)
+    return present, changed
+
+
+def check_targets(folder, changed, targets):
+    """在工作线程中执行：检查链接目标是否存在，除 targets 外还包括 changed 中各文件链接到的目标。"""
+    targets = set(targets)
+    for entry in changed.values():
+        targets.update(link.target for link in entry['links'])
+    return {target: os.path.exists(os.path.join(folder, target)) for target in targets}
+
+
+def index_path(folder):
+    digest = hashlib.sha1(os.path.abspath(folder).encode('utf-8')).hexdigest()
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "links", f"{digest}.json")
+
+
+def link_target_text(source, target):
+    """重命名后从 source 指向 target 的链接路径（相对 source 所在目录）。"""
+    return posixpath.relpath(target, posixpath.dirname(source) or '.').replace(' ', '%20')
+
+
+def apply_link_edits(text, edits):
+    """edits 为 [(行号, 起始列, 长度, 新文字), ...]，返回改写后的文本。"""
+    lines = text.split('\n')
+    for number, start, length, replacement in sorted(edits, reverse=True):
+        line = lines[number]
+        lines[number] = line[:start] + replacement + line[start + length:]
+    return '\n'.join(lines)
+
+
+class LinkIndex(QObject):
+    """
+    文件夹的链接索引。所有查询都在界面线程中进行，只读内存中的数据；
+    扫描和解析提交到单个工作线程，按提交顺序把结果合并回来。
+    """
+
+    changed = pyqtSignal()
+    _scanned = pyqtSignal(int, object)
+
+    SAVE_DELAY_MS = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder = None
+        self._files = {}      # 相对路径 -> {'mtime', 'size', 'links': [Link, ...], 'anchors': [...]}
+        self._backlinks = {}  # 目标相对路径 -> {链接到它的文件}
+        self._exists = {}     # 链接目标 -> 是否存在，由工作线程检查；未检查过的目标视为存在
+        self._dead = {}       # 来源文件 -> [(Link, 原因), ...]，只重新计算受变化影响的文件
+        self._generation = 0  # 切换文件夹时递增，丢弃旧文件夹的扫描结果
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._scanned.connect(self._on_scanned)
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.timeout.connect(self.save)
+
+    # ---- 维护 ----
+
+    def set_folder(self, folder):
+        """切换到 folder：先载入磁盘上的索引，再在后台检查变化。"""
+        if folder == self.folder:
+            return
+        self.save()
+        self._generation += 1
+        self.folder = folder
+        self._files = self._load(folder) if folder else {}
+        self._backlinks = {}
+        self._exists = {}
+        self._dead = {}
+        for source in self._files:
+            self._add_backlinks(source)
+        self._update_dead(self._files)
+        self.changed.emit()
+        self.refresh()
+
+    def refresh(self):
+        """在后台 stat 整个文件夹，重新解析 mtime/大小变化了的文件。"""
+        if not self.folder:
+            return
+        folder = self.folder
+        known = {source: (entry['mtime'], entry['size']) for source, entry in self._files.items()}
+        # 反向链接表的键就是全部链接目标，不需要遍历每一条链接
+        targets = set(self._backlinks)
+
+        def scan():
+            present, changed = scan_folder(folder, known)
+            return present, changed, check_targets(folder, changed, targets)
+        self._submit(scan)
+
+    def update_file(self, path, text=None):
+        """文件保存后调用，只重新解析这一个文件。"""
+        source = self.relative(path)
+        if source is None or not source.lower().endswith(MARKDOWN_SUFFIXES):
+            return
+        folder = self.folder
+
+        def parse():
+            changed = {source: parse_file(path, source, text)}
+            return None, changed, check_targets(folder, changed, ())
+        self._submit(parse)
+
+    def _submit(self, function, *args):
+        generation = self._generation
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(lambda f: self._scanned.emit(generation, f))
+
+    def _on_scanned(self, generation, future):
+        if generation != self._generation:
+            return
+        if future.exception() is not None:
+            print(f"更新链接索引时发生错误: {future.exception()}")
+            return
+        present, changed, exists = future.result()
+        self._merge(set(self._files) - present if present is not None else set(), changed, exists)
+
+    def _merge(self, removed, changed, exists=None):
+        flipped = set()
+        for target, found in (exists or {}).items():
+            if self._exists.get(target, True) != found:
+                flipped.add(target)
+            self._exists[target] = found
+        for source in removed | set(changed):
+            if source in self._files:
+                self._remove_backlinks(source)
+                del self._files[source]
+        for source, entry in changed.items():
+            self._files[source] = entry
+            self._add_backlinks(source)
+        # 变化的文件本身，以及链接到变化的文件或目标的文件，失效链接需要重新计算
+        affected = removed | set(changed)
+        for target in affected | flipped:
+            affected |= self._backlinks.get(target, set())
+        self._update_dead(affected)
+        if removed or changed:
+            self._save_timer.start(self.SAVE_DELAY_MS)
+        if removed or changed or flipped:
+            self.changed.emit()
+
+    def _update_dead(self, sources):
+        for source in sources:
+            self._dead.pop(source, None)
+            entry = self._files.get(source)
+            if entry is None:
+                continue
+            problems = []
+            for link in entry['links']:
+                target = self._files.get(link.target)
+                if target is None:
+                    if not self._exists.get(link.target, True):
+                        problems.append((link, f"文件不存在: {link.target}"))
+                elif link.fragment and link.fragment not in target['anchors']:
+                    problems.append((link, f"锚点不存在: {link.target}#{link.fragment}"))
+            if problems:
+                self._dead[source] = problems
+
+    def _add_backlinks(self, source):
+        for link in self._files[source]['links']:
+            if link.target != source:
+                self._backlinks.setdefault(link.target, set()).add(source)
+
+    def _remove_backlinks(self, source):
+        for link in self._files[source]['links']:
+            sources = self._backlinks.get(link.target)
+            if sources is not None:
+                sources.discard(source)
+                if not sources:
+                    del self._backlinks[link.target]
+
+    def _ensure_fresh(self, sources):
+        """改写文件之前同步检查这些文件，保证记录的行列位置与磁盘上的内容一致。"""
+        changed, removed = {}, set()
+        for source in sources:
+            path = os.path.join(self.folder, source)
+            entry = self._files.get(source)
+            try:
+                stat = os.stat(path)
+                if entry is None or (entry['mtime'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+                    changed[source] = parse_file(path, source)
+            except OSError:
+                removed.add(source)
+        self._merge(removed & set(self._files), changed)
+
+    # ---- 持久化 ----
+
+    def _load(self, folder):
+        try:
+            with open(index_path(folder), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return {}
+            return {source: dict(entry, links=[Link(*link) for link in entry['links']])
+                    for source, entry in data['files'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def save(self):
+        """把索引写入缓存目录；先写临时文件再替换。"""
+        self._save_timer.stop()
+        if not self.folder:
+            return
+        try:
+            path = index_path(self.folder)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.tmp{os.getpid()}"
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'folder': self.folder, 'files': self._files},
+                          f, ensure_ascii=False)
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"保存链接索引时发生错误: {e}")
+
+    # ---- 查询 ----
+
+    def relative(self, path):
+        """返回 path 相对工作区的路径（/ 分隔）；不在工作区内时返回 None。"""
+        if not self.folder or not path:
+            return None
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.folder))
+        if relative == '..' or relative.startswith('..' + os.sep):
+            return None
+        return relative.replace(os.sep, '/')
+
+    def anchor_lists(self):
+        """返回 {文件: 锚点列表}。文件重新解析时整个列表被替换，可以按对象是否相同判断变化。"""
+        return {source: entry['anchors'] for source, entry in self._files.items()}
+
+    def backlinks(self, path):
+        """返回链接到 path 的 [(来源文件, Link), ...]，按文件和行号排序。"""
+        target = self.relative(path)
+        return [(source, link)
+                for source in sorted(self._backlinks.get(target, ()))
+                for link in self._files[source]['links'] if link.target == target]
+
+    def dead_links(self):
+        """返回 [(来源文件, Link, 原因), ...]：目标文件不存在，或目标文件中没有该锚点。"""
+        return [(source, link, reason) for source in sorted(self._dead) for link, reason in self._dead[source]]
+
+    def rename_edits(self, old_path, new_path):
+        """
+        把 old_path 重命名为 new_path 时需要改写的链接：{来源文件: [(行号, 起始列, 长度, 新文字), ...]}。
+        文件中指向自身的链接（如 [x](old.md#sec)）记在重命名之后的路径下。
+        返回前会重新检查这些来源文件，保证位置与磁盘上的内容一致。
+        """
+        old, new = self.relative(old_path), self.relative(new_path)
+        if old is None or new is None:
+            return {}
+        self._ensure_fresh(sorted(self._backlinks.get(old, ())) + [old])
+        edits = {}
+        for source, link in self.backlinks(old_path):
+            if link.length:
+                edits.setdefault(source, []).append(
+                    (link.line, link.start, link.length, link_target_text(source, new)))
+        entry = self._files.get(old)
+        for link in entry['links'] if entry else ():
+            if link.target == old and link.length:
+                edits.setdefault(new, []).append((link.line, link.start, link.length, link_target_text(new, new)))
+        return edits
@@ -0,0 +1,433 @@
+# md_linter.py
+
+import os
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QTimer, QVariant, pyqtSignal
+
+# 一条检查结果；length 为 -1 表示整行
+Diagnostic = namedtuple('Diagnostic', ['line', 'start', 'length', 'message'])
+
+TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+def split_table_row(line):
+    """按未转义的 | 拆分表格行，返回单元格列表。"""
+    row = line.strip()
+    if row.startswith('|'):
+        row = row[1:]
+    if row.endswith('|') and not row.endswith('\\|'):
+        row = row[:-1]
+    return re.split(r'(?<!\\)\|', row)
+
+
+def _lint_table(rows):
+    """检查一段连续的表格行 [(块号, 文本), ...]。"""
+    results = {}
+    if len(rows) < 2 or not TABLE_SEPARATOR_RE.match(rows[1][1]):
+        if TABLE_SEPARATOR_RE.match(rows[0][1]) and '-' in rows[0][1]:
+            results[rows[0][0]] = [(0, -1, "表格缺少表头行")]
+        return results
+    columns = len(split_table_row(rows[0][1]))
+    for number, text in rows[1:]:
+        count = len(split_table_row(text))
+        if count != columns:
+            results[number] = [(0, -1, f"表格列数不一致：表头为 {columns} 列，此行为 {count} 列")]
+    return results
+
+
+def _lint_images(text, base_dir):
+    """检查行内引用的相对路径图片是否存在。"""
+    results = []
+    for match in IMAGE_RE.finditer(text):
+        target = match.group(1)
+        if SCHEME_RE.match(target) or target.startswith(('#', '/', '\\')):
+            continue
+        path = os.path.join(base_dir, unquote(target.split('#', 1)[0].split('?', 1)[0]))
+        if not os.path.exists(path):
+            start, end = match.span(1)
+            results.append((start, end - start, f"图片不存在: {target}"))
+    return results
+
+
+def lint_blocks(items, base_dir=None):
+    """
+    检查一组块，items 为按块号排序的 [(块号, 文本, 是否在代码块中), ...]。
+    返回 {块号: [(起始列, 长度, 消息), ...]}，没有问题的块对应空列表。
+    连续的含 | 的行按表格整体检查，调用方需要把整张表的行都放进 items。
+    """
+    results = {number: [] for number, _, _ in items}
+    table = []
+    for number, text, in_code in items:
+        is_row = not in_code and '|' in text
+        if table and not (is_row and table[-1][0] == number - 1):
+            for row, found in _lint_table(table).items():
+                results[row].extend(found)
+            table = []
+        if is_row:
+            table.append((number, text))
+        if not in_code and base_dir and '![' in text:
+            results[number].extend(_lint_images(text, base_dir))
+    if table:
+        for row, found in _lint_table(table).items():
+            results[row].extend(found)
+    return results
+
+
+def find_duplicate_headings(headings):
+    """headings 为 [(块号, 级别, 标题), ...]，返回重复标题的检查结果。"""
+    seen = {}
+    results = []
+    for number, level, title in headings:
+        key = title.strip().lower()
+        if not key:
+            continue
+        if key in seen:
+            results.append(Diagnostic(number, 0, -1, f"重复的标题: {title}（与第 {seen[key] + 1} 行相同）"))
+        else:
+            seen[key] = number
+    return results
+
+
+class DiagnosticModel(QAbstractListModel):
+    """
+    问题列表：每行一条检查结果，全文问题在前，其余按 (块号, 起始列) 排序。
+
+    结果以一个块号为界分成两段：_head 升序存放绝对块号；_tail 倒序存放，实际块号为存储值加 _offset。
+    插入或删除行时只把分界移到修改处并调整 _offset，其后的结果不必逐条平移；
+    分界移动的代价与经过的条目数成正比，而编辑通常集中在光标附近。
+    """
+
+    LineRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._global = []  # 重复标题、未闭合代码块等全文问题
+        self._head = []    # [(块号, 起始列, 长度, 消息), ...]
+        self._tail = []    # [(块号 - _offset, 起始列, 长度, 消息), ...]，倒序
+        self._offset = 0
+
+    # ---- Qt 模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._global) + len(self._head) + len(self._tail)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self.rowCount():
+            return QVariant()
+        diagnostic = self._entry(index.row())
+        if role == Qt.DisplayRole:
+            return f"第 {diagnostic.line + 1} 行: {diagnostic.message}"
+        if role == Qt.ToolTipRole:
+            return diagnostic.message
+        if role == self.LineRole:
+            return diagnostic.line
+        return QVariant()
+
+    def _entry(self, row):
+        if row < len(self._global):
+            return self._global[row]
+        row -= len(self._global)
+        if row < len(self._head):
+            return Diagnostic(*self._head[row])
+        line, start, length, message = self._tail[len(self._tail) - 1 - (row - len(self._head))]
+        return Diagnostic(line + self._offset, start, length, message)
+
+    # ---- 查询 ----
+
+    def diagnostics(self):
+        """返回按行排序的全部检查结果。"""
+        results = [self._entry(row) for row in range(self.rowCount())]
+        results.sort(key=lambda d: (d.line, d.start))
+        return results
+
+    def between(self, first, last):
+        """返回块号在 first..last 之间的检查结果，代价只与范围内的结果数有关。"""
+        self._seek(first)
+        results = [d for d in self._global if first <= d.line <= last]
+        for line, start, length, message in reversed(self._tail):
+            if line + self._offset > last:
+                break
+            results.append(Diagnostic(line + self._offset, start, length, message))
+        return results
+
+    # ---- 增量维护 ----
+
+    def _seek(self, number):
+        """移动分界：块号小于 number 的结果放在 _head 中，其余的放在 _tail 中。行的顺序不变。"""
+        head, tail, offset = self._head, self._tail, self._offset
+        while head and head[-1][0] >= number:
+            line, *rest = head.pop()
+            tail.append((line - offset, *rest))
+        while tail and tail[-1][0] + offset < number:
+            line, *rest = tail.pop()
+            head.append((line + offset, *rest))
+
+    def _count_until(self, last):
+        """分界之后块号不超过 last 的结果数。"""
+        count = 0
+        while count < len(self._tail) and self._tail[-1 - count][0] + self._offset <= last:
+            count += 1
+        return count
+
+    def _remove(self, count):
+        """删除分界之后的 count 条结果。"""
+        if count:
+            row = len(self._global) + len(self._head)
+            self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+            del self._tail[len(self._tail) - count:]
+            self.endRemoveRows()
+
+    def replace_lines(self, first, last, delta):
+        """由 contentsChange 调用：块 first..last 被替换，其后的块号平移 delta。"""
+        self._seek(first)
+        self._remove(self._count_until(last))
+        if delta and self._tail:
+            self._offset += delta
+            row = len(self._global) + len(self._head)
+            self.dataChanged.emit(self.index(row), self.index(self.rowCount() - 1))
+
+    def set_line(self, number, found):
+        """设置一个块的检查结果 [(起始列, 长度, 消息), ...]；与原来相同时不发出任何信号。"""
+        self._seek(number)
+        count = self._count_until(number)
+        found = sorted(found)
+        if [entry[1:] for entry in reversed(self._tail[len(self._tail) - count:])] == found:
+            return
+        self._remove(count)
+        if found:
+            row = len(self._global) + len(self._head)
+            self.beginInsertRows(QModelIndex(), row, row + len(found) - 1)
+            self._head.extend((number, *item) for item in found)
+            self.endInsertRows()
+
+    def set_global(self, diagnostics):
+        """替换全文问题，返回有变化的结果（新旧两份）；没有变化时返回空列表。"""
+        if diagnostics == self._global:
+            return []
+        old = self._global
+        if old:
+            self.beginRemoveRows(QModelIndex(), 0, len(old) - 1)
+            self._global = []
+            self.endRemoveRows()
+        if diagnostics:
+            self.beginInsertRows(QModelIndex(), 0, len(diagnostics) - 1)
+            self._global = list(diagnostics)
+            self.endInsertRows()
+        return old + self._global
+
+
+class DocumentLinter(QObject):
+    """
+    后台增量 Markdown 检查器。
+
+    - 高亮器通过 mark_dirty() 上报被重新高亮的块，contentsChange 时平移已有结果的块号；
+    - 防抖后只把脏块（以及它们所在的整张表格）的文本快照交给工作线程检查；
+    - 每个块的结果保存在 DiagnosticModel 中，没有问题的块不占空间，问题面板直接显示该模型；
+    - 重复标题来自大纲索引，未闭合的代码块来自高亮器的块状态。
+    """
+
+    changed = pyqtSignal(int, int)  # 一次检查完成，参数为结果可能变化的块号范围 (首, 末)
+    _finished = pyqtSignal(int, object, object)
+
+    DEBOUNCE_MS = 200  # 最后一次修改后等待多久再开始检查
+
+    def __init__(self, document, outline, code_states, parent=None):
+        super().__init__(parent)
+        self._document = document
+        self._outline = outline
+        self._code_states = tuple(code_states)
+        self._base_dir = None
+        self._block_count = document.blockCount()
+
+        self.model = DiagnosticModel(self)
+        self._fence = None       # 末尾未闭合代码块的起始块号
+        self._dirty = set(range(self._block_count))
+        self._pending = set()
+        self._inflight = set()
+        self._generation = 0
+        self._busy = False
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._finished.connect(self._on_finished)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._submit)
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+
+        # 必须在高亮器之后连接，保证块状态已经更新
+        document.contentsChange.connect(self.on_contents_change)
+
+    # ---- 增量维护 ----
+
+    def set_base_dir(self, base_dir):
+        """设置相对图片路径的基准目录，变化时重新检查全文。"""
+        if base_dir != self._base_dir:
+            self._base_dir = base_dir
+            self._dirty = set(range(self._document.blockCount()))
+            self._timer.start(self.DEBOUNCE_MS)
+
+    def mark_dirty(self, block_number):
+        """由高亮器调用：某个块被重新高亮（内容或代码块状态可能变化）。"""
+        self._pending.add(block_number)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(0)
+
+    def flush(self):
+        self._flush_timer.stop()
+        if self._pending:
+            self._dirty |= self._pending
+            self._pending = set()
+            self._timer.start(self.DEBOUNCE_MS)
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        doc = self._document
+        block_count = doc.blockCount()
+        delta = block_count - self._block_count
+        self._block_count = block_count
+        self._generation += 1
+
+        first = doc.findBlock(position).blockNumber()
+        last_block = doc.findBlock(position + chars_added)
+        last_new = last_block.blockNumber() if last_block.isValid() else block_count - 1
+        last_old = last_new - delta
+
+        self.model.replace_lines(first, last_old, delta)
+        if self._fence is not None:
+            if self._fence > last_old:
+                self._fence += delta
+            elif self._fence >= first:
+                self._fence = None
+
+        def shift(numbers):
+            return {n + delta if n > last_old else n for n in numbers if not first <= n <= last_old}
+
+        self._dirty = shift(self._dirty)
+        self._dirty.update(range(first, last_new + 1))
+        self._inflight = shift(self._inflight)
+        self.flush()
+        self._timer.start(self.DEBOUNCE_MS)
+
+    # ---- 后台检查 ----
+
+    def _in_code(self, block):
+        return (block.userState() in self._code_states
+                or block.previous().userState() in self._code_states)
+
+    def _submit(self):
+        if self._busy:
+            return
+        doc = self._document
+        wanted = set()
+        for number in self._dirty:
+            if number >= doc.blockCount():
+                continue
+            wanted.add(number)
+            block = doc.findBlockByNumber(number)
+            if '|' not in block.text():
+                continue
+            # 表格需要整体检查：向上下扩展到连续的含 | 的行
+            up = block.previous()
+            while up.isValid() and '|' in up.text() and up.blockNumber() not in wanted:
+                wanted.add(up.blockNumber())
+                up = up.previous()
+            down = block.next()
+            while down.isValid() and '|' in down.text() and down.blockNumber() not in wanted:
+                wanted.add(down.blockNumber())
+                down = down.next()
+        self._dirty = set()
+
+        items = []
+        block = None
+        for number in sorted(wanted):
+            if block is not None and block.isValid() and block.blockNumber() + 1 == number:
+                block = block.next()
+            else:
+                block = doc.findBlockByNumber(number)
+            items.append((number, block.text(), self._in_code(block)))
+
+        headings = self._outline.headings()
+        self._inflight = set(wanted)
+        self._busy = True
+        generation = self._generation
+        base_dir = self._base_dir
+        future = self._executor.submit(
+            lambda: (lint_blocks(items, base_dir), find_duplicate_headings(headings)))
+        future.add_done_callback(lambda f: self._emit_finished(generation, f))
+
+    def _emit_finished(self, generation, future):
+        """在工作线程中调用，通过信号把结果排队送回界面线程。"""
+        if future.exception() is not None:
+            print(f"检查文档时发生错误: {future.exception()}")
+            self._finished.emit(generation, {}, [])
+        else:
+            self._finished.emit(generation, *future.result())
+
+    def _on_finished(self, generation, results, duplicates):
+        self._busy = False
+        if generation != self._generation:
+            # 检查期间文档又被修改：块号可能已经变化，丢弃结果重新检查
+            self._dirty |= self._inflight
+            self._inflight = set()
+            self._timer.start(0)
+            return
+
+        lines = sorted(self._inflight)
+        for number in lines:
+            self.model.set_line(number, results.get(number, ()))
+        self._inflight = set()
+
+        diagnostics = list(duplicates)
+        fence = self._unclosed_fence(lines)
+        if fence is not None:
+            diagnostics.append(Diagnostic(fence, 0, -1, "代码块没有闭合，其后的全部内容都会被当作代码"))
+        diagnostics.sort(key=lambda d: (d.line, d.start))
+        changed = lines + [d.line for d in self.model.set_global(diagnostics)]
+        self.changed.emit(min(changed, default=0), max(changed, default=-1))
+        if self._dirty:
+            self._timer.start(0)
+
+    def _is_fence_start(self, block):
+        return (block.isValid() and block.userState() in self._code_states
+                and block.previous().userState() not in self._code_states)
+
+    def _unclosed_fence(self, lines):
+        """
+        文档以代码块状态结束时，返回未闭合的起始行。lines 为本次检查的块号（升序），
+        只有这些块的代码块状态可能变化：上次找到的起始行仍然有效、其后也没有新的起始行时直接沿用，
+        否则才从末尾向前找（只遍历末尾这段代码块）。
+        """
+        doc = self._document
+        block = doc.lastBlock()
+        if block.userState() not in self._code_states:
+            self._fence = None
+            return None
+        if self._fence is not None and self._is_fence_start(doc.findBlockByNumber(self._fence)) and not any(
+                self._is_fence_start(doc.findBlockByNumber(number))
+                for number in lines[bisect_right(lines, self._fence):]):
+            return self._fence
+        self._fence = None
+        while block.isValid():
+            if block.previous().userState() not in self._code_states:
+                self._fence = block.blockNumber()
+                break
+            block = block.previous()
+        return self._fence
+
+    # ---- 查询 ----
+
+    def diagnostics(self):
+        """返回按行排序的全部检查结果。"""
+        return self.model.diagnostics()
+
+    def between(self, first, last):
+        """返回块号在 first..last 之间的检查结果。"""
+        return self.model.between(first, last)
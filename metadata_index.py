@@ -0,0 +1,362 @@
+# metadata_index.py
+#
+# 工作区元数据索引：读取每个 Markdown 文件开头 --- 之间的 front matter（tags、owner、status 等）。
+#   - 只读取文件头，遇到结束的 --- 即停止，不读正文；
+#   - 索引按列存储（每个字段一列，按行号排列），磁盘缓存也是列式的，打开文件夹时只 stat，
+#     重新读取 mtime/大小变化了的文件；
+#   - 可筛选的字段额外维护 值 -> 行号集合 的倒排表，筛选只需求几个集合的交集。
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QStandardPaths, QTimer, pyqtSignal
+
+from link_index import MARKDOWN_SUFFIXES
+
+INDEX_VERSION = 1
+
+# 可以在面板中筛选的字段；它们的值建立倒排表
+FILTER_FIELDS = ('tags', 'owner', 'status')
+# 按列表处理的字段：写成 "a, b" 或 "a b" 的字符串也拆成多个值
+LIST_FIELDS = ('tags',)
+FIELD_ALIASES = {'tag': 'tags', 'keywords': 'tags'}
+
+MAX_HEADER_LINES = 200
+MAX_LINE_LENGTH = 4096
+
+KEY_RE = re.compile(r'^([A-Za-z_][\w-]*)\s*:(?:\s+(.*))?$')
+LIST_ITEM_RE = re.compile(r'^\s*-\s+(.*)$')
+
+
+def read_front_matter(path):
+    """只读取文件头部的 front matter，返回 {字段: 值}；没有 front matter 时返回空字典。"""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        if f.readline(MAX_LINE_LENGTH).rstrip() != '---':
+            return {}
+        lines = []
+        for _ in range(MAX_HEADER_LINES):
+            line = f.readline(MAX_LINE_LENGTH)
+            if not line:
+                break
+            if line.rstrip() in ('---', '...'):
+                return parse_front_matter(lines)
+            lines.append(line)
+    return {}
+
+
+def parse_front_matter(lines):
+    """
+    解析 front matter 中常用的 YAML 子集：key: value、key: [a, b] 和缩进的 - item 列表。
+    值都保留为字符串（或字符串列表），嵌套的映射被忽略。
+    """
+    meta, key = {}, None
+    for line in lines:
+        line = line.rstrip()
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        item = LIST_ITEM_RE.match(line)
+        if item and key is not None:
+            if not isinstance(meta[key], list):
+                meta[key] = []
+            meta[key].append(_scalar(_strip_comment(item.group(1))))
+            continue
+        match = KEY_RE.match(line)
+        if not match:
+            key = None
+            continue
+        key = match.group(1).lower()
+        key = FIELD_ALIASES.get(key, key)
+        value = _strip_comment(match.group(2) or '')
+        if value.startswith('[') and value.endswith(']'):
+            meta[key] = [_scalar(v) for v in _split_list(value[1:-1]) if v.strip()]
+        elif key in LIST_FIELDS and not _is_quoted(value):
+            meta[key] = [v for v in re.split(r'[,\s]+', value) if v]
+        else:
+            meta[key] = _scalar(value)
+    return {key: value for key, value in meta.items() if value not in ('', [])}
+
+
+def _strip_comment(value):
+    """去掉引号之外的 # 注释（# 位于行首或空白之后才算注释）。"""
+    quote = None
+    for i, char in enumerate(value):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '#' and (i == 0 or value[i - 1].isspace()):
+            return value[:i].strip()
+    return value.strip()
+
+
+def _split_list(value):
+    """按引号之外的逗号切分行内列表 [a, "b, c"] 的内容。"""
+    items, quote, start = [], None, 0
+    for i, char in enumerate(value):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == ',':
+            items.append(value[start:i])
+            start = i + 1
+    items.append(value[start:])
+    return items
+
+
+def _is_quoted(value):
+    return len(value) >= 2 and value[0] == value[-1] and value[0] in '"\''
+
+
+def _scalar(value):
+    value = value.strip()
+    if not _is_quoted(value):
+        return value
+    if value[0] == "'":
+        return value[1:-1].replace("''", "'")
+    return value[1:-1].replace('\\"', '"')
+
+
+def scan_folder(folder, known):
+    """
+    在工作线程中执行：遍历文件夹（跳过隐藏目录），known 为 {相对路径: (mtime, 大小)}。
+    返回 (现有的全部 Markdown 文件, {变化了的文件: ((mtime, 大小), 元数据)})。
+    """
+    present, changed = set(), {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not name.lower().endswith(MARKDOWN_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            source = os.path.relpath(path, folder).replace(os.sep, '/')
+            present.add(source)
+            try:
+                stat = os.stat(path)
+                fingerprint = (stat.st_mtime_ns, stat.st_size)
+                if known.get(source) != fingerprint:
+                    changed[source] = (fingerprint, read_front_matter(path))
+            except OSError:
+                present.discard(source)
+    return present, changed
+
+
+def read_entry(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size), read_front_matter(path)
+
+
+def index_path(folder):
+    digest = hashlib.sha1(os.path.abspath(folder).encode('utf-8')).hexdigest()
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "metadata", f"{digest}.json")
+
+
+def display_value(value):
+    if value is None:
+        return ""
+    return ", ".join(value) if isinstance(value, list) else value
+
+
+class MetadataIndex(QObject):
+    """
+    文件夹的元数据索引，按列存储：行号 -> 路径、指纹，以及每个字段一列。
+    删除文件时把最后一行移到空出的位置，所以行号只在一次 changed 信号之前有效。
+    """
+
+    changed = pyqtSignal()
+    _scanned = pyqtSignal(int, object)
+
+    SAVE_DELAY_MS = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder = None
+        self._clear()
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._scanned.connect(self._on_scanned)
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.timeout.connect(self.save)
+
+    def _clear(self):
+        self._paths = []     # 行号 -> 相对路径
+        self._stats = []     # 行号 -> (mtime, 大小)
+        self._columns = {}   # 字段 -> 按行号排列的值，没有该字段时为 None
+        self._rows = {}      # 相对路径 -> 行号
+        self._postings = {field: {} for field in FILTER_FIELDS}  # 字段 -> {值: {行号}}
+
+    # ---- 维护 ----
+
+    def set_folder(self, folder):
+        """切换到 folder：先载入磁盘上的索引，再在后台检查变化。"""
+        if folder == self.folder:
+            return
+        self.save()
+        self._generation += 1
+        self.folder = folder
+        self._clear()
+        if folder:
+            self._load(folder)
+        self.changed.emit()
+        self.refresh()
+
+    def refresh(self):
+        """在后台 stat 整个文件夹，重新读取 mtime/大小变化了的文件头。"""
+        if not self.folder:
+            return
+        known = {path: tuple(stat) for path, stat in zip(self._paths, self._stats)}
+        self._submit(scan_folder, self.folder, known)
+
+    def update_file(self, path):
+        """文件保存后调用，只重新读取这一个文件的文件头。"""
+        if not self.folder or not path or not path.lower().endswith(MARKDOWN_SUFFIXES):
+            return
+        source = os.path.relpath(os.path.abspath(path), os.path.abspath(self.folder))
+        if source == '..' or source.startswith('..' + os.sep):
+            return
+        source = source.replace(os.sep, '/')
+        self._submit(lambda: (None, {source: read_entry(path)}))
+
+    def _submit(self, function, *args):
+        generation = self._generation
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(lambda f: self._scanned.emit(generation, f))
+
+    def _on_scanned(self, generation, future):
+        if generation != self._generation:
+            return
+        if future.exception() is not None:
+            print(f"更新元数据索引时发生错误: {future.exception()}")
+            return
+        present, changed = future.result()
+        removed = set(self._rows) - present if present is not None else set()
+        for source in removed:
+            self._remove_row(self._rows[source])
+        for source, (stat, meta) in changed.items():
+            if source in self._rows:
+                self._remove_row(self._rows[source])
+            self._append_row(source, stat, meta)
+        if removed or changed:
+            self._save_timer.start(self.SAVE_DELAY_MS)
+            self.changed.emit()
+
+    def _append_row(self, source, stat, meta):
+        row = len(self._paths)
+        self._paths.append(source)
+        self._stats.append(stat)
+        self._rows[source] = row
+        for field in meta:
+            if field not in self._columns:
+                self._columns[field] = [None] * row
+        for field, column in self._columns.items():
+            column.append(meta.get(field))
+        self._add_postings(row)
+
+    def _remove_row(self, row):
+        # 把最后一行移到 row，所有列保持等长
+        last = len(self._paths) - 1
+        self._remove_postings(row)
+        del self._rows[self._paths[row]]
+        if row != last:
+            self._remove_postings(last)
+            self._paths[row] = self._paths[last]
+            self._stats[row] = self._stats[last]
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._rows[self._paths[row]] = row
+        self._paths.pop()
+        self._stats.pop()
+        for column in self._columns.values():
+            column.pop()
+        if row != last:
+            self._add_postings(row)
+
+    def _row_values(self, row, field):
+        value = self.value(row, field)
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    def _add_postings(self, row):
+        for field, postings in self._postings.items():
+            for value in self._row_values(row, field):
+                postings.setdefault(value, set()).add(row)
+
+    def _remove_postings(self, row):
+        for field, postings in self._postings.items():
+            for value in self._row_values(row, field):
+                rows = postings.get(value)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del postings[value]
+
+    # ---- 持久化 ----
+
+    def _load(self, folder):
+        try:
+            with open(index_path(folder), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return
+            paths, stats, columns = data['paths'], [tuple(stat) for stat in data['stats']], data['columns']
+            if len(stats) != len(paths) or any(len(column) != len(paths) for column in columns.values()):
+                return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+        self._paths, self._stats, self._columns = paths, stats, columns
+        self._rows = {source: row for row, source in enumerate(paths)}
+        for row in range(len(paths)):
+            self._add_postings(row)
+
+    def save(self):
+        """把索引按列写入缓存目录；先写临时文件再替换。"""
+        self._save_timer.stop()
+        if not self.folder:
+            return
+        try:
+            path = index_path(self.folder)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.tmp{os.getpid()}"
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'folder': self.folder, 'paths': self._paths,
+                           'stats': self._stats, 'columns': self._columns}, f, ensure_ascii=False)
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"保存元数据索引时发生错误: {e}")
+
+    # ---- 查询 ----
+
+    def __len__(self):
+        return len(self._paths)
+
+    def fields(self):
+        """所有出现过的字段：可筛选的字段在前，其余按名称排序。"""
+        present = [field for field, column in self._columns.items() if any(v is not None for v in column)]
+        return ([field for field in FILTER_FIELDS if field in present]
+                + sorted(field for field in present if field not in FILTER_FIELDS))
+
+    def values(self, field):
+        """可筛选字段的所有取值，按名称排序。"""
+        return sorted(self._postings.get(field, ()), key=str.lower)
+
+    def query(self, filters=None):
+        """filters 为 {字段: 值}，返回同时满足所有条件的行号（未排序）。"""
+        filters = {field: value for field, value in (filters or {}).items() if value}
+        if not filters:
+            return list(range(len(self._paths)))
+        sets = sorted((self._postings.get(field, {}).get(value, set()) for field, value in filters.items()),
+                      key=len)
+        return list(sets[0].intersection(*sets[1:]))
+
+    def path(self, row):
+        return self._paths[row]
+
+    def value(self, row, field):
+        column = self._columns.get(field)
+        return column[row] if column is not None else None
@@ -0,0 +1,133 @@
+# metadata_view.py
+#
+# 元数据面板：按 tags、owner、status 筛选工作区中的文件，点击表头按任意字段排序。
+# 筛选直接查询元数据索引的倒排表，表格只保存结果的行号，显示时再按列取值。
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QTableView, QHeaderView
+
+from metadata_index import FILTER_FIELDS, display_value
+
+ALL = "全部"
+
+
+class MetadataModel(QAbstractTableModel):
+    """第一列为文件路径，其余每列一个字段；行为元数据索引中的行号。"""
+
+    def __init__(self, metadata, parent=None):
+        super().__init__(parent)
+        self.metadata = metadata
+        self._rows = []
+        self._fields = []
+        self._sort = (0, Qt.AscendingOrder)
+
+    def set_rows(self, rows, fields):
+        self.beginResetModel()
+        self._rows = rows
+        self._fields = fields
+        self._sort_rows()
+        self.endResetModel()
+
+    def path(self, row):
+        return self.metadata.path(self._rows[row])
+
+    def _text(self, row, column):
+        if column == 0:
+            return self.metadata.path(row)
+        return display_value(self.metadata.value(row, self._fields[column - 1]))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._fields) + 1
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return "文件" if section == 0 else self._fields[section - 1]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return QVariant()
+        return self._text(self._rows[index.row()], index.column())
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._sort_rows()
+        self.layoutChanged.emit()
+
+    def _sort_rows(self):
+        column, order = self._sort
+        if column > len(self._fields):
+            column = 0
+        keys = {row: self._text(row, column).lower() for row in self._rows}
+        # 没有该字段的文件始终排在最后，相同的值按路径排序
+        filled = sorted((row for row in self._rows if keys[row]),
+                        key=lambda row: (keys[row], self.metadata.path(row).lower()),
+                        reverse=order == Qt.DescendingOrder)
+        empty = sorted((row for row in self._rows if not keys[row]), key=lambda row: self.metadata.path(row).lower())
+        self._rows = filled + empty
+
+
+class MetadataPanel(QWidget):
+    """元数据查询面板。索引变化时保留当前的筛选条件和排序重新查询。"""
+
+    file_activated = pyqtSignal(str)  # 双击某一行，参数为相对工作区的路径
+
+    def __init__(self, metadata, parent=None):
+        super().__init__(parent)
+        self.metadata = metadata
+        self.filters = {}
+        header = QHBoxLayout()
+        for field in FILTER_FIELDS:
+            combo = QComboBox()
+            combo.setMinimumContentsLength(8)
+            combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+            combo.currentIndexChanged.connect(self.run_query)
+            header.addWidget(QLabel(field))
+            header.addWidget(combo, 1)
+            self.filters[field] = combo
+        self.summary = QLabel()
+        header.addWidget(self.summary)
+
+        self.model = MetadataModel(metadata, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(0, Qt.AscendingOrder)
+        self.view.setSelectionBehavior(QTableView.SelectRows)
+        self.view.setEditTriggers(QTableView.NoEditTriggers)
+        self.view.verticalHeader().hide()
+        # 固定行高，十万行的结果也不需要逐行计算尺寸
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.doubleClicked.connect(lambda index: self.file_activated.emit(self.model.path(index.row())))
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(header)
+        layout.addWidget(self.view)
+        metadata.changed.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        """索引变化后更新筛选框中的可选值，并重新查询。"""
+        for field, combo in self.filters.items():
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem(ALL)
+            combo.addItems(self.metadata.values(field))
+            combo.setCurrentIndex(max(combo.findText(current), 0))
+            combo.blockSignals(False)
+        self.run_query()
+
+    def run_query(self):
+        filters = {field: combo.currentText() for field, combo in self.filters.items()
+                   if combo.currentIndex() > 0}
+        rows = self.metadata.query(filters)
+        self.model.set_rows(rows, self.metadata.fields())
+        self.summary.setText(f"{len(rows)} / {len(self.metadata)}")
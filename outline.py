@@ -0,0 +1,126 @@
+# outline.py
+
+from bisect import bisect_left, bisect_right
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, QVariant
+
+
+class OutlineModel(QAbstractListModel):
+    """
+    文档大纲索引（标题列表），按块号有序存储，增量维护。
+
+    - 标题的识别由 MarkdownHighlighter.highlightBlock 通过 record() 上报，
+      因此只有高亮器实际访问过的块会被重新判定；
+    - 块的插入/删除由 QTextDocument.contentsChange 驱动，只平移受影响范围之后的块号，
+      从不重新扫描整个文档。
+    """
+
+    BlockNumberRole = Qt.UserRole + 1
+    LevelRole = Qt.UserRole + 2
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self._document = document
+        self._numbers = []   # 标题所在块号（升序）
+        self._entries = []   # 与 _numbers 对应的 (级别, 标题文本)
+        self._pending = {}   # 高亮器上报但尚未合并的 {块号: (级别, 标题) 或 None}
+        self._block_count = document.blockCount()
+
+        # 非编辑触发的重新高亮（如延迟的整体 rehighlight）没有 contentsChange，靠空闲时合并
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+
+        # 必须在高亮器之后连接，保证槽函数执行时本次修改涉及的块都已高亮完毕
+        document.contentsChange.connect(self.on_contents_change)
+
+    # ---- Qt 模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._entries):
+            return QVariant()
+        level, title = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return "    " * (level - 1) + title
+        if role == Qt.ToolTipRole:
+            return title
+        if role == self.BlockNumberRole:
+            return self._numbers[index.row()]
+        if role == self.LevelRole:
+            return level
+        return QVariant()
+
+    # ---- 查询 ----
+
+    def block_number(self, row):
+        return self._numbers[row]
+
+    def headings(self):
+        """返回 [(块号, 级别, 标题), ...] 的快照。"""
+        return [(number, level, title) for number, (level, title) in zip(self._numbers, self._entries)]
+
+    def section_at(self, block_number):
+        """返回包含指定块的标题所在行号（二分查找），块位于第一个标题之前时返回 -1。"""
+        return bisect_right(self._numbers, block_number) - 1
+
+    # ---- 增量维护 ----
+
+    def record(self, block_number, heading):
+        """由高亮器调用：记录某个块重新高亮后的标题信息（None 表示不是标题）。"""
+        self._pending[block_number] = heading
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(0)
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        doc = self._document
+        block_count = doc.blockCount()
+        delta = block_count - self._block_count
+        self._block_count = block_count
+
+        first = doc.findBlock(position).blockNumber()
+        last_block = doc.findBlock(position + chars_added)
+        last_new = last_block.blockNumber() if last_block.isValid() else block_count - 1
+        last_old = last_new - delta
+
+        # 块数变化时，旧文档中的 (first, last_old] 已被替换：移除其中的标题，再平移其后的块号。
+        # first 块本身在新旧文档中块号相同，和块数不变的情况一样交给 _pending 覆盖即可。
+        if delta:
+            lo = bisect_right(self._numbers, first)
+            hi = bisect_right(self._numbers, last_old)
+            if hi > lo:
+                self.beginRemoveRows(QModelIndex(), lo, hi - 1)
+                del self._numbers[lo:hi]
+                del self._entries[lo:hi]
+                self.endRemoveRows()
+            for i in range(lo, len(self._numbers)):
+                self._numbers[i] += delta
+
+        # 被替换范围内的块高亮器一定会重新访问，其结果在 _pending 中
+        self.flush()
+
+    def flush(self):
+        """把高亮器上报的结果合并进索引。"""
+        self._flush_timer.stop()
+        pending, self._pending = self._pending, {}
+        for number in sorted(pending):
+            heading = pending[number]
+            row = bisect_left(self._numbers, number)
+            exists = row < len(self._numbers) and self._numbers[row] == number
+            if heading is None:
+                if exists:
+                    self.beginRemoveRows(QModelIndex(), row, row)
+                    del self._numbers[row]
+                    del self._entries[row]
+                    self.endRemoveRows()
+            elif exists:
+                if self._entries[row] != heading:
+                    self._entries[row] = heading
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index)
+            else:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._numbers.insert(row, number)
+                self._entries.insert(row, heading)
+                self.endInsertRows()
@@ -0,0 +1,238 @@
+# pdf_export.py
+#
+# 批量导出 PDF：复用预览区的渲染流程（renderer 与包含指令），用一个小的离屏 QWebEnginePage 池
+# 并发调用 printToPdf，并发数受池大小限制；只有页面空闲时才渲染下一个文件，
+# 内存中同时存在的文档不超过池大小。通过内容哈希清单跳过未修改的文件（包括被包含的片段）。
+#
+# 用法: python pdf_export.py <文件夹> [-o 输出目录] [-j 页面数] [--theme 主题] [--force]
+# 未指定 QT_QPA_PLATFORM 时使用 offscreen 平台，不需要显示器。
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from functools import partial
+from PyQt5.QtCore import Qt, QCoreApplication, QObject, QTimer, QUrl, QMarginsF, pyqtSignal
+from PyQt5.QtGui import QPageLayout, QPageSize
+
+import renderer
+import site_export
+from includes import FragmentCache, render_document
+
+MANIFEST_NAME = '.pdf-manifest.json'
+
+
+class PdfBatchExporter(QObject):
+    """把文件夹下的 Markdown 批量导出为 PDF。"""
+
+    progress = pyqtSignal(str, bool, float)  # 相对路径, 是否成功, 耗时（秒）
+    finished = pyqtSignal(dict)              # 统计信息
+
+    JOB_TIMEOUT_MS = 60000  # 单个文件加载并打印的最长时间，超时的页面被丢弃，换一个新页面继续
+
+    def __init__(self, folder, output, css, pool_size=3, force=False, parent=None):
+        super().__init__(parent)
+        self.folder = os.path.abspath(folder)
+        self.output = os.path.abspath(output)
+        self.css = css
+        self.pool_size = max(1, pool_size)
+        self.force = force
+        self.page_layout = QPageLayout(QPageSize(QPageSize.A4), QPageLayout.Portrait,
+                                       QMarginsF(15, 15, 15, 15), QPageLayout.Millimeter)
+        self._queue = deque()
+        self._pages = []
+        self._jobs = {}  # 页面 -> (相对路径, 开始时间, 清单条目)
+        self._timers = {}  # 页面 -> 超时定时器
+        self._done = False
+        self._fragments = FragmentCache()
+        self._temp_dir = None
+        self._manifest = None
+        self._stats = {'exported': 0, 'skipped': 0, 'failed': 0}
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._manifest = site_export.load_manifest(os.path.join(self.output, MANIFEST_NAME))
+        config = hashlib.sha256(json.dumps(
+            [self.css, renderer.MARKDOWN_EXTENSIONS, renderer.EXTENSION_CONFIGS, "A4-portrait-15mm"],
+            sort_keys=True).encode('utf-8')).hexdigest()
+        if self.force or self._manifest['config'] != config:
+            self._manifest['files'] = {}
+        self._manifest['config'] = config
+        files = self._manifest['files']
+
+        markdown_files, _ = site_export.find_files(self.folder, self.output)
+        for relative in set(files) - set(markdown_files):
+            target = self._target(relative)
+            if os.path.exists(target):
+                os.remove(target)
+            del files[relative]
+        for relative in markdown_files:
+            fresh, entry = site_export.is_up_to_date(
+                files.get(relative), os.path.join(self.folder, relative), self._target(relative))
+            if fresh and not site_export.includes_changed(entry, self.folder, self._fragments):
+                files[relative] = entry
+                self._stats['skipped'] += 1
+            else:
+                files.pop(relative, None)
+                self._queue.append((relative, entry))
+
+        if not self._queue:
+            self._finish()
+            return
+        self._temp_dir = tempfile.mkdtemp(prefix="md-pdf-")
+        # 队列中的文件可能在 _next 中全部失败，队列空了就不再创建页面
+        while self._queue and len(self._pages) < self.pool_size:
+            self._next(self._new_page())
+
+    def _new_page(self):
+        from PyQt5.QtWebEngineWidgets import QWebEnginePage  # 需要时才加载 Chromium 的库
+
+        page = QWebEnginePage(self)
+        page.loadFinished.connect(partial(self._on_loaded, page))
+        page.pdfPrintingFinished.connect(partial(self._on_printed, page))
+        timer = QTimer(page)
+        timer.setSingleShot(True)
+        timer.timeout.connect(partial(self._on_timeout, page))
+        self._timers[page] = timer
+        self._pages.append(page)
+        return page
+
+    def _target(self, relative):
+        return os.path.join(self.output, os.path.splitext(relative)[0] + '.pdf')
+
+    def _next(self, page):
+        """页面空闲时才渲染下一个文件（背压）。"""
+        self._timers[page].stop()
+        while self._queue:
+            relative, entry = self._queue.popleft()
+            source = os.path.join(self.folder, relative)
+            try:
+                with open(source, 'r', encoding='utf-8') as f:
+                    html, _, dependencies = render_document(f.read(), source, self._fragments)
+                entry = dict(entry, includes=site_export.relative_includes(
+                    {path: self._fragments.digest(path) for path in dependencies}, self.folder))
+                base_href = QUrl.fromLocalFile(os.path.dirname(source) + os.sep).toString()
+                page_html = renderer.build_page(html, self.css, os.path.basename(source), base_href)
+                # 通过临时文件加载，避免 setHtml 的 2MB 限制
+                temp = os.path.join(self._temp_dir, f"{id(page)}.html")
+                with open(temp, 'w', encoding='utf-8') as f:
+                    f.write(page_html)
+            except Exception as e:
+                self._fail(relative, e)
+                continue
+            self._jobs[page] = (relative, time.perf_counter(), entry)
+            self._timers[page].start(self.JOB_TIMEOUT_MS)
+            page.load(QUrl.fromLocalFile(temp))
+            return
+        self._jobs.pop(page, None)
+        if not self._jobs:
+            self._finish()
+
+    def _on_loaded(self, page, ok):
+        if page not in self._jobs:
+            return
+        relative = self._jobs[page][0]
+        if not ok:
+            self._fail(relative, "页面加载失败")
+            self._next(page)
+            return
+        target = self._target(relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        page.printToPdf(target + ".part", self.page_layout)
+
+    def _on_printed(self, page, path, success):
+        if page not in self._jobs:
+            return
+        relative, started, entry = self._jobs[page]
+        if success:
+            os.replace(path, self._target(relative))
+            self._manifest['files'][relative] = entry
+            self._stats['exported'] += 1
+            self.progress.emit(relative, True, time.perf_counter() - started)
+        else:
+            self._fail(relative, "打印 PDF 失败")
+        self._next(page)
+
+    def _on_timeout(self, page):
+        """loadFinished 或 pdfPrintingFinished 迟迟没有到达：放弃该文件，丢弃这个页面。"""
+        relative = self._jobs.pop(page)[0]
+        self._fail(relative, "页面加载或打印超时")
+        self._pages.remove(page)
+        del self._timers[page]
+        page.deleteLater()
+        if self._queue:
+            self._next(self._new_page())
+        elif not self._jobs:
+            self._finish()
+
+    def _fail(self, relative, error):
+        print(f"导出 PDF 失败 {relative}: {error}")
+        self._stats['failed'] += 1
+        self.progress.emit(relative, False, 0.0)
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        for page in self._pages:
+            page.deleteLater()
+        self._pages = []
+        self._timers = {}
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+        os.makedirs(self.output, exist_ok=True)
+        site_export.write_atomic(os.path.join(self.output, MANIFEST_NAME),
+                                 json.dumps(self._manifest, ensure_ascii=False, indent=1))
+        self._stats['elapsed'] = time.perf_counter() - self._start
+        self.finished.emit(dict(self._stats))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把文件夹下的 Markdown 批量导出为 PDF")
+    parser.add_argument("folder", help="Markdown 文件夹")
+    parser.add_argument("-o", "--output", help="输出目录（默认为 <文件夹>/_pdf）")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help="并发的离屏页面数")
+    parser.add_argument("--theme", default=None, help="使用的主题（默认为编辑器当前主题）")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，全部重新导出")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"文件夹不存在: {args.folder}")
+        return 2
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    # QtWebEngine 在 QApplication 创建之后才导入，需要先开启 OpenGL 上下文共享
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    output = args.output or os.path.join(args.folder, "_pdf")
+    exporter = PdfBatchExporter(args.folder, output, site_export.css_from_settings(args.theme),
+                                args.jobs, args.force)
+    exporter.progress.connect(
+        lambda relative, ok, seconds: print(f"{seconds * 1000:8.1f} ms  {relative}" if ok else f"失败  {relative}"))
+    result = {}
+
+    def on_finished(stats):
+        result.update(stats)
+        app.quit()
+
+    exporter.finished.connect(on_finished)
+    exporter.start()
+    if not result:
+        app.exec_()
+
+    print(f"导出 {result['exported']} 个，跳过 {result['skipped']} 个未修改文件，失败 {result['failed']} 个，"
+          f"总耗时 {result['elapsed']:.2f} s")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
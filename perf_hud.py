@@ -0,0 +1,119 @@
+# perf_hud.py
+#
+# 性能面板：在状态栏显示高亮、渲染、预览和保存的最近一次耗时与 p95，以及预览队列和进程内存。
+#   - 每个指标的样本保存在定长的环形缓冲区中；
+#   - 逐块调用的高亮耗时按事件循环合并为一个样本，只在面板打开时统计。
+
+import os
+import sys
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+# 状态栏中显示的耗时指标：名称 -> 显示文字
+METRICS = {
+    'highlight': "高亮",
+    'render': "渲染",
+    'preview': "预览",
+    'save': "保存",
+}
+
+
+class RingBuffer:
+    """定长环形缓冲区，只保留最近 size 个样本。"""
+
+    def __init__(self, size=128):
+        self._values = [0.0] * size
+        self._count = 0
+
+    def append(self, value):
+        self._values[self._count % len(self._values)] = value
+        self._count += 1
+
+    def __len__(self):
+        return min(self._count, len(self._values))
+
+    def last(self):
+        return self._values[(self._count - 1) % len(self._values)] if self._count else None
+
+    def percentile(self, p):
+        values = sorted(self._values[:len(self)])
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def process_rss():
+    """返回当前进程的常驻内存（字节），无法获取时返回 None。"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                           'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                           'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                           'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+
+class PerfMonitor(QObject):
+    """
+    收集各环节的耗时，每个指标保存在一个环形缓冲区中。
+    高亮是逐块调用的，用 accumulate() 把同一轮事件循环中的耗时合并为一个样本。
+    """
+
+    def __init__(self, size=128, parent=None):
+        super().__init__(parent)
+        self.samples = {name: RingBuffer(size) for name in METRICS}
+        self._started = {}
+        self._accumulated = {}
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush)
+
+    def record(self, name, seconds):
+        self.samples[name].append(seconds)
+
+    def start(self, name):
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.record(name, time.perf_counter() - started)
+
+    def running(self, name):
+        return name in self._started
+
+    def accumulate(self, name, seconds):
+        self._accumulated[name] = self._accumulated.get(name, 0.0) + seconds
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(0)
+
+    def _flush(self):
+        for name, seconds in self._accumulated.items():
+            self.record(name, seconds)
+        self._accumulated = {}
+
+    def summary(self):
+        """返回状态栏中显示的耗时文字：每项为 最近一次/p95（毫秒）。"""
+        parts = []
+        for name, label in METRICS.items():
+            buffer = self.samples[name]
+            if len(buffer):
+                parts.append(f"{label} {buffer.last() * 1000:.1f}/{buffer.percentile(0.95) * 1000:.1f}ms")
+            else:
+                parts.append(f"{label} -")
+        return "  ".join(parts)
@@ -0,0 +1,253 @@
+# preview_backend.py
+#
+# 可切换的预览后端，对外提供相同的接口（ScrollSync 只依赖这些接口）：
+#   set_html(head, body, base_url)   整体加载页面，完成后发出 loaded 信号
+#   update_body(body, callback)      只替换正文
+#   scroll_to_anchor(i, frac)        滚动到第 i 个顶层元素
+#   anchor_at(y, callback)           以 [锚点序号, 比例] 回调纵坐标 y 处的位置
+#   set_theme_variables(variables)   只替换主题相关的 CSS 变量（见 renderer.theme_variables）
+#   scrolled 信号                    预览滚动到的纵坐标
+#
+# webengine：QWebEngineView，完整支持 HTML/CSS/JS，但每个页面都有独立的 Chromium 进程；
+# textbrowser：进程内的 QTextBrowser，只支持 HTML 子集（不执行脚本、CSS 有限），内存占用小得多。
+# QtWebEngine 在第一次创建 webengine 预览时才导入，使用 textbrowser 时不会加载 Chromium 的库。
+
+import json
+import re
+from bisect import bisect_right
+from PyQt5.QtCore import Qt, QUrl, pyqtSignal
+from PyQt5.QtGui import QDesktopServices
+from PyQt5.QtWidgets import QTextBrowser
+
+DEFAULT_BACKEND = 'webengine'
+
+# 注入预览页面的脚本：按需读取元素位置并二分查找，从不整体测量 DOM
+SCROLL_SYNC_SCRIPT = """
+<script>
+window.srcmap = (function () {
+    var els = null;
+    function anchors() {
+        if (els === null) {
+            els = document.querySelectorAll('[data-source-line]');
+        }
+        return els;
+    }
+    function top(i) {
+        var list = anchors();
+        if (i < 0) {
+            return 0;
+        }
+        if (i >= list.length) {
+            return document.documentElement.scrollHeight;
+        }
+        return list[i].getBoundingClientRect().top + window.scrollY;
+    }
+    return {
+        // 滚动到第 i 个锚点元素，frac 为到下一个锚点之间的比例
+        scrollToAnchor: function (i, frac) {
+            var y = top(i);
+            window.scrollTo(0, y + (top(i + 1) - y) * frac);
+        },
+        // 返回位于纵坐标 y 处的 [锚点序号, 比例]
+        anchorAt: function (y) {
+            var lo = -1, hi = anchors().length - 1;
+            while (lo < hi) {
+                var mid = (lo + hi + 1) >> 1;
+                if (top(mid) <= y) { lo = mid; } else { hi = mid - 1; }
+            }
+            var start = top(lo), end = top(lo + 1);
+            return [lo, end > start ? Math.min(1, (y - start) / (end - start)) : 0];
+        },
+        // 原地替换正文，保留滚动位置与已加载的资源
+        update: function (html) {
+            document.body.innerHTML = html;
+            els = null;
+            if (window.hljs) {
+                hljs.highlightAll();
+            }
+        }
+    };
+})();
+</script>
+"""
+
+
+WebEnginePreview = None  # 第一次创建时定义，见 create_webengine_preview()
+
+
+def create_webengine_preview(parent=None):
+    """导入 QtWebEngine 并创建基于 Chromium 的预览。"""
+    global WebEnginePreview
+    if WebEnginePreview is None:
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+
+        class WebEnginePreview(QWebEngineView):
+            """基于 Chromium 的预览，滚动定位通过注入页面的 srcmap 脚本完成。"""
+
+            backend_name = 'webengine'
+            scrolled = pyqtSignal(float)
+            loaded = pyqtSignal(bool)
+
+            def __init__(self, parent=None):
+                super().__init__(parent)
+                self.setContextMenuPolicy(Qt.NoContextMenu)  # 禁用右键菜单
+                self.page().scrollPositionChanged.connect(lambda position: self.scrolled.emit(position.y()))
+                self.loadFinished.connect(self.loaded)
+
+            def set_html(self, head, body, base_url):
+                self.setHtml(f"<head>{head}{SCROLL_SYNC_SCRIPT}</head><body>{body}</body>", base_url)
+
+            def update_body(self, body, callback):
+                self.page().runJavaScript(f"srcmap.update({json.dumps(body)});", lambda _: callback())
+
+            def scroll_to_anchor(self, i, frac):
+                self.page().runJavaScript(f"srcmap.scrollToAnchor({i}, {frac:.4f});")
+
+            def anchor_at(self, y, callback):
+                self.page().runJavaScript(f"srcmap.anchorAt({y:.1f});", callback)
+
+            def set_theme_variables(self, variables):
+                # 行内样式优先于页面中 :root 的声明，页面无需重新加载
+                self.page().runJavaScript("".join(
+                    f"document.documentElement.style.setProperty({json.dumps(name)}, {json.dumps(value)});"
+                    for name, value in variables.items()))
+
+    return WebEnginePreview(parent)
+
+
+class TextBrowserPreview(QTextBrowser):
+    """
+    低内存预览：在进程内用 QTextBrowser 显示 HTML 子集，只保留 head 中的 <style>，
+    并把其中的 CSS 变量替换为具体的值（QTextBrowser 不支持 var()）。
+    QTextBrowser 会丢弃 data-source-line 属性，因此在每个顶层元素的第一段文字前
+    插入 <a name="srcmap-N"> 锚点，设置 HTML 后按需遍历一次文本块找到各锚点所在的块，
+    纵坐标在查找时才向布局询问，布局变化（如改变宽度）不需要重新遍历。
+    """
+
+    backend_name = 'textbrowser'
+    scrolled = pyqtSignal(float)
+    loaded = pyqtSignal(bool)
+
+    STYLE_RE = re.compile(r'<style[^>]*>.*?</style>', re.S | re.I)
+    VARIABLE_RE = re.compile(r'(--[\w-]+)\s*:\s*([^;}]+)')
+    VAR_USE_RE = re.compile(r'var\((--[\w-]+)\)')
+    # 顶层元素的起始标签，以及紧随其后的列表项、表格行等容器标签
+    ANCHOR_RE = re.compile(r'<\w+[^>]*\sdata-source-line="\d+"[^>]*>'
+                           r'(?:\s*<(?:li|thead|tbody|tr|th|td|p)\b[^>]*>)*')
+    ANCHOR_PREFIX = 'srcmap-'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setOpenLinks(False)
+        self.anchorClicked.connect(self.open_link)
+        self._styles = ""
+        self._variables = {}
+        self._body = ""
+        self._anchor_count = 0
+        self._blocks = None  # 各锚点所在的文本块，重新设置 HTML 后重新查找
+        self.verticalScrollBar().valueChanged.connect(lambda value: self.scrolled.emit(float(value)))
+
+    def set_html(self, head, body, base_url):
+        self._styles = "".join(self.STYLE_RE.findall(head))
+        self._variables = dict((name, value.strip()) for name, value in self.VARIABLE_RE.findall(self._styles))
+        self._show(body, base_url)
+        self.loaded.emit(True)
+
+    def update_body(self, body, callback):
+        # QTextBrowser 无法局部更新，整体重新设置后由 callback 恢复滚动位置
+        self._show(body, self.document().baseUrl())
+        callback()
+
+    def set_theme_variables(self, variables):
+        self._variables.update(variables)
+        value = self.verticalScrollBar().value()
+        self._show(self._body, self.document().baseUrl())
+        self.verticalScrollBar().setValue(value)
+
+    def _show(self, body, base_url):
+        self._body = body
+        count = [0]
+
+        def add_anchor(match):
+            count[0] += 1
+            return f'{match.group(0)}<a name="{self.ANCHOR_PREFIX}{count[0] - 1}"></a>'
+
+        body = self.ANCHOR_RE.sub(add_anchor, body)
+        styles = self.VAR_USE_RE.sub(lambda m: self._variables.get(m.group(1), 'initial'), self._styles)
+        self.document().setBaseUrl(base_url)
+        self.setHtml(f"<html><head>{styles}</head><body>{body}</body></html>")
+        self._anchor_count = count[0]
+        self._blocks = None
+
+    def anchor_tops(self):
+        """
+        返回各锚点的纵坐标（升序），可以直接用于 bisect；每个坐标在访问时才从布局中读取。
+        被 Qt 丢弃的锚点沿用前一个锚点的位置。
+        """
+        if self._blocks is None:
+            found = {}
+            block = self.document().begin()
+            while block.isValid():
+                it = block.begin()
+                while not it.atEnd():
+                    for name in it.fragment().charFormat().anchorNames():
+                        if name.startswith(self.ANCHOR_PREFIX):
+                            found[int(name[len(self.ANCHOR_PREFIX):])] = block
+                    it += 1
+                block = block.next()
+            blocks, last = [], None
+            for i in range(self._anchor_count):
+                last = found.get(i, last)
+                blocks.append(last)
+            self._blocks = blocks
+        return _AnchorTops(self.document().documentLayout(), self._blocks)
+
+    def _top(self, i):
+        tops = self.anchor_tops()
+        if i < 0:
+            return 0.0
+        if i >= len(tops):
+            return float(self.document().size().height())
+        return tops[i]
+
+    def scroll_to_anchor(self, i, frac):
+        y = self._top(i)
+        self.verticalScrollBar().setValue(int(y + (self._top(i + 1) - y) * frac))
+
+    def anchor_at(self, y, callback):
+        i = bisect_right(self.anchor_tops(), y) - 1
+        start, end = self._top(i), self._top(i + 1)
+        callback([i, min(1.0, (y - start) / (end - start)) if end > start else 0.0])
+
+    def open_link(self, url):
+        if url.scheme() == '' and url.path() == '' and url.fragment():
+            self.scrollToAnchor(url.fragment())
+        else:
+            QDesktopServices.openUrl(self.document().baseUrl().resolved(url))
+
+
+class _AnchorTops:
+    """锚点纵坐标的只读序列：按下标读取时才计算对应文本块的位置。"""
+
+    def __init__(self, layout, blocks):
+        self._layout = layout
+        self._blocks = blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __getitem__(self, i):
+        block = self._blocks[i]
+        return self._layout.blockBoundingRect(block).top() if block is not None else 0.0
+
+
+# 名称 -> (设置界面中显示的说明, 创建函数)
+PREVIEW_BACKENDS = {
+    'webengine': ("浏览器内核（完整渲染）", create_webengine_preview),
+    'textbrowser': ("轻量（低内存，HTML 子集）", TextBrowserPreview),
+}
+
+
+def create_preview(name, parent=None):
+    """按名称创建预览控件，未知名称使用默认后端。"""
+    return PREVIEW_BACKENDS.get(name, PREVIEW_BACKENDS[DEFAULT_BACKEND])[1](parent)
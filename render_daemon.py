@@ -0,0 +1,304 @@
+# render_daemon.py
+#
+# 本地渲染服务：构建脚本和本地文档浏览器通过 HTTP 获取与预览区相同的 HTML
+# （相同的扩展、源码行号标注、包含指令和 CSS），不必每个文件启动一次 Python 解释器。
+#   - 只监听 127.0.0.1；渲染在常驻的进程池中进行，每个工作进程启动时预热（导入 markdown、
+#     Pygments 并渲染一次），并各自保留一份片段缓存；
+#   - 请求先进入队列，有空闲的工作进程时立即发出；所有进程都忙时，期间到达的请求合并成批，
+#     一批只需一次进程间往返；
+#   - 结果按 (路径, 内容哈希, 是否整页) 缓存在服务进程中，所有连接共享；命中时用 stat 指纹
+#     检查包含的文件是否变化。同时到达的相同请求只渲染一次。
+# 预览区把大图换成缩略图，这依赖编辑器的缩略图缓存，服务输出的是原图地址。
+# 网页也能向 127.0.0.1 发请求，因此只接受 Host 为 127.0.0.1/localhost 且不带 Origin 头的请求
+# （防止跨站请求与 DNS 重绑定），包含指令只能读取 --root 目录中的文件。
+#
+# 用法: python render_daemon.py [--port 8765] [-j 进程数] [--theme 主题] [--root 目录]
+#   或: python app.py serve ...
+#
+# 接口：
+#   POST /render  {"text": "...", "path": "文件路径（可选，用于解析包含指令）", "page": false}
+#                 或 {"documents": [{...}, ...]} 一次提交多个文档
+#       返回 {"html": "...", "source_lines": [...]}，出错时为 {"error": "..."}；
+#       多个文档时返回 {"results": [...]}。page 为 true 时返回带 CSS 的完整页面。
+#   GET /css      预览区的 <head> 内容（CSS 与 highlight.js）
+#   GET /stats    请求数、缓存命中数、平均批大小等
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import renderer
+from includes import FragmentCache, render_document
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 << 20
+WARMUP_TEXT = "# 预热\n\n段落 **加粗** `代码`\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n```python\nprint(1)\n```\n"
+
+_fragment_cache = None  # 工作进程内的片段缓存
+
+
+def stat_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _init_worker(root):
+    """工作进程启动时执行：建立片段缓存并渲染一次，让 markdown 扩展与 Pygments 完成导入。"""
+    global _fragment_cache
+    _fragment_cache = FragmentCache(root=root)
+    render_document(WARMUP_TEXT, None, _fragment_cache, source_map=True)
+
+
+def _ping():
+    return os.getpid()
+
+
+def render_batch(documents, css):
+    """
+    在工作进程中执行：documents 为 [(文字, 路径, 是否整页), ...]。
+    返回 [(结果字典, {依赖的文件: stat 指纹}), ...]，单个文档出错不影响同一批中的其他文档。
+    """
+    results = []
+    for text, path, page in documents:
+        try:
+            html, source_lines, dependencies = render_document(text, path, _fragment_cache, source_map=True)
+            if page:
+                base_href = Path(os.path.dirname(path)).as_uri() + '/' if path else None
+                title = os.path.basename(path) if path else None
+                html = renderer.build_page(html, css, title, base_href)
+            results.append(({'html': html, 'source_lines': source_lines},
+                            {dependency: stat_fingerprint(dependency) for dependency in dependencies}))
+        except Exception as e:
+            results.append(({'error': f"渲染时发生错误: {e}"}, {}))
+    return results
+
+
+class RenderService:
+    """进程池、批处理与共享结果缓存。render() 可以在任意线程中调用。"""
+
+    def __init__(self, css, jobs=None, root=None, batch_size=32, cache_size=4096):
+        self.css = css
+        self.jobs = jobs or os.cpu_count() or 1
+        self.root = root
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.pool = self._new_pool()
+        self._closed = False
+        # 预热：提交几个空任务，让工作进程在第一个请求到达之前启动并完成初始化
+        wait([self.pool.submit(_ping) for _ in range(self.jobs * 2)])
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (路径, 内容哈希, 是否整页) -> (结果, {依赖: 指纹})
+        self._inflight = {}          # 正在渲染的请求，相同的请求共用一个 Future
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.jobs)
+        self.stats = {'requests': 0, 'hits': 0, 'renders': 0, 'batches': 0, 'errors': 0}
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(self.root,))
+
+    def render(self, text, path=None, page=False):
+        """提交一个文档，返回 Future，结果为 {'html', 'source_lines'} 或 {'error'}。"""
+        path = os.path.abspath(path) if path else None
+        key = (path, hashlib.sha1(text.encode('utf-8')).hexdigest(), bool(page))
+        with self._lock:
+            self.stats['requests'] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                result, dependencies = cached
+                if all(stat_fingerprint(dep) == known for dep, known in dependencies.items()):
+                    self._cache.move_to_end(key)
+                    self.stats['hits'] += 1
+                    future = Future()
+                    future.set_result(result)
+                    return future
+                del self._cache[key]
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                self._queue.put((key, text, path, bool(page)))
+            return future
+
+    def _dispatch(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # 所有工作进程都忙时在这里等待，期间到达的请求在队列中攒成一批
+            self._slots.acquire()
+            batch = [first]
+            limit = min(self.batch_size, 1 + self._queue.qsize() // self.jobs)
+            while len(batch) < limit:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            pool = self.pool
+            try:
+                submitted = pool.submit(render_batch, [item[1:] for item in batch], self.css)
+            except RuntimeError as e:  # 进程池已关闭或损坏
+                self._slots.release()
+                self._fail(batch, e, pool)
+                continue
+            submitted.add_done_callback(partial(self._finish, batch, pool))
+
+    def _finish(self, batch, pool, submitted):
+        self._slots.release()
+        if submitted.exception() is not None:
+            self._fail(batch, submitted.exception(), pool)
+            return
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['renders'] += len(batch)
+            for (key, *_), (result, dependencies) in zip(batch, submitted.result()):
+                if 'error' in result:
+                    self.stats['errors'] += 1
+                else:
+                    self._cache[key] = (result, dependencies)
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                self._inflight.pop(key).set_result(result)
+
+    def _fail(self, batch, error, pool):
+        with self._lock:
+            self.stats['errors'] += len(batch)
+            futures = [self._inflight.pop(key) for key, *_ in batch]
+            if isinstance(error, BrokenProcessPool) and pool is self.pool and not self._closed:
+                # 工作进程意外退出（如被系统杀掉）后进程池不再可用，换一个新的，服务继续运行
+                self.pool = self._new_pool()
+                pool.shutdown(wait=False)
+        for future in futures:
+            future.set_result({'error': f"渲染时发生错误: {error}"})
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats, workers=self.jobs, cached=len(self._cache), queued=self._queue.qsize())
+        stats['average_batch'] = round(stats['renders'] / stats['batches'], 2) if stats['batches'] else 0
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._dispatcher.join()
+        with self._lock:
+            self._closed = True
+        self.pool.shutdown()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    # 保持连接，客户端可以在一个连接上连续发送请求；关闭 Nagle 算法，
+    # 否则响应头与正文分两次写出时会等待对方的延迟确认（约 40 ms）
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _allowed(self):
+        """只接受本机客户端直接发来的请求：网页中的脚本会带上 Origin，DNS 重绑定时 Host 为其他域名。"""
+        port = self.server.server_address[1]
+        if self.headers.get('Host') not in (f'127.0.0.1:{port}', f'localhost:{port}') or 'Origin' in self.headers:
+            self._send_json(403, {'error': "只接受来自本机客户端的请求"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        service = self.server.service
+        if self.path == '/css':
+            self._send(200, service.css.encode('utf-8'), 'text/html; charset=utf-8')
+        elif self.path == '/stats':
+            self._send_json(200, service.snapshot())
+        else:
+            self._send_json(404, {'error': f"未知的路径: {self.path}"})
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        if self.path != '/render':
+            self._send_json(404, {'error': f"未知的路径: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY_BYTES:
+                self._send_json(413, {'error': "请求过大"})
+                return
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            documents = request['documents'] if 'documents' in request else [request]
+            futures = [self.server.service.render(doc['text'], doc.get('path'), doc.get('page', False))
+                       for doc in documents]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send_json(400, {'error': f"请求格式错误: {e}"})
+            return
+        results = [future.result() for future in futures]
+        self._send_json(200, {'results': results} if 'documents' in request else results[0])
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(port=DEFAULT_PORT, jobs=None, theme_name=None, verbose=False, root=None):
+    import site_export
+
+    root = os.path.abspath(root or os.getcwd())
+    service = RenderService(site_export.css_from_settings(theme_name), jobs, root)
+    server = ThreadingHTTPServer(('127.0.0.1', port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    # 收到 SIGTERM（如 Popen.terminate()、systemd 停止服务）时与 Ctrl+C 一样正常退出，
+    # 由 finally 关闭进程池，否则工作进程会留在后台。shutdown() 会等待 serve_forever 返回，必须在其他线程中调用
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"渲染服务已启动: http://127.0.0.1:{server.server_address[1]}/ （{service.jobs} 个工作进程，"
+          f"包含指令限于 {root}）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 Markdown 渲染服务，输出与预览区相同的 HTML")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认 {DEFAULT_PORT}，0 表示随机）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="渲染进程数（默认为 CPU 核数）")
+    parser.add_argument("--theme", default=None, help="使用的主题（默认为编辑器当前主题）")
+    parser.add_argument("--root", default=None, help="包含指令只能读取该目录中的文件（默认为当前目录）")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args(argv)
+    return serve(args.port, args.jobs, args.theme, args.verbose, args.root)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+# renderer.py
+
+import re
+from html import escape
+import markdown
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.treeprocessors import Treeprocessor
+from markdown.postprocessors import Postprocessor
+
+# 预览区使用的 Markdown 扩展及其配置
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'codehilite']
+EXTENSION_CONFIGS = {
+    'codehilite': {
+        'noclasses': False,  # 使用类而不是行内样式
+        'guess_lang': False  # 禁止自动猜测语言
+    }
+}
+
+# 源码行号标记，使用私有区字符，避免与 Python-Markdown 自身的 \x02/\x03 占位符冲突
+MARKER_START = '\ue000'
+MARKER_END = '\ue001'
+MARKER_RE = re.compile(MARKER_START + r'(\d+)' + MARKER_END)
+
+
+class SourceLinePreprocessor(Preprocessor):
+    """在每个块的起始行末尾插入行号标记（跳过围栏代码、HTML 块、引用定义和分隔线）。"""
+
+    FENCE_RE = re.compile(r'^\s{0,3}(`{3,}|~{3,})')
+    BLOCK_START_RE = re.compile(r'^\s{0,3}(#{1,6}\s|[-*+]\s|\d+[.)]\s|>)')
+    SKIP_RE = re.compile(r'^\s{0,3}(<|\[[^\]]+\]:|([-*_])(\s*\2){2,}\s*$)')
+    # 标记插在行尾空白之前，标题的闭合 # 与表格的结尾 | 也保持在标记之后
+    TAIL_RE = re.compile(r'(?:\s+#+|\s*\|)?\s*$')
+
+    def run(self, lines):
+        self.md.source_line_count = len(lines)
+        fence = None
+        previous_blank = True
+        for number, line in enumerate(lines):
+            match = self.FENCE_RE.match(line)
+            if fence:
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                    fence = None
+                previous_blank = False
+                continue
+            if match:
+                fence = match.group(1)
+                previous_blank = False
+                continue
+            if not line.strip():
+                previous_blank = True
+                continue
+            if (previous_blank or self.BLOCK_START_RE.match(line)) and not self.SKIP_RE.match(line):
+                tail = self.TAIL_RE.search(line).start()
+                lines[number] = f"{line[:tail]}{MARKER_START}{number}{MARKER_END}{line[tail:]}"
+            previous_blank = False
+        return lines
+
+
+class SourceLineTreeprocessor(Treeprocessor):
+    """移除行号标记，并把每个顶层元素的源码行范围写入 data-source-line 属性。"""
+
+    def run(self, root):
+        anchors = []
+        for element in root:
+            first = None
+            for node in element.iter():
+                for attr in ('text', 'tail'):
+                    value = getattr(node, attr)
+                    if value and MARKER_START in value:
+                        numbers = [int(n) for n in MARKER_RE.findall(value)]
+                        if numbers and (first is None or numbers[0] < first):
+                            first = numbers[0]
+                        setattr(node, attr, MARKER_RE.sub('', value))
+            # 只保留严格递增的行号，保证两侧索引都可以二分查找
+            if first is not None and (not anchors or first > anchors[-1][0]):
+                anchors.append((first, element))
+
+        line_count = getattr(self.md, 'source_line_count', 0)
+        for i, (first, element) in enumerate(anchors):
+            last = anchors[i + 1][0] - 1 if i + 1 < len(anchors) else line_count - 1
+            element.set('data-source-line', str(first))
+            element.set('data-source-line-end', str(max(first, last)))
+        self.md.source_lines = [first for first, _ in anchors]
+
+
+class SourceLinePostprocessor(Postprocessor):
+    """清除残留在原始 HTML 片段中的行号标记。"""
+
+    def run(self, text):
+        return MARKER_RE.sub('', text)
+
+
+class SourceLineExtension(Extension):
+    """为渲染结果的顶层元素标注源码行号范围，用于编辑区与预览区的滚动同步。"""
+
+    def extendMarkdown(self, md):
+        md.source_lines = []
+        # 在空白规范化（优先级 30）之前运行，行号与编辑器中的块号一一对应
+        md.preprocessors.register(SourceLinePreprocessor(md), 'source_line', 40)
+        # 在行内处理（优先级 20）之后运行，此时标记都已落在最终的文本节点上
+        md.treeprocessors.register(SourceLineTreeprocessor(md), 'source_line', 15)
+        md.postprocessors.register(SourceLinePostprocessor(md), 'source_line', 0)
+
+
+class ImageAttributeTreeprocessor(Treeprocessor):
+    """用回调改写 <img> 的属性（如替换为缩略图、预留尺寸、延迟加载）。"""
+
+    def __init__(self, md, resolve):
+        super().__init__(md)
+        self.resolve = resolve
+
+    def run(self, root):
+        for image in root.iter('img'):
+            attributes = self.resolve(image.get('src', ''))
+            if attributes:
+                for name, value in attributes.items():
+                    image.set(name, str(value))
+
+
+class ImageAttributeExtension(Extension):
+    """resolve(src) 返回要写入 <img> 的属性字典，返回 None 表示保持原样。"""
+
+    def __init__(self, resolve, **kwargs):
+        self.resolve = resolve
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        md.treeprocessors.register(ImageAttributeTreeprocessor(md, self.resolve), 'image_attributes', 14)
+
+
+def render_markdown(md_text, source_map=False, image_resolver=None):
+    """
+    把 Markdown 文本渲染为 HTML 片段。
+    返回 (html, 顶层元素起始行号列表)；未启用 source_map 时行号列表为空。
+    image_resolver 见 ImageAttributeExtension。
+    """
+    extensions = list(MARKDOWN_EXTENSIONS)
+    if source_map:
+        extensions.append(SourceLineExtension())
+    if image_resolver is not None:
+        extensions.append(ImageAttributeExtension(image_resolver))
+    md = markdown.Markdown(extensions=extensions, extension_configs=EXTENSION_CONFIGS)
+    html = md.convert(md_text)
+    return html, list(getattr(md, 'source_lines', []))
+
+
+def theme_variables(bg_color, text_color):
+    """随主题变化的 CSS 变量；预览区切换主题时只需替换这些变量。"""
+    return {'--bg-color': bg_color, '--text-color': text_color}
+
+
+def build_css(bg_color, text_color, font_family, font_size):
+    """
+    生成预览区与导出页面共用的 CSS 样式（并引入 highlight.js）
+    """
+    variables = "; ".join(f"{name}: {value}" for name, value in theme_variables(bg_color, text_color).items())
+    # 选择一个 highlight.js 主题，例如 GitHub
+    highlight_css = """
+    <link rel="stylesheet"
+          href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/styles/github.min.css">
+    """
+
+    highlight_js = """
+    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/highlight.min.js"></script>
+    <script>hljs.highlightAll();</script>
+    """
+
+    css = f"""
+    <style>
+        :root {{ {variables}; }}
+        body {{
+            background-color: var(--bg-color);
+            color: var(--text-color);
+            font-family: "{font_family}";
+            font-size: {font_size}pt;
+            padding: 20px;
+        }}
+        pre {{
+            background-color: #f0f0f0;
+            color: #333333;
+            padding: 10px;
+            border-radius: 5px;
+            overflow: auto;
+        }}
+        code {{
+            background-color: #f0f0f0;
+            color: #333333;
+            padding: 2px 4px;
+            border-radius: 3px;
+        }}
+        table {{
+            border-collapse: collapse;
+        }}
+        table, th, td {{
+            border: 1px solid #555555;
+        }}
+        th, td {{
+            padding: 8px;
+            text-align: left;
+        }}
+        a {{
+            color: #1e90ff;
+        }}
+        .include-error {{
+            color: #d73a49;
+        }}
+    </style>
+    {highlight_css}
+    {highlight_js}
+    """
+    return css
+
+
+def build_page(html, css, title=None, base_href=None):
+    """组合可以独立打开的完整 HTML 页面（导出时使用）；base_href 用于解析相对路径的图片。"""
+    title_tag = f"<title>{escape(title)}</title>\n" if title else ""
+    base_tag = f"<base href=\"{escape(base_href)}\">\n" if base_href else ""
+    return (f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n{base_tag}{title_tag}{css}\n</head>\n"
+            f"<body>\n{html}\n</body>\n</html>\n")
@@ -0,0 +1,152 @@
+# scroll_sync.py
+
+from bisect import bisect_right
+from PyQt5.QtCore import QObject, QPoint, QTimer, pyqtSignal
+
+
+class ScrollSync(QObject):
+    """
+    编辑区与预览区的双向滚动同步。
+
+    两侧各自持有有序的位置索引：Python 侧是顶层元素的起始行号（source_lines），
+    预览侧是各顶层元素的位置（由预览后端维护，见 preview_backend），映射时都只做二分查找。
+    """
+
+    shown = pyqtSignal()  # 一次 show_html 的结果已经显示在预览中
+
+    def __init__(self, editor, preview, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.source_lines = []
+        self.line_count = 1
+
+        # 记录当前由哪一侧驱动滚动，避免程序滚动引起的回声
+        self._driver = None
+        self._driver_timer = QTimer(self)
+        self._driver_timer.setSingleShot(True)
+        self._driver_timer.timeout.connect(self._release_driver)
+
+        # 合并高频滚动事件
+        self._editor_timer = QTimer(self)
+        self._editor_timer.setSingleShot(True)
+        self._editor_timer.timeout.connect(self.sync_preview_to_editor)
+        self._preview_y = 0.0
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.timeout.connect(self._query_preview_anchor)
+
+        editor.verticalScrollBar().valueChanged.connect(self.on_editor_scrolled)
+        self.set_preview(preview)
+
+    def set_preview(self, preview):
+        """切换预览后端；下一次 show_html 会整体加载页面。"""
+        self.preview = preview
+        self._head = None
+        self._base_url = None
+        self._loading = False
+        preview.scrolled.connect(self.on_preview_scrolled)
+        preview.loaded.connect(self.on_load_finished)
+
+    def show_html(self, head, body, base_url, source_lines):
+        """
+        显示渲染结果。head 与 baseUrl 不变时原地替换正文，否则整体 setHtml；
+        两种情况下都会把预览恢复到与编辑区对应的位置。
+        """
+        self.source_lines = source_lines
+        self.line_count = max(1, self.editor.document().blockCount())
+        if not self._loading and head == self._head and base_url == self._base_url:
+            self.preview.update_body(body, self._on_body_updated)
+            return
+        self._head = head
+        self._base_url = base_url
+        self._loading = True
+        self.preview.set_html(head, body, base_url)
+
+    def set_theme(self, head, variables):
+        """
+        切换主题：页面已加载时只替换 CSS 变量，不重新渲染，并把 head 记为当前样式，
+        之后的刷新仍可原地替换正文。返回 False 表示需要调用方重新显示整个页面。
+        """
+        if self._head is None or self._loading:
+            return False
+        self._head = head
+        self.preview.set_theme_variables(variables)
+        return True
+
+    def on_load_finished(self, ok):
+        self._loading = False
+        if not ok:
+            self._head = None
+        self.shown.emit()
+        self.sync_preview_to_editor()
+
+    def _on_body_updated(self):
+        self.shown.emit()
+        self.sync_preview_to_editor()
+
+    def _claim(self, side):
+        """返回 side 是否可以驱动本次滚动。"""
+        if self._driver not in (None, side):
+            return False
+        self._driver = side
+        self._driver_timer.start(150)
+        return True
+
+    def _release_driver(self):
+        self._driver = None
+
+    # ---- 编辑区 -> 预览区 ----
+
+    def on_editor_scrolled(self, value):
+        if self._claim('editor'):
+            self._editor_timer.start(15)
+
+    def editor_top_line(self):
+        """返回编辑区顶部对应的源码行号（带小数部分）。"""
+        block = self.editor.cursorForPosition(QPoint(0, 0)).block()
+        rect = self.editor.document().documentLayout().blockBoundingRect(block)
+        offset = self.editor.verticalScrollBar().value() - rect.top()
+        frac = offset / rect.height() if rect.height() > 0 else 0.0
+        return block.blockNumber() + min(max(frac, 0.0), 1.0)
+
+    def line_to_anchor(self, line):
+        i = bisect_right(self.source_lines, line) - 1
+        start = self.source_lines[i] if i >= 0 else 0
+        end = self.source_lines[i + 1] if i + 1 < len(self.source_lines) else self.line_count
+        return i, (line - start) / (end - start) if end > start else 0.0
+
+    def anchor_to_line(self, i, frac):
+        start = self.source_lines[i] if 0 <= i < len(self.source_lines) else 0
+        end = self.source_lines[i + 1] if i + 1 < len(self.source_lines) else self.line_count
+        return start + (end - start) * frac
+
+    def sync_preview_to_editor(self):
+        if self._loading:
+            return
+        i, frac = self.line_to_anchor(self.editor_top_line())
+        self._driver = 'editor'
+        self._driver_timer.start(150)
+        self.preview.scroll_to_anchor(i, frac)
+
+    # ---- 预览区 -> 编辑区 ----
+
+    def on_preview_scrolled(self, y):
+        self._preview_y = y
+        if self._claim('preview'):
+            self._preview_timer.start(15)
+
+    def _query_preview_anchor(self):
+        self.preview.anchor_at(self._preview_y, self._scroll_editor_to_anchor)
+
+    def _scroll_editor_to_anchor(self, result):
+        if not result or self._driver == 'editor':
+            return
+        self._driver_timer.start(150)
+        self.scroll_editor_to_line(self.anchor_to_line(int(result[0]), float(result[1])))
+
+    def scroll_editor_to_line(self, line):
+        """把编辑区滚动到源码行号 line（带小数部分）处，与 editor_top_line 互逆。"""
+        doc = self.editor.document()
+        block = doc.findBlockByNumber(min(int(line), doc.blockCount() - 1))
+        rect = doc.documentLayout().blockBoundingRect(block)
+        self.editor.verticalScrollBar().setValue(int(rect.top() + rect.height() * (line - int(line))))
@@ -0,0 +1,81 @@
+# session_snapshot.py
+#
+# 会话快照：退出时记录打开的文件、光标与滚动位置、最后一次渲染的预览 HTML 以及文件列表，
+# 下次启动时按 mtime/大小 与内容哈希校验，校验通过的部分直接复用，不再重新列目录和渲染。
+
+import hashlib
+import json
+import os
+from PyQt5.QtCore import QStandardPaths
+
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path():
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "session.json")
+
+
+def fingerprint(path, data):
+    """返回文件的指纹：mtime、大小和内容哈希（data 为已经读出的文件内容）。"""
+    stat = os.stat(path)
+    return {'path': path, 'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+            'hash': hashlib.sha256(data).hexdigest()}
+
+
+def matches(entry, path, data):
+    """快照中的文件记录是否仍然对应磁盘上的文件：先比较 mtime 与大小，再比较内容哈希。"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if entry.get('path') != path or entry.get('size') != stat.st_size:
+        return False
+    if entry.get('mtime') == stat.st_mtime_ns:
+        return True
+    return entry.get('hash') == hashlib.sha256(data).hexdigest()
+
+
+def folder_mtime(folder):
+    """目录的 mtime 在其中增删、重命名文件时变化，用于判断缓存的文件列表是否有效。"""
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+def cached_file_list(snapshot, folder):
+    """返回快照中 folder 的文件列表；目录已变化或没有记录时返回 None。"""
+    if not snapshot or snapshot.get('folder') != folder:
+        return None
+    if snapshot.get('folder_mtime') != folder_mtime(folder):
+        return None
+    return snapshot.get('file_list')
+
+
+def file_entry(snapshot, path):
+    for entry in (snapshot or {}).get('files', []):
+        if entry.get('path') == path:
+            return entry
+    return None
+
+
+def load_snapshot(path=None):
+    try:
+        with open(path or snapshot_path(), 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') == SNAPSHOT_VERSION:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def save_snapshot(snapshot, path=None):
+    """先写临时文件再替换，退出时被中断也不会留下损坏的快照。"""
+    path = path or snapshot_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = dict(snapshot, version=SNAPSHOT_VERSION)
+    temp = f"{path}.tmp{os.getpid()}"
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(temp, path)
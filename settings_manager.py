@@ -14,7 +14,11 @@ class SettingsManager:
             "show_line_numbers": True,
             "word_wrap": True,
             "last_opened_folder": "",  # 上次打开的文件夹
-            "last_opened_file": ""     # 上次打开的.md文件
+            "last_opened_file": "",    # 上次打开的.md文件
+            "web_image_width": 0,      # 导入图片时生成的网页版本宽度（0 表示不生成）
+            "preview_thumbnail_width": 800,  # 预览区缩略图宽度（0 表示直接显示原图）
+            "preview_backend": "webengine",  # 预览后端：webengine 或 textbrowser（低内存）
+            "show_perf_hud": False           # 是否在状态栏显示性能面板
         }
         self.settings = self.load_settings()
 
@@ -87,3 +91,31 @@ class SettingsManager:
     def set_last_opened_file(self, file_path: str):
         self.settings["last_opened_file"] = file_path
         self.save_settings()
+
+    def get_web_image_width(self):
+        return self.settings.get("web_image_width", self.default_settings["web_image_width"])
+
+    def set_web_image_width(self, width: int):
+        self.settings["web_image_width"] = width
+        self.save_settings()
+
+    def get_preview_thumbnail_width(self):
+        return self.settings.get("preview_thumbnail_width", self.default_settings["preview_thumbnail_width"])
+
+    def set_preview_thumbnail_width(self, width: int):
+        self.settings["preview_thumbnail_width"] = width
+        self.save_settings()
+
+    def get_preview_backend(self):
+        return self.settings.get("preview_backend", self.default_settings["preview_backend"])
+
+    def set_preview_backend(self, name: str):
+        self.settings["preview_backend"] = name
+        self.save_settings()
+
+    def get_show_perf_hud(self):
+        return self.settings.get("show_perf_hud", self.default_settings["show_perf_hud"])
+
+    def set_show_perf_hud(self, show: bool):
+        self.settings["show_perf_hud"] = show
+        self.save_settings()
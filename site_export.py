@@ -0,0 +1,245 @@
+# site_export.py
+#
+# 无界面的静态站点导出：把文件夹下的所有 Markdown 渲染为 HTML，
+# 使用与预览区相同的扩展和 CSS，多进程并行渲染，并通过构建清单跳过未修改的文件。
+# 包含指令与预览区一样展开；清单记录每个文件包含的片段的内容哈希，修改片段时重新生成包含它的文件。
+#
+# 用法: python site_export.py <文件夹> [-o 输出目录] [-j 进程数] [--theme 主题] [--force]
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import renderer
+from includes import FragmentCache, render_document
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+ASSET_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg', '.webp')
+MANIFEST_NAME = '.export-manifest.json'
+MANIFEST_VERSION = 2
+
+_fragment_cache = None  # 工作进程内的片段缓存，同一片段被多个文件包含时只渲染一次
+
+# 指向其他 Markdown 文件的相对链接，导出后改为指向对应的 .html
+MD_LINK_RE = re.compile(r'(href=")(?![a-zA-Z][a-zA-Z0-9+.-]*:|/|#)([^"#?]*?)\.(?:md|markdown)((?:[#?][^"]*)?")')
+
+
+def rewrite_links(html):
+    return MD_LINK_RE.sub(r'\1\2.html\3', html)
+
+
+def output_name(relative_path):
+    return os.path.splitext(relative_path)[0] + '.html'
+
+
+def find_files(folder, output):
+    """返回文件夹下 (Markdown 文件, 图片资源) 的相对路径列表，跳过隐藏目录与输出目录。"""
+    markdown_files, assets = [], []
+    output = os.path.abspath(output)
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs
+                         if not d.startswith('.') and os.path.abspath(os.path.join(root, d)) != output)
+        for name in sorted(files):
+            relative = os.path.relpath(os.path.join(root, name), folder)
+            suffix = os.path.splitext(name)[1].lower()
+            if suffix in MARKDOWN_SUFFIXES:
+                markdown_files.append(relative)
+            elif suffix in ASSET_SUFFIXES:
+                assets.append(relative)
+    return markdown_files, assets
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_atomic(path, data):
+    """先写临时文件再替换，避免中断时留下半个文件。"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp = f"{path}.tmp{os.getpid()}"
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def render_file(source, target, css):
+    """在工作进程中渲染单个文件，返回 (耗时秒数, 输入字节数, {被包含的文件: 内容哈希})。"""
+    global _fragment_cache
+    if _fragment_cache is None:
+        _fragment_cache = FragmentCache()
+    start = time.perf_counter()
+    with open(source, 'r', encoding='utf-8') as f:
+        text = f.read()
+    html, _, dependencies = render_document(text, source, _fragment_cache)
+    title = os.path.splitext(os.path.basename(source))[0]
+    write_atomic(target, renderer.build_page(rewrite_links(html), css, title))
+    includes = {path: _fragment_cache.digest(path) for path in dependencies}
+    return time.perf_counter() - start, len(text.encode('utf-8')), includes
+
+
+def relative_includes(includes, folder):
+    """把 {被包含文件的绝对路径: 内容哈希} 转为相对 folder 的路径，写入清单条目。"""
+    return {os.path.relpath(path, folder): digest for path, digest in sorted(includes.items())}
+
+
+def includes_changed(entry, folder, cache):
+    """清单条目记录的被包含文件中有任何一个被修改、创建或删除时返回 True。"""
+    return any(cache.digest(os.path.normpath(os.path.join(folder, path))) != digest
+               for path, digest in entry.get('includes', {}).items())
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'config': None, 'files': {}}
+
+
+def is_up_to_date(entry, source, target):
+    """先比较 mtime 与大小，不一致时再比较内容哈希；返回 (是否最新, 最新的清单条目)。"""
+    stat = os.stat(source)
+    if entry and os.path.exists(target):
+        if entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return True, entry
+        digest = file_hash(source)
+        fresh = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest}
+        if entry['hash'] == digest:
+            return True, dict(entry, **fresh)
+        return False, fresh
+    return False, {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': file_hash(source)}
+
+
+def export_folder(folder, output, css, jobs=None, force=False, log=print):
+    """
+    把 folder 下的 Markdown 导出到 output，返回统计信息字典。
+    css 与渲染扩展一起决定配置哈希，配置变化时全部重新生成。
+    """
+    start = time.perf_counter()
+    folder = os.path.abspath(folder)
+    output = os.path.abspath(output)
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    config = hashlib.sha256(json.dumps(
+        [css, renderer.MARKDOWN_EXTENSIONS, renderer.EXTENSION_CONFIGS], sort_keys=True).encode('utf-8')).hexdigest()
+    if force or manifest['config'] != config:
+        manifest['files'] = {}
+    manifest['config'] = config
+    files = manifest['files']
+
+    markdown_files, assets = find_files(folder, output)
+
+    # 删除源文件已不存在的旧输出
+    for relative in set(files) - set(markdown_files) - set(assets):
+        target = os.path.join(output, output_name(relative) if relative.endswith(MARKDOWN_SUFFIXES) else relative)
+        if os.path.exists(target):
+            os.remove(target)
+        del files[relative]
+
+    # 图片资源直接复制
+    copied = 0
+    for relative in assets:
+        source, target = os.path.join(folder, relative), os.path.join(output, relative)
+        fresh, entry = is_up_to_date(files.get(relative), source, target)
+        if not fresh:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            copied += 1
+        files[relative] = entry
+
+    pending = {}
+    skipped = 0
+    digests = FragmentCache()  # 只用来计算被包含文件的哈希，每个片段只读一次
+    for relative in markdown_files:
+        source, target = os.path.join(folder, relative), os.path.join(output, output_name(relative))
+        fresh, entry = is_up_to_date(files.get(relative), source, target)
+        if fresh and not includes_changed(entry, folder, digests):
+            files[relative] = entry
+            skipped += 1
+        else:
+            files.pop(relative, None)
+            pending[relative] = (source, target, entry)
+
+    rendered, failed, input_bytes, render_seconds = 0, 0, 0, 0.0
+    jobs = jobs or os.cpu_count() or 1
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = {pool.submit(render_file, source, target, css): relative
+                       for relative, (source, target, _) in pending.items()}
+            for future in as_completed(futures):
+                relative = futures[future]
+                try:
+                    seconds, size, includes = future.result()
+                except Exception as e:
+                    failed += 1
+                    log(f"失败  {relative}: {e}")
+                    continue
+                rendered += 1
+                input_bytes += size
+                render_seconds += seconds
+                files[relative] = dict(pending[relative][2], includes=relative_includes(includes, folder))
+                log(f"{seconds * 1000:8.1f} ms  {size / 1024:8.1f} KB  {relative}")
+
+    os.makedirs(output, exist_ok=True)
+    write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=1))
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rendered': rendered, 'skipped': skipped, 'failed': failed, 'copied': copied,
+        'input_bytes': input_bytes, 'render_seconds': render_seconds, 'elapsed': elapsed,
+    }
+
+
+def css_from_settings(theme_name=None):
+    """按编辑器设置（主题、字体）生成与预览区一致的 CSS。"""
+    import theme
+    from settings_manager import SettingsManager
+
+    settings = SettingsManager().settings
+    palette = theme.get_theme(theme_name or settings["theme"])["palette"]
+    return renderer.build_css(palette["Window"], palette["WindowText"],
+                              settings["font_family"], settings["font_size"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把文件夹下的 Markdown 导出为 HTML 静态站点")
+    parser.add_argument("folder", help="Markdown 文件夹")
+    parser.add_argument("-o", "--output", help="输出目录（默认为 <文件夹>/_site）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行渲染的进程数（默认为 CPU 核数）")
+    parser.add_argument("--theme", default=None, help="使用的主题（默认为编辑器当前主题）")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，全部重新生成")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"文件夹不存在: {args.folder}")
+        return 2
+    output = args.output or os.path.join(args.folder, "_site")
+    stats = export_folder(args.folder, output, css_from_settings(args.theme), args.jobs, args.force)
+
+    elapsed = stats['elapsed']
+    print(f"渲染 {stats['rendered']} 个，跳过 {stats['skipped']} 个未修改文件，"
+          f"失败 {stats['failed']} 个，复制图片 {stats['copied']} 个")
+    if stats['rendered']:
+        print(f"总耗时 {elapsed:.2f} s，吞吐量 {stats['rendered'] / elapsed:.1f} 文件/s，"
+              f"{stats['input_bytes'] / 1024 / 1024 / elapsed:.2f} MB/s")
+    else:
+        print(f"总耗时 {elapsed:.2f} s")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# text_diff.py
+#
+# 行级与词级差异。先去掉相同的首尾，再用 patience 算法取两边都只出现一次的行作锚点，
+# 把问题切成小段；没有锚点的小段用 Myers O(ND) 算法求最短编辑脚本。
+# 结果与 difflib 的 opcodes 格式相同：(tag, i1, i2, j1, j2)，tag 为 equal/replace/delete/insert。
+
+import re
+from bisect import bisect_left
+
+LINE_RE = re.compile(r'[^\n]*\n|[^\n]+')
+WORD_RE = re.compile(r'\w+|\s+|[^\w\s]')
+
+# Myers 的耗时与内存随编辑距离平方增长，超过这个距离时整段按替换处理
+MAX_EDIT_DISTANCE = 500
+
+
+def split_lines(text):
+    """按 \\n 切分并保留行尾，拼接后与原文完全相同。"""
+    return LINE_RE.findall(text)
+
+
+def diff_lines(a, b):
+    """比较两个序列（通常是行列表），返回 opcodes。"""
+    return _opcodes(_matches(a, b), len(a), len(b))
+
+
+def word_diff(old, new):
+    """比较两行文字，返回 (旧行中变化的区间, 新行中变化的区间)，区间为 (起点, 长度)。"""
+    a, b = WORD_RE.findall(old), WORD_RE.findall(new)
+    a_offsets, b_offsets = _offsets(a), _offsets(b)
+    old_spans, new_spans = [], []
+    for tag, i1, i2, j1, j2 in diff_lines(a, b):
+        if tag == 'equal':
+            continue
+        if i2 > i1:
+            old_spans.append((a_offsets[i1], a_offsets[i2] - a_offsets[i1]))
+        if j2 > j1:
+            new_spans.append((b_offsets[j1], b_offsets[j2] - b_offsets[j1]))
+    return old_spans, new_spans
+
+
+def group_hunks(opcodes, context=3):
+    """把 opcodes 分组为 hunk，每组前后最多保留 context 行未变化的内容（同 difflib）。"""
+    codes = list(opcodes)
+    if not codes:
+        return []
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = (tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2)
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+
+    hunks, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        # 相距较远的两处变化分成两组
+        if tag == 'equal' and i2 - i1 > 2 * context:
+            group.append((tag, i1, i1 + context, j1, j1 + context))
+            hunks.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        hunks.append(group)
+    return hunks
+
+
+def _offsets(tokens):
+    offsets = [0]
+    for token in tokens:
+        offsets.append(offsets[-1] + len(token))
+    return offsets
+
+
+def _matches(a, b):
+    """返回所有匹配的 (i, j) 对，按 i 升序。用显式栈代替递归，避免深层嵌套时栈溢出。"""
+    pairs = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            pairs.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            pairs.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_lcs(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            pairs.extend(_myers(a, b, alo, ahi, blo, bhi))
+            continue
+        i, j = alo, blo
+        for anchor_i, anchor_j in anchors:
+            stack.append((i, anchor_i, j, anchor_j))
+            pairs.append((anchor_i, anchor_j))
+            i, j = anchor_i + 1, anchor_j + 1
+        stack.append((i, ahi, j, bhi))
+    pairs.sort()
+    return pairs
+
+
+def _unique_lcs(a, b, alo, ahi, blo, bhi):
+    """patience 锚点：两边都只出现一次的元素中，位置同时递增的最长序列。"""
+    a_index = {}
+    for i in range(alo, ahi):
+        a_index[a[i]] = -1 if a[i] in a_index else i
+    b_index = {}
+    for j in range(blo, bhi):
+        if a_index.get(b[j], -1) >= 0:
+            b_index[b[j]] = -1 if b[j] in b_index else j
+    pairs = sorted((a_index[line], j) for line, j in b_index.items() if j >= 0)
+
+    # 按 j 求最长递增子序列（patience sorting）
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos:
+            previous[k] = tail_index[pos - 1]
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pos] = j
+            tail_index[pos] = k
+    result = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        result.append(pairs[k])
+        k = previous[k]
+    result.reverse()
+    return result
+
+
+def _myers(a, b, alo, ahi, blo, bhi):
+    """Myers 贪心算法求 a[alo:ahi] 与 b[blo:bhi] 的最长公共子序列；编辑距离过大时返回空。"""
+    n, m = ahi - alo, bhi - blo
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, MAX_EDIT_DISTANCE) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m, alo, blo)
+    return []
+
+
+def _backtrack(trace, x, y, alo, blo):
+    pairs = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            pairs.append((alo + x, blo + y))
+        x, y = previous_x, previous_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        pairs.append((alo + x, blo + y))
+    return pairs
+
+
+def _opcodes(pairs, n, m):
+    opcodes = []
+    i = j = 0
+    for match_i, match_j in pairs + [(n, m)]:
+        if i < match_i or j < match_j:
+            tag = 'replace' if i < match_i and j < match_j else 'delete' if i < match_i else 'insert'
+            opcodes.append((tag, i, match_i, j, match_j))
+        if match_i < n:
+            if opcodes and opcodes[-1][0] == 'equal':
+                _, i1, _, j1, _ = opcodes[-1]
+                opcodes[-1] = ('equal', i1, match_i + 1, j1, match_j + 1)
+            else:
+                opcodes.append(('equal', match_i, match_i + 1, match_j, match_j + 1))
+        i, j = match_i + 1, match_j + 1
+    return opcodes
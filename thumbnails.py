@@ -0,0 +1,119 @@
+# thumbnails.py
+#
+# 预览区的图片缩略图缓存：
+#   - 大图只在首次出现时于工作线程中缩小一次，写入磁盘缓存，文件名由图片内容哈希与目标宽度决定；
+#   - 渲染时只读取图片文件头获得尺寸，为 <img> 预留宽高并加上 loading="lazy"，避免加载时页面跳动；
+#   - 预览中显示缩略图，点击图片时才加载原图。
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from PyQt5.QtCore import QObject, QStandardPaths, QUrl, pyqtSignal
+from PyQt5.QtGui import QImageReader
+
+from asset_pipeline import NO_VARIANT_SUFFIXES, content_name, write_scaled
+
+SCHEME_PREFIXES = ('http:', 'https:', 'data:', 'file:', 'ftp:', 'mailto:')
+
+# 注入预览页面：保持预留的宽高比，点击缩略图时换成原图
+LAZY_IMAGE_SCRIPT = """
+<style>
+img { max-width: 100%; height: auto; }
+img[data-full] { cursor: zoom-in; }
+</style>
+<script>
+document.addEventListener('click', function (event) {
+    var img = event.target;
+    if (img.tagName === 'IMG' && img.dataset.full) {
+        img.src = img.dataset.full;
+        img.removeAttribute('data-full');
+    }
+});
+</script>
+"""
+
+
+def make_thumbnail(source, cache_dir, width):
+    """在工作线程中生成缩略图，返回缩略图路径；已缓存时直接返回。"""
+    stem, suffix = os.path.splitext(content_name(source))
+    target = os.path.join(cache_dir, f"{stem}.w{width}{suffix}")
+    if not os.path.exists(target):
+        os.makedirs(cache_dir, exist_ok=True)
+        if not write_scaled(source, target, width):
+            return None
+    return target
+
+
+class ThumbnailCache(QObject):
+    """为预览区解析本地图片：返回 <img> 的属性，缩略图生成完成后发出 ready 信号。"""
+
+    ready = pyqtSignal()
+    _generated = pyqtSignal(object, object)
+
+    def __init__(self, width=800, cache_dir=None, parent=None):
+        super().__init__(parent)
+        self.width = width
+        self.cache_dir = cache_dir or os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "thumbnails")
+        # (路径, mtime, 大小) -> (缩略图路径或 None, 显示宽度, 显示高度)
+        self._known = {}
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._generated.connect(self._on_generated)
+
+    def resolve(self, src, base_dir):
+        """返回 <img> 需要设置的属性；非本地图片或无法读取时返回 None。"""
+        if not src or src.lower().startswith(SCHEME_PREFIXES) or src.startswith('#'):
+            return None
+        path = os.path.normpath(os.path.join(base_dir, unquote(src.split('?', 1)[0])))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        known = self._known.get(key)
+        if known is None:
+            known = self._measure(key)
+            if known is None:
+                return None
+
+        thumbnail, width, height = known
+        attributes = {'width': width, 'height': height, 'loading': 'lazy', 'decoding': 'async'}
+        if thumbnail:
+            attributes['src'] = QUrl.fromLocalFile(thumbnail).toString()
+            attributes['data-full'] = src
+        return attributes
+
+    def _measure(self, key):
+        """只读文件头获取尺寸；需要缩略图时提交到工作线程，先返回原图的预留尺寸。"""
+        path = key[0]
+        size = QImageReader(path).size()
+        if not size.isValid():
+            return None
+        width, height = size.width(), size.height()
+        if self.width <= 0 or width <= self.width:
+            self._known[key] = (None, width, height)
+            return self._known[key]
+
+        display = (self.width, max(1, round(height * self.width / width)))
+        if os.path.splitext(path)[1].lower() in NO_VARIANT_SUFFIXES:
+            self._known[key] = (None,) + display
+            return self._known[key]
+        if key not in self._pending:
+            self._pending.add(key)
+            future = self._executor.submit(make_thumbnail, path, self.cache_dir, self.width)
+            future.add_done_callback(lambda f: self._generated.emit(key, f))
+        return (None,) + display
+
+    def _on_generated(self, key, future):
+        self._pending.discard(key)
+        if future.exception() is not None:
+            print(f"生成缩略图时发生错误: {future.exception()}")
+            thumbnail = None
+        else:
+            thumbnail = future.result()
+        size = QImageReader(thumbnail or key[0]).size()
+        self._known[key] = (thumbnail, size.width(), size.height()) if thumbnail else \
+            (None, self.width, max(1, round(size.height() * self.width / max(1, size.width()))))
+        if thumbnail:
+            self.ready.emit()